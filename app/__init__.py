@@ -2,7 +2,11 @@ from flask import Flask
 from flask_session import Session # Import Session
 import os
 
-from .models import db, init_db as init_models_db
+from .models import db, init_db as init_models_db, schema_fingerprint, stored_schema_version, store_schema_version, create_schema
+from .search import init_search_index, FTS_DDL
+from .logging_utils import configure_logging, get_logger
+
+app_logger = get_logger('app')
 
 def create_app(config_pyfile_path=None):
     app = Flask(__name__,
@@ -15,11 +19,8 @@ def create_app(config_pyfile_path=None):
     if not config_pyfile_path:
         config_pyfile_path = os.path.join(project_root, 'config.py')
 
-    if os.path.exists(config_pyfile_path):
-        app.config.from_pyfile(config_pyfile_path)
-        print(f"Loaded configuration from: {config_pyfile_path}")
-    else:
-        print(f"Warning: Configuration file not found at {config_pyfile_path}. Using defaults.")
+    config_loaded = app.config.from_pyfile(config_pyfile_path, silent=True)
+    if not config_loaded:
         app.config.setdefault('BASE_DIR', project_root)
         app.config.setdefault('SQLALCHEMY_DATABASE_URI', f"sqlite:///{os.path.join(project_root, 'data', 'default_photo_album.sqlite')}")
         app.config.setdefault('SQLALCHEMY_TRACK_MODIFICATIONS', False)
@@ -27,11 +28,12 @@ def create_app(config_pyfile_path=None):
         app.config.setdefault('ARCHIVE_PATH', os.path.join(project_root, 'sample_media_fallback', 'archive'))
         app.config.setdefault('SUPPORTED_IMAGE_EXTENSIONS', ['.jpg', '.jpeg'])
         app.config.setdefault('SUPPORTED_VIDEO_EXTENSIONS', ['.mp4', '.mov'])
-        # Ensure sample dirs for fallback are created
-        fallback_org_path = app.config['ORG_PATHS'][0]
-        fallback_archive_path = app.config['ARCHIVE_PATH']
-        if not os.path.exists(fallback_org_path): os.makedirs(fallback_org_path, exist_ok=True)
-        if not os.path.exists(fallback_archive_path): os.makedirs(fallback_archive_path, exist_ok=True)
+
+    configure_logging(app)
+    if config_loaded:
+        app_logger.debug("Loaded configuration from %s", config_pyfile_path)
+    else:
+        app_logger.warning("Configuration file not found at %s. Using defaults.", config_pyfile_path)
 
     app.config.setdefault('SESSION_TYPE', 'filesystem')
     # Use BASE_DIR from app.config if available (set by config.py), else use project_root
@@ -42,26 +44,35 @@ def create_app(config_pyfile_path=None):
     app.config.setdefault('SESSION_USE_SIGNER', True)
 
     if 'SECRET_KEY' not in app.config:
-        print("Warning: SECRET_KEY not found in config. Generating a temporary one. Set a fixed SECRET_KEY in config.py for production.")
+        app_logger.warning("SECRET_KEY not found in config. Generating a temporary one. Set a fixed SECRET_KEY in config.py for production.")
         app.config['SECRET_KEY'] = os.urandom(32)
 
-    session_file_dir = app.config['SESSION_FILE_DIR']
-    if not os.path.exists(session_file_dir):
-        try:
-            os.makedirs(session_file_dir)
-            print(f"Created SESSION_FILE_DIR at {session_file_dir}")
-        except OSError as e:
-            print(f"Error creating SESSION_FILE_DIR {session_file_dir}: {e}")
-
+    # The filesystem session store creates SESSION_FILE_DIR itself, and the scanner skips library paths
+    # that do not exist, so nothing on the filesystem is probed or created here.
     Session(app)
 
-    if not os.path.exists(app.instance_path):
-        try:
-            os.makedirs(app.instance_path)
-        except OSError as e:
-            print(f"Error creating instance folder {app.instance_path}: {e}")
-
+    # Schema work (create_all, column additions, search index DDL) only runs when the models changed
+    # since the database was last prepared; otherwise a start costs one small read.
     init_models_db(app)
+    with app.app_context():
+        schema_version = schema_fingerprint(FTS_DDL)
+        if stored_schema_version() != schema_version:
+            app_logger.info("Preparing database schema (version %s)...", schema_version)
+            create_schema()
+            init_search_index()
+            store_schema_version(schema_version)
+
+    from . import metrics
+    metrics.init_app(app)
+
+    from . import sql_profiler
+    sql_profiler.init_app(app)
+
+    from . import previews
+    previews.init_app(app)
+
+    from . import events
+    events.init_app(app)
 
     from . import commands
     commands.init_app(app)
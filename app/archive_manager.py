@@ -0,0 +1,95 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import current_app
+from .models import db, Media, media_tag, smart_album_media
+from .file_utils import move_media_to_archive
+from .image_utils import get_thumbnail_path
+from .previews import get_preview_service
+from .cache import bump_data_version
+from .logging_utils import get_logger
+from .utils import chunked
+from . import events
+
+archive_manager_logger = get_logger('archive_manager', tag='ARCHIVE')
+
+DEFAULT_MOVE_WORKERS = 4
+
+def _remove_thumbnail(thumb_path):
+    try:
+        os.remove(thumb_path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        archive_manager_logger.warning("Could not remove stale thumbnail %s: %s", thumb_path, e)
+
+def archive_media_items(job, media_ids, archive_base_path):
+    """Background job body: moves the given media to the archive and drops their DB rows.
+    Returns a summary dict with 'message', 'success_count' and 'failures' ([{id, reason}]).
+    """
+    failures = []
+    job.set_total(len(media_ids))
+
+    rows = {}
+    for chunk in chunked(media_ids):
+        for media_id, filepath in db.session.query(Media.id, Media.filepath).filter(Media.id.in_(chunk)):
+            rows[media_id] = filepath
+    db.session.rollback() # Release the read transaction while files are moved
+
+    to_move = []
+    for media_id in media_ids:
+        filepath = rows.get(media_id)
+        if filepath is None:
+            archive_manager_logger.warning("Media item with ID %s not found for deletion.", media_id)
+            failures.append({'id': media_id, 'reason': 'Not found in DB'})
+            job.advance()
+        elif not os.path.isabs(filepath):
+            archive_manager_logger.error("Media item ID %s has a non-absolute filepath: %s. Skipping.", media_id, filepath)
+            failures.append({'id': media_id, 'reason': 'Invalid (non-absolute) filepath in DB'})
+            job.advance()
+        else:
+            to_move.append((media_id, filepath, get_thumbnail_path(media_id)[0]))
+
+    moved_ids = []
+    if to_move:
+        max_workers = current_app.config.get('ARCHIVE_MOVE_WORKERS', DEFAULT_MOVE_WORKERS)
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='archive-move') as pool:
+            futures = {pool.submit(move_media_to_archive, filepath, archive_base_path): (media_id, filepath, thumb_path)
+                       for media_id, filepath, thumb_path in to_move}
+            for future in as_completed(futures):
+                media_id, filepath, thumb_path = futures[future]
+                try:
+                    new_path = future.result()
+                except Exception as e:
+                    archive_manager_logger.error("Unexpected error moving media ID %s: %s", media_id, e, exc_info=True)
+                    new_path = None
+                if new_path:
+                    moved_ids.append(media_id)
+                    _remove_thumbnail(thumb_path)
+                else:
+                    archive_manager_logger.error("Failed to move file for media ID %s (path: %s) to archive.", media_id, filepath)
+                    failures.append({'id': media_id, 'reason': 'File move failed'})
+                job.advance()
+        get_preview_service().remove_previews(moved_ids)
+
+    success_count = 0
+    if moved_ids:
+        try:
+            for chunk in chunked(moved_ids):
+                db.session.execute(media_tag.delete().where(media_tag.c.media_id.in_(chunk)))
+                db.session.execute(smart_album_media.delete().where(smart_album_media.c.media_id.in_(chunk)))
+                db.session.execute(Media.__table__.delete().where(Media.id.in_(chunk)))
+            bump_data_version()
+            db.session.commit()
+            success_count = len(moved_ids)
+            archive_manager_logger.info("Successfully deleted %s items from database.", success_count)
+            events.publish('media_removed', ids=moved_ids)
+        except Exception as e:
+            db.session.rollback()
+            archive_manager_logger.error("Error committing deletions to database: %s", e, exc_info=True)
+            failures.extend({'id': media_id, 'reason': 'DB commit failed after move'} for media_id in moved_ids)
+
+    summary_message = f"Delete complete. Success: {success_count}. Fail: {len(failures)}."
+    archive_manager_logger.info(summary_message)
+    if failures:
+        archive_manager_logger.warning("Failed deletion details: %s", failures)
+    return {'message': summary_message, 'success_count': success_count, 'failures': failures}
@@ -0,0 +1,47 @@
+import threading
+from collections import OrderedDict
+from sqlalchemy import text
+from .models import db, AppMeta
+
+DATA_VERSION_KEY = 'library_data_version'
+
+def get_data_version():
+    """Returns the library data version, a counter bumped by every change to media or tags."""
+    row = db.session.get(AppMeta, DATA_VERSION_KEY)
+    return int(row.value) if row else 0
+
+def bump_data_version():
+    """Increments the library data version inside the current transaction.
+    Call it before committing the change it describes, so readers never see new data with an old version.
+    """
+    db.session.execute(
+        text("INSERT INTO app_meta (key, value) VALUES (:key, '1') "
+             "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"),
+        {'key': DATA_VERSION_KEY})
+
+class VersionedCache:
+    """Per-process LRU cache whose entries are only valid for the data version they were computed at."""
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        version = get_data_version()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                return entry[1]
+        value = compute()
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
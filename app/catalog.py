@@ -0,0 +1,157 @@
+import os
+import gzip
+import shutil
+import struct
+from datetime import datetime, timezone
+import msgspec
+from flask import current_app
+from sqlalchemy import select, DateTime
+from .models import db, Media, Tag, media_tag, FavoriteFilter, smart_album_media, ScanState, ScanDirectory
+from .cache import bump_data_version
+from .search import search_index_suspended
+from .logging_utils import get_logger
+
+catalog_logger = get_logger('catalog')
+
+# Catalog snapshots: the tables that cannot be recreated by scanning (tags, favorites) together with the
+# media rows and everything read from the files, so a new or rebuilt instance can start from a snapshot
+# and only run an incremental scan.
+#
+# Layout: CATALOG_MAGIC, then frames of a 4-byte big-endian length followed by a msgpack document:
+#   {'format': 1, 'created_at': ..., 'tables': {table name: [column names]}}   header
+#   {'table': name, 'rows': [[values in header column order], ...]}           up to chunk_rows rows each
+#   {'end': True, 'counts': {table name: row count}}                           trailer
+# The whole stream may be gzip-compressed; import detects that from the first bytes. Naive datetimes are
+# stored as ISO strings. Columns are matched by name on import, so snapshots survive added columns.
+CATALOG_MAGIC = b'PACATLG\x00'
+CATALOG_FORMAT = 1
+CATALOG_TABLES = (Tag.__table__, Media.__table__, media_tag, FavoriteFilter.__table__, smart_album_media) # Insert order
+DEFAULT_CHUNK_ROWS = 5000
+_FRAME_HEADER = struct.Struct('>I')
+_GZIP_MAGIC = b'\x1f\x8b'
+
+class CatalogFormatError(Exception):
+    pass
+
+def _write_frame(stream, encoder, document):
+    payload = encoder.encode(document)
+    stream.write(_FRAME_HEADER.pack(len(payload)))
+    stream.write(payload)
+
+def _read_frame(stream, decoder):
+    header = stream.read(_FRAME_HEADER.size)
+    if len(header) < _FRAME_HEADER.size:
+        raise CatalogFormatError("Snapshot is truncated (no end marker).")
+    (length,) = _FRAME_HEADER.unpack(header)
+    payload = stream.read(length)
+    if len(payload) < length:
+        raise CatalogFormatError("Snapshot is truncated (incomplete frame).")
+    return decoder.decode(payload)
+
+def export_catalog(path, compress=False, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Writes a snapshot of the catalog tables to path and returns {table name: row count}.
+    Rows are streamed from one read transaction in chunks, so memory use does not grow with the library.
+    """
+    encoder = msgspec.msgpack.Encoder()
+    counts = {}
+    temp_path = f'{path}.tmp'
+    opener = gzip.open if compress else open
+    with opener(temp_path, 'wb') as stream:
+        stream.write(CATALOG_MAGIC)
+        _write_frame(stream, encoder, {
+            'format': CATALOG_FORMAT,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            # str(): SQLAlchemy names are str subclasses, which msgspec does not encode
+            'tables': {str(table.name): [str(column.name) for column in table.columns] for table in CATALOG_TABLES}})
+        for table in CATALOG_TABLES:
+            name = str(table.name)
+            result = db.session.execute(select(*table.columns).order_by(*table.primary_key.columns))
+            counts[name] = 0
+            while True:
+                rows = result.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                _write_frame(stream, encoder, {'table': name, 'rows': [list(row) for row in rows]})
+                counts[name] += len(rows)
+        _write_frame(stream, encoder, {'end': True, 'counts': counts})
+    db.session.rollback() # Ends the read transaction
+    os.replace(temp_path, path)
+    catalog_logger.info("Exported catalog to %s: %s", path, counts)
+    return counts
+
+def _open_snapshot(path):
+    with open(path, 'rb') as probe:
+        compressed = probe.read(2) == _GZIP_MAGIC
+    stream = gzip.open(path, 'rb') if compressed else open(path, 'rb')
+    if stream.read(len(CATALOG_MAGIC)) != CATALOG_MAGIC:
+        stream.close()
+        raise CatalogFormatError(f"{path} is not a catalog snapshot.")
+    return stream
+
+def _row_converter(table, snapshot_columns):
+    """Returns a function turning a snapshot row into a dict of the columns this version knows."""
+    known = {column.name: column for column in table.columns}
+    positions = [(index, name) for index, name in enumerate(snapshot_columns) if name in known]
+    datetime_names = {name for name, column in known.items() if isinstance(column.type, DateTime)}
+    def convert(row):
+        values = {}
+        for index, name in positions:
+            value = row[index]
+            if name in datetime_names and isinstance(value, str):
+                value = datetime.fromisoformat(value)
+            values[name] = value
+        return values
+    return convert
+
+def _clear_derived_caches():
+    """Thumbnails and previews are stored by media ID, which may now belong to different files."""
+    base_dir = current_app.config.get('BASE_DIR', os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    for cache_dir in ('thumbnails', 'previews'):
+        shutil.rmtree(os.path.join(base_dir, 'data', cache_dir), ignore_errors=True)
+
+def import_catalog(path, replace=False, keep_caches=False):
+    """Restores a snapshot written by export_catalog and returns {table name: row count}.
+
+    The catalog must be empty unless replace is set, in which case its current contents are deleted.
+    Rows keep their IDs and are inserted with executemany in snapshot chunks; the search index triggers
+    are suspended meanwhile and the index is rebuilt once at the end. Everything happens in one
+    transaction, so a failed import leaves the catalog as it was. Scan bookkeeping is reset, so the next
+    scan lists every directory (but does not re-read files whose mtime and size are unchanged).
+    Unless keep_caches is set (snapshot taken from this same instance), cached thumbnails and previews
+    are removed because their media IDs may now refer to other files.
+    """
+    if not replace and (db.session.query(Media.id).first() or db.session.query(Tag.id).first()):
+        raise ValueError("The catalog is not empty (use --replace to overwrite it).")
+    decoder = msgspec.msgpack.Decoder()
+    tables = {str(table.name): table for table in CATALOG_TABLES}
+    counts = dict.fromkeys(tables, 0)
+    with _open_snapshot(path) as stream:
+        header = _read_frame(stream, decoder)
+        if header.get('format') != CATALOG_FORMAT:
+            raise CatalogFormatError(f"Unsupported catalog format {header.get('format')!r}.")
+        converters = {name: _row_converter(tables[name], columns)
+                      for name, columns in header['tables'].items() if name in tables}
+        try:
+            with search_index_suspended():
+                for table in reversed(CATALOG_TABLES):
+                    db.session.execute(table.delete())
+                db.session.execute(ScanDirectory.__table__.delete())
+                db.session.execute(ScanState.__table__.delete())
+                while True:
+                    frame = _read_frame(stream, decoder)
+                    if frame.get('end'):
+                        break
+                    convert = converters.get(frame['table'])
+                    if convert is None or not frame['rows']:
+                        continue
+                    db.session.execute(tables[frame['table']].insert(), [convert(row) for row in frame['rows']])
+                    counts[frame['table']] += len(frame['rows'])
+                bump_data_version()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+    if not keep_caches:
+        _clear_derived_caches()
+    catalog_logger.info("Imported catalog from %s: %s", path, counts)
+    return counts
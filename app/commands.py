@@ -1,6 +1,13 @@
+import os
 import click
+from flask import current_app
 from flask.cli import AppGroup, with_appcontext
 from .scanner import scan_libraries
+from .duplicates import find_duplicates, get_duplicate_groups
+from .similarity import compute_missing_phashes, cluster_near_duplicates, DEFAULT_MAX_DISTANCE
+from .catalog import export_catalog, import_catalog, CatalogFormatError, DEFAULT_CHUNK_ROWS
+from .models import Media
+from .server import serve, DEFAULT_SERVER_WORKERS, DEFAULT_SERVER_THREADS, DEFAULT_SERVER_SHUTDOWN_TIMEOUT
 
 # Create an AppGroup for 'scan' commands
 scan_cli = AppGroup('scan', help='Media scanning commands.')
@@ -11,17 +18,129 @@ scan_cli = AppGroup('scan', help='Media scanning commands.')
 def scan_libraries_command(force_rescan):
     """Command to scan media libraries."""
     click.echo('Starting library scan via Flask CLI...')
-    # Pass force_rescan to scan_libraries if it's updated to handle it
-    # For now, scan_libraries doesn't take arguments, but this structure allows it.
     if force_rescan:
-        click.echo('Force rescan option is set (currently illustrative).')
-        # scan_libraries(force_rescan=True) # Example if scan_libraries supported it
-        scan_libraries()
+        click.echo('Force rescan: every directory is listed and every file re-read.')
+    counts = scan_libraries(force_rescan=force_rescan)
+    click.echo(f"Library scan finished. Added {counts.get('added', 0)}, updated {counts.get('updated', 0)}, "
+               f"{counts.get('newly_inaccessible', 0)} no longer accessible; "
+               f"{counts.get('directories_skipped', 0)} unchanged directories skipped.")
+
+duplicates_cli = AppGroup('duplicates', help='Exact-duplicate detection commands.')
+
+@duplicates_cli.command('find', help='Hashes same-size files and lists groups of byte-identical media.')
+@click.option('--cached', is_flag=True, help="Only list groups from previously stored hashes; don't read any files.")
+@with_appcontext
+def find_duplicates_command(cached):
+    """Command to detect exact duplicates."""
+    if cached:
+        groups = get_duplicate_groups()
     else:
-        scan_libraries()
-    click.echo('Library scan finished.')
+        click.echo('Hashing candidate files...')
+        groups = find_duplicates()
+    for group in groups:
+        click.echo(f"{group['content_hash'][:16]}  {group['filesize']} bytes  x{len(group['media'])}")
+        for media in group['media']:
+            click.echo(f"    [{media['id']}] {media['filepath']}")
+    wasted = sum(g['filesize'] * (len(g['media']) - 1) for g in groups)
+    click.echo(f'{len(groups)} duplicate groups, {wasted} bytes in redundant copies.')
+
+similar_cli = AppGroup('similar', help='Perceptual near-duplicate commands.')
+
+@similar_cli.command('cluster', help='Groups visually similar images (burst shots, re-encoded copies).')
+@click.option('--max-distance', default=DEFAULT_MAX_DISTANCE, show_default=True, type=int, help='Maximum Hamming distance between 64-bit hashes.')
+@click.option('--no-backfill', is_flag=True, help="Don't compute hashes for images whose thumbnail was never generated.")
+@with_appcontext
+def cluster_similar_command(max_distance, no_backfill):
+    """Command to cluster near-duplicate images."""
+    if not no_backfill:
+        click.echo('Computing missing perceptual hashes...')
+        compute_missing_phashes()
+    clusters = cluster_near_duplicates(max_distance)
+    for index, media_ids in enumerate(clusters, start=1):
+        click.echo(f"Cluster {index} ({len(media_ids)} images):")
+        for media in Media.query.filter(Media.id.in_(media_ids)).order_by(Media.filepath):
+            click.echo(f"    [{media.id}] {media.filepath}")
+    click.echo(f'{len(clusters)} clusters of near-duplicate images.')
+
+catalog_cli = AppGroup('catalog', help='Catalog snapshot (backup, restore and warm start) commands.')
+
+@catalog_cli.command('export', help='Writes media, tags, tag assignments and favorite filters to a snapshot file.')
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+@click.option('--compress', is_flag=True, help='Gzip the snapshot (implied by a .gz file name).')
+@click.option('--chunk-rows', default=DEFAULT_CHUNK_ROWS, show_default=True, type=click.IntRange(min=1), help='Rows per snapshot chunk.')
+@with_appcontext
+def export_catalog_command(path, compress, chunk_rows):
+    """Command to export the catalog."""
+    counts = export_catalog(path, compress=compress or path.endswith('.gz'), chunk_rows=chunk_rows)
+    click.echo(f"Exported {counts['media']} media, {counts['tag']} tags, {counts['media_tag']} tag assignments "
+               f"and {counts['favorite_filter']} favorite filters to {path}.")
+
+@catalog_cli.command('import', help='Restores a snapshot written by "catalog export". Run "scan libraries" afterwards.')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--replace', is_flag=True, help='Delete the current catalog contents first (otherwise the catalog must be empty).')
+@click.option('--keep-caches', is_flag=True, help="Keep cached thumbnails and previews (only if the snapshot was taken from this instance).")
+@with_appcontext
+def import_catalog_command(path, replace, keep_caches):
+    """Command to import a catalog snapshot."""
+    try:
+        counts = import_catalog(path, replace=replace, keep_caches=keep_caches)
+    except (ValueError, CatalogFormatError) as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Imported {counts['media']} media, {counts['tag']} tags, {counts['media_tag']} tag assignments "
+               f"and {counts['favorite_filter']} favorite filters. Run 'flask scan libraries' to pick up changes since the snapshot.")
+
+sample_cli = AppGroup('sample', help='Demo sample media commands.')
+
+@sample_cli.command('create', help='Creates the default sample libraries (with dummy files) and archive if they are configured.')
+@with_appcontext
+def create_sample_media_command():
+    """Command to create the sample directories. Only paths below BASE_DIR/sample_media are touched."""
+    sample_root = os.path.join(current_app.config['BASE_DIR'], 'sample_media')
+    sample_org_paths = [os.path.join(sample_root, 'library1'), os.path.join(sample_root, 'library2')]
+    sample_archive_path = os.path.join(sample_root, 'archive')
+    created = 0
+    for path in current_app.config.get('ORG_PATHS', []):
+        if path not in sample_org_paths or os.path.exists(path):
+            continue
+        os.makedirs(path)
+        name = os.path.basename(path)
+        with open(os.path.join(path, f"sample_image_{name}.jpg"), "w") as f:
+            f.write("dummy image content")
+        with open(os.path.join(path, f"sample_video_{name}.mp4"), "w") as f:
+            f.write("dummy video content")
+        click.echo(f"Created sample library directory: {path}")
+        created += 1
+    archive_path = current_app.config.get('ARCHIVE_PATH')
+    if archive_path == sample_archive_path and not os.path.exists(archive_path):
+        os.makedirs(archive_path)
+        click.echo(f"Created sample archive directory: {archive_path}")
+        created += 1
+    if not created:
+        click.echo("Nothing to create (sample directories are not configured or already exist).")
+
+@click.command('serve', help='Runs the app on a production server (gunicorn if installed, else a threaded werkzeug server).')
+@click.option('--host', default='127.0.0.1', show_default=True, help='Interface to bind.')
+@click.option('--port', default=5000, show_default=True, type=int, help='Port to bind.')
+@click.option('--workers', type=click.IntRange(min=1), help='Worker processes (gunicorn only). Default: SERVER_WORKERS.')
+@click.option('--threads', type=click.IntRange(min=1), help='Request threads per worker. Default: SERVER_THREADS.')
+@click.option('--shutdown-timeout', type=click.IntRange(min=0), help='Seconds to wait for running jobs on shutdown. Default: SERVER_SHUTDOWN_TIMEOUT.')
+@click.option('--no-warmup', is_flag=True, help='Accept traffic without warming the caches first.')
+@with_appcontext
+def serve_command(host, port, workers, threads, shutdown_timeout, no_warmup):
+    """Command to serve the app until SIGTERM/SIGINT."""
+    config = current_app.config
+    serve(current_app._get_current_object(), host, port,
+          workers=workers or config.get('SERVER_WORKERS', DEFAULT_SERVER_WORKERS),
+          threads=threads or config.get('SERVER_THREADS', DEFAULT_SERVER_THREADS),
+          shutdown_timeout=shutdown_timeout if shutdown_timeout is not None else config.get('SERVER_SHUTDOWN_TIMEOUT', DEFAULT_SERVER_SHUTDOWN_TIMEOUT),
+          warmup=not no_warmup and config.get('SERVER_WARMUP', True))
 
 def init_app(app):
     """Registers the scan_cli blueprint with the Flask app."""
     app.cli.add_command(scan_cli)
+    app.cli.add_command(duplicates_cli)
+    app.cli.add_command(similar_cli)
+    app.cli.add_command(catalog_cli)
+    app.cli.add_command(sample_cli)
+    app.cli.add_command(serve_command)
     # Add other command groups or commands to app.cli here
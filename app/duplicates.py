@@ -0,0 +1,123 @@
+import os
+import hashlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import func
+from flask import current_app
+from .models import db, Media
+from .logging_utils import get_logger
+
+duplicates_logger = get_logger('duplicates')
+
+PARTIAL_BLOCK_SIZE = 64 * 1024 # Bytes hashed from each end of a file for the cheap first pass
+READ_BUFFER_SIZE = 4 * 1024 * 1024 # Buffer for full streaming hashes; large reads suit network shares
+DEFAULT_HASH_WORKERS = 4
+COMMIT_BATCH_SIZE = 500
+
+def _new_hasher():
+    return hashlib.blake2b(digest_size=32)
+
+def compute_partial_hash(filepath, filesize):
+    """Hashes the first and last PARTIAL_BLOCK_SIZE bytes (the whole file if it is smaller)."""
+    hasher = _new_hasher()
+    with open(filepath, 'rb') as f:
+        hasher.update(f.read(PARTIAL_BLOCK_SIZE))
+        if filesize > 2 * PARTIAL_BLOCK_SIZE:
+            f.seek(-PARTIAL_BLOCK_SIZE, os.SEEK_END)
+            hasher.update(f.read(PARTIAL_BLOCK_SIZE))
+        elif filesize > PARTIAL_BLOCK_SIZE:
+            hasher.update(f.read())
+    return hasher.hexdigest()
+
+def compute_content_hash(filepath):
+    """Streams the whole file through the hasher with a single reusable buffer."""
+    hasher = _new_hasher()
+    buffer = bytearray(READ_BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(filepath, 'rb', buffering=0) as f:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            hasher.update(view[:read])
+    return hasher.hexdigest()
+
+def _hash_candidates(media_items, hash_func, attr, job=None):
+    """Fills media_item.<attr> for the items missing it, hashing files in parallel."""
+    pending = [m for m in media_items if getattr(m, attr) is None]
+    if not pending:
+        return
+    max_workers = max(1, current_app.config.get('DUPLICATE_HASH_WORKERS', DEFAULT_HASH_WORKERS))
+
+    def run(media_item):
+        try:
+            return hash_func(media_item)
+        except OSError as e:
+            duplicates_logger.warning("Could not hash %s: %s", media_item.filepath, e)
+            return None
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='dup-hash') as pool:
+        for index, (media_item, digest) in enumerate(zip(pending, pool.map(run, pending)), start=1):
+            if digest is not None:
+                setattr(media_item, attr, digest)
+                media_item.hash_mtime = media_item.modification_time
+                media_item.hash_filesize = media_item.filesize
+            if job is not None:
+                job.advance()
+            if index % COMMIT_BATCH_SIZE == 0:
+                db.session.commit()
+    db.session.commit()
+
+def find_duplicates(job=None):
+    """Hashes the files that could be exact duplicates and stores the hashes on Media.
+    Only files sharing a size with another file are read at all; among those, only files that
+    also share a head/tail partial hash are hashed in full. Stored hashes are reused while the
+    file's (modification_time, filesize) is unchanged. Returns get_duplicate_groups().
+    """
+    colliding_sizes = (db.session.query(Media.filesize)
+                       .filter(Media.is_accessible.is_(True), Media.filesize > 0)
+                       .group_by(Media.filesize)
+                       .having(func.count(Media.id) > 1))
+    candidates = (Media.query
+                  .filter(Media.is_accessible.is_(True), Media.filesize.in_(colliding_sizes))
+                  .all())
+    duplicates_logger.info("Duplicate pass: %s files share a size with another file.", len(candidates))
+
+    for media_item in candidates:
+        if media_item.hash_mtime != media_item.modification_time or media_item.hash_filesize != media_item.filesize:
+            media_item.partial_hash = None
+            media_item.content_hash = None
+
+    if job is not None:
+        job.set_total(sum(1 for m in candidates if m.partial_hash is None))
+    _hash_candidates(candidates, lambda m: compute_partial_hash(m.filepath, m.filesize), 'partial_hash', job)
+
+    by_partial = defaultdict(list)
+    for media_item in candidates:
+        if media_item.partial_hash is not None:
+            by_partial[(media_item.filesize, media_item.partial_hash)].append(media_item)
+    full_candidates = [m for group in by_partial.values() if len(group) > 1 for m in group]
+    duplicates_logger.info("Duplicate pass: %s files also share a partial hash; hashing in full.", len(full_candidates))
+
+    if job is not None:
+        job.set_total(job.total + sum(1 for m in full_candidates if m.content_hash is None))
+    _hash_candidates(full_candidates, lambda m: compute_content_hash(m.filepath), 'content_hash', job)
+
+    return get_duplicate_groups()
+
+def get_duplicate_groups():
+    """Groups of accessible media with identical stored content hashes, largest files first.
+    Each group is {'content_hash', 'filesize', 'media': [{'id', 'filepath', 'org_path'}, ...]}.
+    """
+    duplicate_hashes = (db.session.query(Media.content_hash)
+                        .filter(Media.is_accessible.is_(True), Media.content_hash.isnot(None))
+                        .group_by(Media.content_hash)
+                        .having(func.count(Media.id) > 1))
+    rows = (db.session.query(Media.content_hash, Media.filesize, Media.id, Media.filepath, Media.org_path)
+            .filter(Media.is_accessible.is_(True), Media.content_hash.in_(duplicate_hashes))
+            .order_by(Media.filesize.desc(), Media.content_hash, Media.filepath))
+    groups = {}
+    for content_hash, filesize, media_id, filepath, org_path in rows:
+        group = groups.setdefault(content_hash, {'content_hash': content_hash, 'filesize': filesize, 'media': []})
+        group['media'].append({'id': media_id, 'filepath': filepath, 'org_path': org_path})
+    return list(groups.values())
@@ -0,0 +1,134 @@
+import threading
+import itertools
+import uuid
+from collections import deque
+import msgspec
+from .logging_utils import get_logger
+
+events_logger = get_logger('events')
+
+# Change events let open clients patch their state instead of reloading it. Mutators publish a
+# compact delta after their change is committed; /api/events streams them as Server-Sent Events.
+# The bus is per process, like the metrics registry: with several worker processes, a client only
+# sees the changes made through the worker it is connected to.
+#
+# Event types and their data:
+#   tag_added           {id, name}            A global tag was created
+#   tag_deleted         {id, name}            A global tag was deleted (and removed from all media)
+#   media_tags_changed  {media_id, tags}      The full tag name list of one media item after a change
+#   media_tags_added    {media_ids, tags}     Tags added to many media items (batch operations)
+#   media_tags_removed  {media_ids, tags}     Tags removed from many media items (batch operations)
+#   media_removed       {ids}                 Media items deleted (moved to the archive)
+#   library_scanned     {counts}              A scan finished; counts as returned by scan_libraries()
+DEFAULT_EVENT_HISTORY_SIZE = 1000
+DEFAULT_EVENT_KEEPALIVE_SECONDS = 15
+# Each open stream holds a request thread. Streams end after EVENT_STREAM_MAX_SECONDS (the client
+# reconnects with Last-Event-ID, so nothing is lost), which frees threads held by stale connections, and
+# at most EVENT_MAX_STREAMS are open at once (None: no limit; `flask serve` derives one from its threads).
+DEFAULT_EVENT_STREAM_MAX_SECONDS = 300
+
+class EventBus:
+    """Thread-safe publish/subscribe with a bounded history.
+    Every event gets an increasing id. Readers ask for the events after the last id they have seen, so a
+    client reconnecting with Last-Event-ID catches up on what it missed; if those events were already
+    dropped from the history, events_after reports a gap and the client has to resynchronise.
+    Clients see ids as '<boot_id>-<number>' (see format_event_id), so an id from before a restart is
+    recognised as a gap rather than compared with the restarted numbering.
+    """
+
+    def __init__(self, history_size=DEFAULT_EVENT_HISTORY_SIZE):
+        self.boot_id = uuid.uuid4().hex[:12] # Event numbers restart with the process; ids carry the boot id
+        self._history = deque(maxlen=max(1, history_size))
+        self._ids = itertools.count(1)
+        self._last_id = 0
+        self._condition = threading.Condition()
+        self._closed = False
+        self._max_streams = None
+        self._open_streams = 0
+
+    @property
+    def last_id(self):
+        with self._condition:
+            return self._last_id
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def set_history_size(self, history_size):
+        with self._condition:
+            self._history = deque(self._history, maxlen=max(1, history_size))
+
+    def publish(self, event_type, data):
+        with self._condition:
+            event_id = next(self._ids)
+            self._history.append((event_id, event_type, data))
+            self._last_id = event_id
+            self._condition.notify_all()
+        events_logger.debug("Published event %s: %s", event_id, event_type)
+        return event_id
+
+    def events_after(self, last_id, timeout=None):
+        """Returns (events, gap): the (id, type, data) events newer than last_id, waiting up to `timeout`
+        seconds for one to arrive. gap is True when events after last_id are no longer in the history
+    (or last_id was never issued by this bus).
+        Returns immediately, with no events, once the bus is closed.
+        """
+        with self._condition:
+            if last_id > self._last_id: # Not issued by this bus: the client cannot know what it missed
+                return [], True
+            if last_id >= self._last_id and not self._closed:
+                self._condition.wait_for(lambda: self._last_id > last_id or self._closed, timeout)
+            if last_id >= self._last_id:
+                return [], False
+            oldest_id = self._history[0][0]
+            gap = last_id < oldest_id - 1
+            return [event for event in self._history if event[0] > last_id], gap
+
+    def set_max_streams(self, max_streams):
+        with self._condition:
+            self._max_streams = max_streams
+
+    def open_stream(self):
+        """Claims a stream slot. Returns False when EVENT_MAX_STREAMS streams are already open."""
+        with self._condition:
+            if self._max_streams is not None and self._open_streams >= self._max_streams:
+                return False
+            self._open_streams += 1
+            return True
+
+    def close_stream(self):
+        with self._condition:
+            self._open_streams -= 1
+
+    def close(self):
+        """Wakes all waiting readers and makes them return, e.g. before the server shuts down."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+event_bus = EventBus()
+
+def publish(event_type, **data):
+    """Publishes a change event. Call it only after the change is committed."""
+    return event_bus.publish(event_type, data)
+
+def format_event_id(event_id):
+    return f'{event_bus.boot_id}-{event_id}'
+
+def parse_event_id(value):
+    """Returns the event number of an id from format_event_id, or None if it is missing, malformed or
+    was issued before this process started.
+    """
+    boot_id, _, number = (value or '').rpartition('-')
+    if boot_id != event_bus.boot_id or not number.isdigit():
+        return None
+    return int(number)
+
+def format_sse(event_id, event_type, data):
+    """One Server-Sent Events message."""
+    return f'id: {format_event_id(event_id)}\nevent: {event_type}\ndata: {msgspec.json.encode(data).decode()}\n\n'
+
+def init_app(app):
+    event_bus.set_history_size(app.config.get('EVENT_HISTORY_SIZE', DEFAULT_EVENT_HISTORY_SIZE))
+    event_bus.set_max_streams(app.config.get('EVENT_MAX_STREAMS'))
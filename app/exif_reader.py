@@ -0,0 +1,374 @@
+import os
+import struct
+from datetime import datetime
+from .logging_utils import get_logger, RateLimitedLog
+
+exif_reader_logger = get_logger('exif_reader')
+per_file_log = RateLimitedLog(exif_reader_logger)
+
+# Header-only metadata reader for the scanner.
+# One bounded read of the start of the file normally covers everything needed: JPEG APP1 (EXIF) and
+# SOF segments, the TIFF header and IFDs, or the ISO-BMFF 'meta' box of HEIF/AVIF. Data outside
+# that prefix (a large EXIF thumbnail or ICC profile before the SOF, TIFF IFDs at the end of the
+# file, the HEIF Exif item) is fetched with targeted seek+read calls. No pixel data is decoded and no Pillow
+# objects are created; read_metadata() returns None for anything it does not understand so the
+# caller can fall back to Pillow.
+
+HEADER_READ_SIZE = 16 * 1024 # Covers the EXIF block and SOF of typical camera JPEGs without a thumbnail
+WINDOW_READ_SIZE = 4 * 1024 # Minimum size of follow-up reads outside the prefix
+
+# EXIF tag IDs (see PIL.ExifTags.Base / GPS)
+EXIF_IFD_POINTER = 0x8769
+GPS_IFD_POINTER = 0x8825
+TAG_IMAGE_WIDTH = 0x0100
+TAG_IMAGE_LENGTH = 0x0101
+TAG_MAKE = 0x010F
+TAG_MODEL = 0x0110
+TAG_ORIENTATION = 0x0112
+TAG_DATETIME_ORIGINAL = 0x9003
+TAG_DATETIME_DIGITIZED = 0x9004
+TAG_LENS_MODEL = 0xA434
+GPS_LATITUDE_REF, GPS_LATITUDE, GPS_LONGITUDE_REF, GPS_LONGITUDE = 1, 2, 3, 4
+
+METADATA_TEXT_MAX_LENGTH = 100 # Matches the String(100) columns on Media
+
+# Media columns filled by the metadata readers, besides capture_time.
+IMAGE_METADATA_FIELDS = ('width', 'height', 'orientation', 'camera_make', 'camera_model', 'lens_model', 'gps_latitude', 'gps_longitude')
+
+IFD0_TAGS = {TAG_IMAGE_WIDTH, TAG_IMAGE_LENGTH, TAG_MAKE, TAG_MODEL, TAG_ORIENTATION,
+             TAG_DATETIME_ORIGINAL, TAG_DATETIME_DIGITIZED, EXIF_IFD_POINTER, GPS_IFD_POINTER}
+EXIF_IFD_TAGS = {TAG_DATETIME_ORIGINAL, TAG_DATETIME_DIGITIZED, TAG_LENS_MODEL}
+GPS_IFD_TAGS = {GPS_LATITUDE_REF, GPS_LATITUDE, GPS_LONGITUDE_REF, GPS_LONGITUDE}
+
+# TIFF field type -> (struct code, size in bytes)
+TIFF_TYPES = {1: ('B', 1), 2: ('s', 1), 3: ('H', 2), 4: ('L', 4), 5: ('LL', 8), 7: ('B', 1),
+              9: ('l', 4), 10: ('ll', 8)}
+MAX_IFD_ENTRIES = 1000
+MAX_TAG_VALUE_BYTES = 4096
+
+# JPEG start-of-frame markers carrying the image size (not DHT C4, JPG C8, DAC CC)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+HEIF_BRANDS = {b'heic', b'heix', b'heim', b'heis', b'hevc', b'hevx', b'mif1', b'msf1', b'avif', b'avis'}
+
+class MetadataFormatError(Exception):
+    """The file is not in a layout this reader understands."""
+
+def exif_text(value):
+    if isinstance(value, bytes):
+        value = value.decode('utf-8', errors='ignore')
+    if not isinstance(value, str):
+        return None
+    value = value.strip().strip('\x00').strip()
+    return value[:METADATA_TEXT_MAX_LENGTH] or None
+
+def exif_datetime(value, tag_name, filepath):
+    date_str = exif_text(value)
+    if not date_str:
+        return None
+    try:
+        return datetime.strptime(date_str, '%Y:%m:%d %H:%M:%S')
+    except ValueError:
+        per_file_log.warning('bad_date', "EXIF: Could not parse date string '%s' from %s in %s", date_str, tag_name, filepath)
+        return None
+
+def gps_coordinate(dms, ref):
+    """((deg), (min), (sec)) rationals plus 'N'/'S'/'E'/'W' -> signed decimal degrees."""
+    try:
+        degrees, minutes, seconds = (float(part) for part in dms)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    coordinate = degrees + minutes / 60 + seconds / 3600
+    if exif_text(ref) in ('S', 'W'):
+        coordinate = -coordinate
+    return round(coordinate, 6)
+
+def empty_metadata():
+    return dict.fromkeys(('capture_time',) + IMAGE_METADATA_FIELDS)
+
+def apply_exif_fields(metadata, ifd0, exif_ifd, gps_ifd, filepath):
+    """Fills `metadata` from {tag: value} dicts of IFD0, the Exif sub-IFD and the GPS IFD."""
+    for tag_id, tag_name in ((TAG_DATETIME_ORIGINAL, 'DateTimeOriginal'), (TAG_DATETIME_DIGITIZED, 'DateTimeDigitized')):
+        # Capture times live in the Exif sub-IFD; some older writers put them in IFD0.
+        metadata['capture_time'] = (exif_datetime(exif_ifd.get(tag_id), tag_name, filepath)
+                                    or exif_datetime(ifd0.get(tag_id), tag_name, filepath))
+        if metadata['capture_time']:
+            break
+    orientation = ifd0.get(TAG_ORIENTATION)
+    if isinstance(orientation, int) and 1 <= orientation <= 8:
+        metadata['orientation'] = orientation
+    metadata['camera_make'] = exif_text(ifd0.get(TAG_MAKE))
+    metadata['camera_model'] = exif_text(ifd0.get(TAG_MODEL))
+    metadata['lens_model'] = exif_text(exif_ifd.get(TAG_LENS_MODEL))
+    if GPS_LATITUDE in gps_ifd and GPS_LONGITUDE in gps_ifd:
+        metadata['gps_latitude'] = gps_coordinate(gps_ifd[GPS_LATITUDE], gps_ifd.get(GPS_LATITUDE_REF))
+        metadata['gps_longitude'] = gps_coordinate(gps_ifd[GPS_LONGITUDE], gps_ifd.get(GPS_LONGITUDE_REF))
+
+def apply_display_size(metadata, width, height):
+    """Stores width/height as displayed, i.e. swapped for EXIF orientations 5-8 (rotated by 90 degrees)."""
+    if metadata['orientation'] in (5, 6, 7, 8):
+        width, height = height, width
+    metadata['width'], metadata['height'] = width, height
+
+class _ByteSource:
+    """Random access over a file, served from the header prefix where possible."""
+
+    def __init__(self, f, prefix):
+        self.f = f
+        self.prefix = prefix
+        self.window_offset = 0
+        self.window = b''
+
+    def read_at(self, offset, size):
+        end = offset + size
+        if end <= len(self.prefix):
+            return self.prefix[offset:end]
+        if self.window_offset <= offset and end <= self.window_offset + len(self.window):
+            start = offset - self.window_offset
+            return self.window[start:start + size]
+        # Read at least a window so that walking small structures (JPEG segment headers, IFD entries)
+        # beyond the prefix does not cost one read per field.
+        self.f.seek(offset)
+        data = self.f.read(max(size, WINDOW_READ_SIZE))
+        if len(data) < size:
+            raise MetadataFormatError('Unexpected end of file.')
+        self.window_offset, self.window = offset, data
+        return data[:size]
+
+class _TiffReader:
+    """Reads selected tags from a TIFF structure starting at `base` within `source`."""
+
+    def __init__(self, source, base):
+        self.source = source
+        self.base = base
+        header = source.read_at(base, 8)
+        if header[:4] == b'II*\x00':
+            self.endian = '<'
+        elif header[:4] == b'MM\x00*':
+            self.endian = '>'
+        else:
+            raise MetadataFormatError('Not a TIFF header.')
+        self.ifd0_offset = struct.unpack(self.endian + 'L', header[4:8])[0]
+
+    def read_ifd(self, offset, wanted_tags):
+        if not offset:
+            return {}
+        count = struct.unpack(self.endian + 'H', self.source.read_at(self.base + offset, 2))[0]
+        if count > MAX_IFD_ENTRIES:
+            raise MetadataFormatError('Implausible IFD entry count.')
+        entries = self.source.read_at(self.base + offset + 2, count * 12)
+        values = {}
+        for index in range(count):
+            tag, field_type, value_count = struct.unpack_from(self.endian + 'HHL', entries, index * 12)
+            if tag not in wanted_tags or field_type not in TIFF_TYPES:
+                continue
+            code, size = TIFF_TYPES[field_type]
+            total = size * value_count
+            if total > MAX_TAG_VALUE_BYTES:
+                continue
+            if total <= 4:
+                raw = entries[index * 12 + 8:index * 12 + 8 + total]
+            else:
+                value_offset = struct.unpack_from(self.endian + 'L', entries, index * 12 + 8)[0]
+                raw = self.source.read_at(self.base + value_offset, total)
+            values[tag] = self._decode(field_type, code, value_count, raw)
+        return values
+
+    def _decode(self, field_type, code, value_count, raw):
+        if field_type == 2: # ASCII
+            return raw.split(b'\x00', 1)[0].decode('utf-8', errors='ignore')
+        if field_type in (5, 10): # (S)RATIONAL
+            numbers = struct.unpack(self.endian + code * value_count, raw)
+            values = tuple(numerator / denominator if denominator else 0.0
+                           for numerator, denominator in zip(numbers[::2], numbers[1::2]))
+        else:
+            values = struct.unpack(self.endian + code * value_count, raw)
+        return values[0] if value_count == 1 else values
+
+    def read_exif(self):
+        """Returns (ifd0, exif_ifd, gps_ifd) restricted to the tags the scanner stores."""
+        ifd0 = self.read_ifd(self.ifd0_offset, IFD0_TAGS)
+        exif_ifd = self.read_ifd(ifd0.get(EXIF_IFD_POINTER, 0), EXIF_IFD_TAGS)
+        gps_ifd = self.read_ifd(ifd0.get(GPS_IFD_POINTER, 0), GPS_IFD_TAGS)
+        return ifd0, exif_ifd, gps_ifd
+
+def _read_jpeg(source, filepath):
+    metadata = empty_metadata()
+    size = None
+    exif_seen = False
+    offset = 2 # After SOI
+    while size is None:
+        marker_header = source.read_at(offset, 4)
+        if marker_header[0] != 0xFF:
+            raise MetadataFormatError('Lost JPEG marker sync.')
+        marker = marker_header[1]
+        if marker == 0xFF: # Fill byte
+            offset += 1
+            continue
+        if marker in (0xD9, 0xDA): # EOI / SOS before any SOF
+            raise MetadataFormatError('No SOF marker before image data.')
+        if 0xD0 <= marker <= 0xD7 or marker == 0x01: # Markers without a length
+            offset += 2
+            continue
+        segment_length = struct.unpack('>H', marker_header[2:4])[0]
+        if marker == 0xE1 and not exif_seen: # APP1; XMP also uses APP1, only the first Exif one counts
+            if source.read_at(offset + 4, 6) == b'Exif\x00\x00':
+                exif_seen = True
+                ifd0, exif_ifd, gps_ifd = _TiffReader(source, offset + 10).read_exif()
+                apply_exif_fields(metadata, ifd0, exif_ifd, gps_ifd, filepath)
+        elif marker in JPEG_SOF_MARKERS:
+            height, width = struct.unpack('>HH', source.read_at(offset + 5, 4))
+            size = (width, height)
+        offset += 2 + segment_length
+    apply_display_size(metadata, *size)
+    return metadata
+
+def _read_tiff(source, filepath):
+    metadata = empty_metadata()
+    tiff = _TiffReader(source, 0)
+    ifd0, exif_ifd, gps_ifd = tiff.read_exif()
+    apply_exif_fields(metadata, ifd0, exif_ifd, gps_ifd, filepath)
+    if TAG_IMAGE_WIDTH not in ifd0 or TAG_IMAGE_LENGTH not in ifd0:
+        raise MetadataFormatError('TIFF without image size.')
+    apply_display_size(metadata, ifd0[TAG_IMAGE_WIDTH], ifd0[TAG_IMAGE_LENGTH])
+    return metadata
+
+def _iter_boxes(source, start, end):
+    """Yields (type, payload offset, payload end) for ISO-BMFF boxes between start and end."""
+    offset = start
+    while offset + 8 <= end:
+        box_size, box_type = struct.unpack('>L4s', source.read_at(offset, 8))
+        header_size = 8
+        if box_size == 1:
+            box_size = struct.unpack('>Q', source.read_at(offset + 8, 8))[0]
+            header_size = 16
+        elif box_size == 0:
+            box_size = end - offset
+        if box_size < header_size:
+            raise MetadataFormatError('Invalid box size.')
+        yield box_type, offset + header_size, min(offset + box_size, end)
+        offset += box_size
+
+def _read_sized(data, pos, size):
+    if size == 0:
+        return 0, pos
+    return int.from_bytes(data[pos:pos + size], 'big'), pos + size
+
+def _parse_iloc(data):
+    """Returns {item_id: (offset, length)} for single-extent, file-offset items of an 'iloc' payload."""
+    version = data[0]
+    offset_size, length_size = data[4] >> 4, data[4] & 0x0F
+    base_offset_size, index_size = data[5] >> 4, (data[5] & 0x0F if version in (1, 2) else 0)
+    pos = 6
+    if version < 2:
+        item_count, pos = struct.unpack_from('>H', data, pos)[0], pos + 2
+    else:
+        item_count, pos = struct.unpack_from('>L', data, pos)[0], pos + 4
+    locations = {}
+    for _ in range(item_count):
+        if version < 2:
+            item_id, pos = struct.unpack_from('>H', data, pos)[0], pos + 2
+        else:
+            item_id, pos = struct.unpack_from('>L', data, pos)[0], pos + 4
+        construction_method = 0
+        if version in (1, 2):
+            construction_method, pos = struct.unpack_from('>H', data, pos)[0] & 0x0F, pos + 2
+        pos += 2 # data_reference_index
+        base_offset, pos = _read_sized(data, pos, base_offset_size)
+        extent_count, pos = struct.unpack_from('>H', data, pos)[0], pos + 2
+        extents = []
+        for _ in range(extent_count):
+            _, pos = _read_sized(data, pos, index_size)
+            extent_offset, pos = _read_sized(data, pos, offset_size)
+            extent_length, pos = _read_sized(data, pos, length_size)
+            extents.append((base_offset + extent_offset, extent_length))
+        if construction_method == 0 and len(extents) == 1:
+            locations[item_id] = extents[0]
+    return locations
+
+def _read_heif(source, file_size, filepath):
+    metadata = empty_metadata()
+    meta_box = None
+    for box_type, start, end in _iter_boxes(source, 0, file_size):
+        if box_type == b'meta':
+            meta_box = (start + 4, end) # Full box: skip version/flags
+            break
+    if meta_box is None:
+        raise MetadataFormatError('No meta box.')
+
+    exif_item_ids, locations, sizes = [], {}, []
+    for box_type, start, end in _iter_boxes(source, *meta_box):
+        if box_type == b'iinf':
+            version = source.read_at(start, 1)[0]
+            entries_start = start + (6 if version == 0 else 8)
+            for entry_type, entry_start, entry_end in _iter_boxes(source, entries_start, end):
+                if entry_type != b'infe':
+                    continue
+                entry = source.read_at(entry_start, min(entry_end - entry_start, 16))
+                if entry[0] == 2:
+                    item_id, item_type = struct.unpack_from('>H', entry, 4)[0], entry[8:12]
+                elif entry[0] == 3:
+                    item_id, item_type = struct.unpack_from('>L', entry, 4)[0], entry[10:14]
+                else:
+                    continue
+                if item_type == b'Exif':
+                    exif_item_ids.append(item_id)
+        elif box_type == b'iloc':
+            locations = _parse_iloc(source.read_at(start, end - start))
+        elif box_type == b'iprp':
+            for prop_type, prop_start, prop_end in _iter_boxes(source, start, end):
+                if prop_type != b'ipco':
+                    continue
+                for child_type, child_start, _ in _iter_boxes(source, prop_start, prop_end):
+                    if child_type == b'ispe':
+                        sizes.append(struct.unpack('>LL', source.read_at(child_start + 4, 8)))
+
+    for item_id in exif_item_ids:
+        if item_id in locations:
+            item_offset, item_length = locations[item_id]
+            tiff_header_offset = struct.unpack('>L', source.read_at(item_offset, 4))[0]
+            if 4 + tiff_header_offset < item_length:
+                ifd0, exif_ifd, gps_ifd = _TiffReader(source, item_offset + 4 + tiff_header_offset).read_exif()
+                apply_exif_fields(metadata, ifd0, exif_ifd, gps_ifd, filepath)
+            break
+    if not sizes:
+        raise MetadataFormatError('No image spatial extents.')
+    # The primary image (or its grid) is the largest extent; tiles and thumbnails are smaller.
+    apply_display_size(metadata, *max(sizes, key=lambda size: size[0] * size[1]))
+    return metadata
+
+def _read_png(prefix):
+    if prefix[12:16] != b'IHDR':
+        raise MetadataFormatError('PNG without IHDR.')
+    metadata = empty_metadata()
+    apply_display_size(metadata, *struct.unpack('>LL', prefix[16:24]))
+    return metadata
+
+def _read_gif(prefix):
+    metadata = empty_metadata()
+    apply_display_size(metadata, *struct.unpack('<HH', prefix[6:10]))
+    return metadata
+
+def read_metadata(filepath):
+    """Reads the same fields as the Pillow path (capture_time, width, height, orientation, camera
+    make/model, lens, GPS) for JPEG, TIFF, HEIF/AVIF, PNG and GIF straight from the file header.
+
+    Returns None if the format is not supported or its structure is not understood, so the caller
+    can fall back to Pillow. I/O errors (e.g. FileNotFoundError) propagate.
+    """
+    with open(filepath, 'rb') as f:
+        prefix = f.read(HEADER_READ_SIZE)
+        source = _ByteSource(f, prefix)
+        try:
+            if prefix[:2] == b'\xff\xd8':
+                return _read_jpeg(source, filepath)
+            if prefix[:4] in (b'II*\x00', b'MM\x00*'):
+                return _read_tiff(source, filepath)
+            if prefix[4:8] == b'ftyp' and prefix[8:12] in HEIF_BRANDS:
+                return _read_heif(source, os.fstat(f.fileno()).st_size, filepath)
+            if prefix[:8] == b'\x89PNG\r\n\x1a\n':
+                return _read_png(prefix)
+            if prefix[:6] in (b'GIF87a', b'GIF89a'):
+                return _read_gif(prefix)
+        except (MetadataFormatError, struct.error, IndexError, ValueError) as e:
+            per_file_log.debug('fallback', "Header metadata reader could not parse %s (%s); falling back to Pillow.", filepath, e)
+    return None
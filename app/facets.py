@@ -0,0 +1,62 @@
+from sqlalchemy import func
+from .models import db, Media, Tag, media_tag
+from .cache import VersionedCache
+
+_facets_cache = VersionedCache(maxsize=64)
+
+def _base_filters(media_types=None, org_path=None, tag=None):
+    filters = [Media.is_accessible.is_(True)]
+    if media_types:
+        filters.append(Media.media_type.in_(media_types))
+    if org_path:
+        filters.append(Media.org_path == org_path)
+    if tag:
+        tagged_ids = (db.session.query(media_tag.c.media_id)
+                      .join(Tag, Tag.id == media_tag.c.tag_id)
+                      .filter(Tag.name == tag))
+        filters.append(Media.id.in_(tagged_ids))
+    return filters
+
+def _grouped_counts(column, filters):
+    return (db.session.query(column, func.count(Media.id))
+            .filter(*filters)
+            .group_by(column)
+            .order_by(column))
+
+def _compute_facets(media_types, org_path, tag):
+    filters = _base_filters(media_types, org_path, tag)
+
+    total = db.session.query(func.count(Media.id)).filter(*filters).scalar() or 0
+
+    media_type_counts = {media_type: count for media_type, count in _grouped_counts(Media.media_type, filters)}
+    org_path_counts = [{'org_path': path, 'count': count} for path, count in _grouped_counts(Media.org_path, filters)]
+
+    tag_rows = (db.session.query(Tag.id, Tag.name, func.count(media_tag.c.media_id))
+                .join(media_tag, media_tag.c.tag_id == Tag.id)
+                .join(Media, Media.id == media_tag.c.media_id)
+                .filter(*filters)
+                .group_by(Tag.id, Tag.name)
+                .order_by(Tag.name))
+    tag_counts = [{'id': tag_id, 'name': name, 'count': count} for tag_id, name, count in tag_rows]
+
+    year_col = func.strftime('%Y', Media.capture_time)
+    month_col = func.strftime('%Y-%m', Media.capture_time)
+    year_counts = [{'year': year, 'count': count} for year, count in _grouped_counts(year_col, filters) if year]
+    month_counts = [{'month': month, 'count': count} for month, count in _grouped_counts(month_col, filters) if month]
+
+    return {
+        'total': total,
+        'media_types': media_type_counts,
+        'org_paths': org_path_counts,
+        'tags': tag_counts,
+        'years': year_counts,
+        'months': month_counts,
+    }
+
+def get_facets(media_types=None, org_path=None, tag=None):
+    """Counts of accessible media per tag, org_path, media_type and capture year/month.
+    Optional org_path/tag arguments narrow the counted set (e.g. tag counts within one library).
+    Results are cached until the library data version changes.
+    """
+    key = (tuple(sorted(media_types or ())), org_path or None, tag or None)
+    return _facets_cache.get_or_compute(key, lambda: _compute_facets(media_types, org_path, tag))
@@ -1,74 +1,189 @@
 import os
+import errno
 import shutil
-import logging
+import threading
+import uuid
 from datetime import datetime
+from .logging_utils import get_logger
 
-file_utils_logger = logging.getLogger('photo_album_manager.file_utils')
-if not file_utils_logger.handlers:
-    handler = logging.StreamHandler()
-    formatter = logging.Formatter('%(asctime)s - FILE_UTILS - %(levelname)s - %(message)s')
-    handler.setFormatter(formatter)
-    file_utils_logger.addHandler(handler)
-    file_utils_logger.setLevel(logging.DEBUG)
-    file_utils_logger.propagate = False
+file_utils_logger = get_logger('file_utils')
 
-def move_media_to_archive(media_filepath, archive_base_path):
+# Chunk size for kernel-side copies (copy_file_range) when the archive lives on another device.
+COPY_CHUNK_SIZE = 64 * 1024 * 1024
+# Archive names tried for one file when targets keep appearing outside this process.
+MAX_PLACEMENT_ATTEMPTS = 10
+
+class ArchiveNameReserver:
+    """Hands out conflict-free filenames inside an archive directory (created if needed).
+    A name is reserved from reserve() until release(), i.e. for the duration of one move, so concurrent
+    moves of files with the same name never pick the same target; names already on disk are skipped.
+    Files placed there by other programs in between are caught when the move refuses to replace them
+    (see _relocate_file). Use get_archive_name_reserver() so that all jobs moving into one directory
+    share an instance.
+    """
+
+    def __init__(self, archive_base_path):
+        self.archive_base_path = archive_base_path
+        self._lock = threading.Lock()
+        self._in_flight = set()
+        os.makedirs(archive_base_path, exist_ok=True)
+
+    def _is_taken(self, filename):
+        return filename in self._in_flight or os.path.lexists(os.path.join(self.archive_base_path, filename))
+
+    def reserve(self, original_filename):
+        """Returns a free target path for original_filename (None if no free name was found); pass it to
+        release() once the move is over.
+        """
+        filename_root, filename_ext = os.path.splitext(original_filename)
+        with self._lock:
+            candidate = original_filename
+            counter = 1
+            while self._is_taken(candidate):
+                # Filename conflict: try appending _1, _2, etc.
+                candidate = f"{filename_root}_{counter}{filename_ext}"
+                counter += 1
+                if counter > 99 and self._is_taken(candidate): # Safety break for counter, try timestamp
+                    timestamp_suffix = datetime.now().strftime("%Y%m%d%H%M%S%f")
+                    candidate = f"{filename_root}_{timestamp_suffix}{filename_ext}"
+                    file_utils_logger.info("Used timestamp suffix for %s due to multiple conflicts. New name: %s", original_filename, candidate)
+                    if self._is_taken(candidate):
+                        return None
+                    break
+            self._in_flight.add(candidate)
+            return os.path.join(self.archive_base_path, candidate)
+
+    def release(self, reserved_path):
+        with self._lock:
+            self._in_flight.discard(os.path.basename(reserved_path))
+
+_reservers = {}
+_reservers_lock = threading.Lock()
+
+def get_archive_name_reserver(archive_base_path):
+    """The process-wide ArchiveNameReserver for archive_base_path (created, with the directory, on first use)."""
+    key = os.path.normcase(os.path.abspath(archive_base_path))
+    with _reservers_lock:
+        reserver = _reservers.get(key)
+        if reserver is None:
+            reserver = _reservers[key] = ArchiveNameReserver(archive_base_path)
+        return reserver
+
+def _copy_file_offloaded(src, dst):
+    """Copies src to dst (which must not exist), letting the kernel move the bytes where possible."""
+    copy_file_range = getattr(os, 'copy_file_range', None) # Linux 4.5+ / Python 3.8+
+    if copy_file_range is not None:
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'xb') as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    copied = copy_file_range(fsrc.fileno(), fdst.fileno(), min(remaining, COPY_CHUNK_SIZE))
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            if remaining == 0:
+                return
+        except FileExistsError:
+            raise
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EPERM, errno.EBADF):
+                raise
+            file_utils_logger.debug("copy_file_range unavailable for '%s' -> '%s' (%s), falling back.", src, dst, e)
+        os.remove(dst) # Discard the partial copy before retrying
+    # shutil.copyfile uses sendfile()/fcopyfile() itself when the platform supports it.
+    shutil.copyfile(src, dst)
+
+# errno values with which os.link reports that the filesystem does not support hard links
+_LINK_UNSUPPORTED_ERRNOS = {errno.EPERM, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EMLINK, errno.ENOSYS, errno.EACCES}
+
+def _place_without_replacing(src, dst):
+    """Gives the file at src the name dst on the same filesystem and removes src. Never replaces an
+    existing dst: raises FileExistsError instead. Raises OSError(EXDEV) across filesystems.
+    """
+    try:
+        os.link(src, dst) # Fails if dst exists, unlike os.rename
+    except FileExistsError:
+        raise
+    except OSError as e:
+        if e.errno not in _LINK_UNSUPPORTED_ERRNOS:
+            raise
+        # No hard links here: check, then rename. Names are reserved per process, so only another
+        # program creating dst in between could still be overwritten.
+        if os.path.lexists(dst):
+            raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), dst)
+        os.rename(src, dst)
+        return
+    os.unlink(src)
+
+def _relocate_file(src, dst):
+    """Moves src to dst without ever replacing an existing dst (raises FileExistsError)."""
+    try:
+        _place_without_replacing(src, dst) # Same filesystem: metadata-only move, no data copied
+        return
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    # Another filesystem: copy to a temporary name next to dst, then place it under the final name.
+    temp_path = os.path.join(os.path.dirname(dst), f".{os.path.basename(dst)}.{uuid.uuid4().hex}.partial")
+    try:
+        _copy_file_offloaded(src, temp_path)
+        shutil.copystat(src, temp_path)
+        _place_without_replacing(temp_path, dst)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    os.remove(src)
+
+def move_media_to_archive(media_filepath, archive_base_path, name_reserver=None):
     """Moves a media file to the archive directory, handling filename conflicts.
     Args:
         media_filepath (str): Absolute path to the media file to move.
         archive_base_path (str): Absolute path to the base archive directory.
+        name_reserver (ArchiveNameReserver, optional): Reserver for the archive directory; defaults to
+            the process-wide one from get_archive_name_reserver().
     Returns:
         str: The new full path of the moved file if successful, None otherwise.
     """
     if not os.path.isabs(media_filepath):
-        file_utils_logger.error(f"Source path is not absolute: {media_filepath}")
+        file_utils_logger.error("Source path is not absolute: %s", media_filepath)
         return None
     if not os.path.isabs(archive_base_path):
-        file_utils_logger.error(f"Archive path is not absolute: {archive_base_path}")
+        file_utils_logger.error("Archive path is not absolute: %s", archive_base_path)
         return None
 
     if not os.path.exists(media_filepath):
-        file_utils_logger.error(f"File to move does not exist: {media_filepath}")
+        file_utils_logger.error("File to move does not exist: %s", media_filepath)
         return None
 
-    if not os.path.isdir(archive_base_path): # Ensure archive_base_path is a directory
+    if name_reserver is None:
         try:
-            # exist_ok=True means it won't raise an error if the directory already exists.
-            # It will raise an OSError if the path exists but is not a directory.
-            os.makedirs(archive_base_path, exist_ok=True)
-            file_utils_logger.info(f"Created archive directory: {archive_base_path}")
+            name_reserver = get_archive_name_reserver(archive_base_path) # Also creates the directory
         except OSError as e:
-            file_utils_logger.error(f"Failed to create archive directory {archive_base_path} (it might exist as a file): {e}", exc_info=True)
+            file_utils_logger.error("Failed to create archive directory %s (it might exist as a file): %s", archive_base_path, e, exc_info=True)
             return None
 
     original_filename = os.path.basename(media_filepath)
-    filename_root, filename_ext = os.path.splitext(original_filename)
-
-    destination_filepath = os.path.join(archive_base_path, original_filename)
-    counter = 1
-    while os.path.exists(destination_filepath):
-        # Filename conflict: try appending _1, _2, etc.
-        new_filename = f"{filename_root}_{counter}{filename_ext}"
-        destination_filepath = os.path.join(archive_base_path, new_filename)
-        if not os.path.exists(destination_filepath):
-            break # Found a unique name with counter
-        counter += 1
-        if counter > 99: # Safety break for counter, try timestamp
-            timestamp_suffix = datetime.now().strftime("%Y%m%d%H%M%S%f") # Added microseconds for more uniqueness
-            new_filename = f"{filename_root}_{timestamp_suffix}{filename_ext}"
-            destination_filepath = os.path.join(archive_base_path, new_filename)
-            if not os.path.exists(destination_filepath):
-                file_utils_logger.info(f"Used timestamp suffix for {original_filename} due to multiple conflicts. New name: {new_filename}")
-                break # Found a unique name with timestamp
-            else:
-                 # Extremely unlikely to happen if microseconds are used.
-                 file_utils_logger.error(f"Timestamped file {destination_filepath} also exists. Cannot resolve conflict automatically for {original_filename}.")
-                 return None
-    try:
-        file_utils_logger.info(f"Attempting to move '{media_filepath}' to '{destination_filepath}'")
-        shutil.move(media_filepath, destination_filepath)
-        file_utils_logger.info(f"Successfully moved '{media_filepath}' to '{destination_filepath}'")
-        return destination_filepath
-    except Exception as e:
-        file_utils_logger.error(f"Error moving file '{media_filepath}' to '{destination_filepath}': {e}", exc_info=True)
-        return None
+    for _ in range(MAX_PLACEMENT_ATTEMPTS):
+        destination_filepath = name_reserver.reserve(original_filename)
+        if destination_filepath is None:
+            # Extremely unlikely to happen if microseconds are used.
+            file_utils_logger.error("Cannot resolve archive filename conflict automatically for %s.", original_filename)
+            return None
+        try:
+            file_utils_logger.info("Attempting to move '%s' to '%s'", media_filepath, destination_filepath)
+            _relocate_file(media_filepath, destination_filepath)
+            file_utils_logger.info("Successfully moved '%s' to '%s'", media_filepath, destination_filepath)
+            return destination_filepath
+        except FileExistsError:
+            # Created by another program after the name was chosen; try the next one.
+            file_utils_logger.warning("Archive target '%s' appeared meanwhile; choosing another name.", destination_filepath)
+        except Exception as e:
+            file_utils_logger.error("Error moving file '%s' to '%s': %s", media_filepath, destination_filepath, e, exc_info=True)
+            return None
+        finally:
+            name_reserver.release(destination_filepath) # Once placed (or not), the file on disk holds the name
+    file_utils_logger.error("Gave up moving '%s' after %s conflicting archive names.", media_filepath, MAX_PLACEMENT_ATTEMPTS)
+    return None
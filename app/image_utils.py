@@ -1,8 +1,15 @@
 import os
-from PIL import Image, ImageOps
 from flask import current_app
+from .similarity import compute_dhash
+from .logging_utils import get_logger, RateLimitedLog
+
+image_utils_logger = get_logger('image_utils')
+per_thumbnail_log = RateLimitedLog(image_utils_logger) # Thumbnails are generated in bursts of one page
 
 DEFAULT_THUMBNAIL_SIZE = (256, 256) # Width, Height
+# Decode size behind every stored perceptual hash (thumbnails and compute_dhash_for_file), so a file's
+# hash does not depend on which of them computed it.
+HASH_DECODE_SIZE = DEFAULT_THUMBNAIL_SIZE
 
 def get_thumbnail_path(media_id, filename_prefix="thumb"):
     """Constructs the path for a thumbnail based on media_id."""
@@ -14,11 +21,24 @@ def get_thumbnail_path(media_id, filename_prefix="thumb"):
     thumbnail_dir = os.path.join(base_dir, 'data', 'thumbnails')
     return os.path.join(thumbnail_dir, thumbnail_filename), thumbnail_dir, thumbnail_filename
 
+def open_oriented_image(filepath, min_size):
+    """Opens an image for downscaling: JPEG decoding is reduced to the smallest scale that still covers
+       min_size, and the EXIF orientation is applied. The caller closes the returned image.
+    """
+    from PIL import Image, ImageOps
+    img = Image.open(filepath)
+    img.draft('RGB', min_size) # No-op for formats other than JPEG
+    return ImageOps.exif_transpose(img)
+
 def generate_thumbnail(media_item, size=DEFAULT_THUMBNAIL_SIZE, force_generate=False):
     """Generates a square cropped thumbnail for the given media_item (if it's an image).
        Saves it to the thumbnails directory and returns the path to the thumbnail.
+       Also sets media_item.phash if it is missing (the caller commits it).
        Returns None if media is not an image or if generation fails.
     """
+    # Pillow is imported where it is used rather than at module level, so starting the app or a CLI
+    # command that never decodes an image does not pay for it.
+    from PIL import Image, ImageOps
     if media_item.media_type != 'image':
         return None
 
@@ -28,21 +48,27 @@ def generate_thumbnail(media_item, size=DEFAULT_THUMBNAIL_SIZE, force_generate=F
         try:
             os.makedirs(thumb_dir)
         except OSError as e:
-            print(f"Error creating thumbnail directory {thumb_dir}: {e}")
+            image_utils_logger.error("Error creating thumbnail directory %s: %s", thumb_dir, e)
             return None
 
     if os.path.exists(thumb_path) and not force_generate:
         return thumb_path # Thumbnail already exists
 
     if not os.path.exists(media_item.filepath):
-        print(f"Original media file not found: {media_item.filepath}")
+        per_thumbnail_log.warning('missing', "Original media file not found: %s", media_item.filepath)
         return None
 
     try:
-        img = Image.open(media_item.filepath)
+        # Decoded at reduced scale (JPEG) and orientation-corrected before any other processing
+        img = open_oriented_image(media_item.filepath, size)
 
-        # Apply EXIF orientation correction before any other processing
-        img = ImageOps.exif_transpose(img)
+        # The image is already decoded here, so record its perceptual hash while we're at it. It is only
+        # taken from the decode that compute_dhash_for_file also uses.
+        if getattr(media_item, 'phash', None) is None and size == HASH_DECODE_SIZE:
+            try:
+                media_item.phash = compute_dhash(img)
+            except Exception as e:
+                per_thumbnail_log.warning('phash_error', "Error computing perceptual hash for %s: %s", media_item.filepath, e)
 
         # Convert to RGB if it's a palette-based image (e.g., some PNGs) or has alpha, to ensure JPEG saving works.
         if img.mode == 'P' or img.mode == 'RGBA' or img.mode == 'LA':
@@ -54,13 +80,13 @@ def generate_thumbnail(media_item, size=DEFAULT_THUMBNAIL_SIZE, force_generate=F
         thumb = ImageOps.fit(img, size, Image.Resampling.LANCZOS) # High quality downsampling
 
         thumb.save(thumb_path, 'JPEG', quality=90)
-        print(f"Thumbnail generated for {media_item.filename} at {thumb_path}")
+        per_thumbnail_log.debug('generated', "Thumbnail generated for %s at %s", media_item.filename, thumb_path)
         return thumb_path
     except FileNotFoundError:
-        print(f"Error: Original file not found during thumbnail generation for {media_item.filepath}")
+        per_thumbnail_log.warning('missing', "Original file not found during thumbnail generation for %s", media_item.filepath)
         return None
     except Exception as e:
-        print(f"Error generating thumbnail for {media_item.filepath}: {e}")
+        per_thumbnail_log.error('error', "Error generating thumbnail for %s: %s", media_item.filepath, e)
         # Attempt to remove partially created thumbnail if save failed mid-way
         if os.path.exists(thumb_path):
             try:
@@ -0,0 +1,102 @@
+import threading
+import time
+import uuid
+from datetime import datetime
+from flask import current_app
+from .logging_utils import get_logger
+
+jobs_logger = get_logger('jobs')
+
+# Finished jobs are kept around so clients can still poll their result, but only the most recent ones.
+MAX_FINISHED_JOBS = 50
+
+class Job:
+    """A unit of background work with progress that API clients can poll."""
+
+    def __init__(self, kind):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = 'pending' # 'pending' -> 'running' -> 'done' | 'failed'
+        self.total = 0
+        self.done = 0
+        self.result = None
+        self.error = None
+        self.created_at = datetime.utcnow()
+        self.finished_at = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def set_total(self, total):
+        with self._lock:
+            self.total = total
+
+    def advance(self, count=1):
+        with self._lock:
+            self.done += count
+
+    @property
+    def is_finished(self):
+        return self.status in ('done', 'failed')
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'id': self.id, 'kind': self.kind, 'status': self.status,
+                'total': self.total, 'done': self.done,
+                'result': self.result, 'error': self.error,
+                'created_at': self.created_at.isoformat(),
+                'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            }
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+def _prune_finished_jobs():
+    finished = sorted((j for j in _jobs.values() if j.is_finished), key=lambda j: j.finished_at)
+    for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+        del _jobs[job.id]
+
+def start_job(kind, target, *args, **kwargs):
+    """Runs target(job, *args, **kwargs) in a background thread inside an app context.
+    The return value of target becomes job.result. Returns the Job immediately.
+    """
+    app = current_app._get_current_object()
+    job = Job(kind)
+
+    def runner():
+        with app.app_context():
+            job.status = 'running'
+            jobs_logger.info("Job %s (%s) started.", job.id, kind)
+            try:
+                job.result = target(job, *args, **kwargs)
+                job.status = 'done'
+                jobs_logger.info("Job %s (%s) finished.", job.id, kind)
+            except Exception as e:
+                job.error = str(e)
+                job.status = 'failed'
+                jobs_logger.error("Job %s (%s) failed: %s", job.id, kind, e, exc_info=True)
+            finally:
+                job.finished_at = datetime.utcnow()
+
+    with _jobs_lock:
+        _prune_finished_jobs()
+        _jobs[job.id] = job
+    job._thread = threading.Thread(target=runner, name=f"job-{kind}-{job.id[:8]}", daemon=True)
+    job._thread.start()
+    return job
+
+def get_job(job_id):
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+def wait_for_jobs(timeout=None):
+    """Waits up to `timeout` seconds in total for running jobs to finish, e.g. before the server exits.
+    Returns the jobs that are still running.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with _jobs_lock:
+        running = [job for job in _jobs.values() if not job.is_finished and job._thread is not None]
+    for job in running:
+        remaining = None if deadline is None else max(0, deadline - time.monotonic())
+        job._thread.join(remaining)
+    return [job for job in running if not job.is_finished]
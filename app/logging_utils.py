@@ -0,0 +1,136 @@
+import time
+import logging
+import threading
+
+# Central logging setup. Every module gets a child of the 'photo_album_manager' logger through
+# get_logger(); only the parent has a handler, so levels can be set per component from config.py
+# (LOG_LEVEL, LOG_LEVELS) and changed at runtime through /api/logging/levels.
+
+ROOT_LOGGER_NAME = 'photo_album_manager'
+LOG_FORMAT = '%(asctime)s - %(component)s - %(levelname)s - %(message)s'
+DEFAULT_LOG_LEVEL = 'INFO'
+DEFAULT_PER_ITEM_RATE_LIMIT = 20 # Per-item messages per key and second before suppression starts
+
+# Components whose level can be set (LOG_LEVELS, /api/logging/levels). Listed rather than collected from
+# get_logger() calls because config.py is applied before most modules are imported; components
+# registered through get_logger() later are accepted as well.
+KNOWN_COMPONENTS = frozenset({
+    'app', 'archive_manager', 'catalog', 'duplicates', 'events', 'exif_reader', 'file_utils', 'image_utils',
+    'jobs', 'media_filter', 'media_serving', 'models', 'previews', 'routes', 'scanner', 'search', 'selections',
+    'server', 'similarity', 'smart_albums', 'sql_profiler', 'tag_manager', 'utils', 'video_reader',
+})
+MAX_LOG_LEVEL = logging.CRITICAL
+
+_component_tags = {}
+_registered_components = set()
+
+class _ComponentTagFilter(logging.Filter):
+    def filter(self, record):
+        component = record.name.rpartition('.')[2]
+        record.component = _component_tags.get(component, component.upper())
+        return True
+
+root_logger = logging.getLogger(ROOT_LOGGER_NAME)
+if not root_logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handler.addFilter(_ComponentTagFilter())
+    root_logger.addHandler(handler)
+    root_logger.setLevel(DEFAULT_LOG_LEVEL)
+    root_logger.propagate = False
+
+def get_logger(component, tag=None):
+    """Returns the logger for an app component, e.g. get_logger('scanner') -> 'photo_album_manager.scanner'.
+    `tag` overrides the upper-cased component name shown in log lines.
+    """
+    if tag:
+        _component_tags[component] = tag
+    _registered_components.add(component)
+    return logging.getLogger(f'{ROOT_LOGGER_NAME}.{component}')
+
+def _parse_level(level):
+    """A level name ('DEBUG', 'info', ...) or a number from 0 (NOTSET) to 50 (CRITICAL)."""
+    if isinstance(level, bool): # JSON true/false would otherwise pass as 1/0
+        raise ValueError(f"Invalid log level {level!r}.")
+    if isinstance(level, int):
+        if not 0 <= level <= MAX_LOG_LEVEL:
+            raise ValueError(f"Log level {level} is out of range (0-{MAX_LOG_LEVEL}).")
+        return level
+    if not isinstance(level, str):
+        raise ValueError(f"Invalid log level {level!r}.")
+    value = logging.getLevelName(level.strip().upper())
+    if not isinstance(value, int):
+        raise ValueError(f"Unknown log level '{level}'.")
+    return value
+
+def set_log_levels(levels):
+    """Applies {component: level}; the component 'default' sets the level inherited by all components.
+    Raises ValueError for unknown components or levels before changing anything.
+    """
+    unknown = sorted(str(component) for component in levels
+                     if component != 'default' and component not in KNOWN_COMPONENTS | _registered_components)
+    if unknown:
+        raise ValueError(f"Unknown logging component(s): {', '.join(unknown)}.")
+    parsed = {component: _parse_level(level) for component, level in levels.items()}
+    for component, level in parsed.items():
+        logger = root_logger if component == 'default' else get_logger(component)
+        logger.setLevel(level)
+
+def get_log_levels():
+    """Returns the default level and every component level that differs from inheriting it."""
+    components = {}
+    prefix = ROOT_LOGGER_NAME + '.'
+    for name, logger in list(logging.root.manager.loggerDict.items()):
+        if name.startswith(prefix) and isinstance(logger, logging.Logger):
+            components[name[len(prefix):]] = logging.getLevelName(logger.level) if logger.level else 'NOTSET'
+    return {'default': logging.getLevelName(root_logger.level), 'components': dict(sorted(components.items()))}
+
+class RateLimitedLog:
+    """Lets at most `rate` messages per key through each second and folds the rest into a
+    'suppressed N similar messages' note on the next message that gets through.
+    Use for per-item logging in loops (per file, per media item) so a large scan or a broken
+    filter cannot flood the log.
+    """
+
+    def __init__(self, logger, rate=DEFAULT_PER_ITEM_RATE_LIMIT):
+        self.logger = logger
+        self.rate = rate
+        self._windows = {} # key -> [window start, emitted in window, suppressed]
+        self._lock = threading.Lock()
+
+    def log(self, level, key, msg, *args, **kwargs):
+        if not self.logger.isEnabledFor(level):
+            return
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= 1.0:
+                suppressed = window[2] if window else 0
+                window = self._windows[key] = [now, 0, 0]
+            else:
+                suppressed = 0
+            if window[1] >= self.rate:
+                window[2] += 1
+                return
+            window[1] += 1
+        if suppressed:
+            msg = f'{msg} (suppressed {suppressed} similar messages)'
+        self.logger.log(level, msg, *args, **kwargs)
+
+    def debug(self, key, msg, *args, **kwargs):
+        self.log(logging.DEBUG, key, msg, *args, **kwargs)
+
+    def info(self, key, msg, *args, **kwargs):
+        self.log(logging.INFO, key, msg, *args, **kwargs)
+
+    def warning(self, key, msg, *args, **kwargs):
+        self.log(logging.WARNING, key, msg, *args, **kwargs)
+
+    def error(self, key, msg, *args, **kwargs):
+        self.log(logging.ERROR, key, msg, *args, **kwargs)
+
+def configure_logging(app):
+    """Applies LOG_LEVEL / LOG_LEVELS from the app config."""
+    levels = {'default': app.config.get('LOG_LEVEL', DEFAULT_LOG_LEVEL)}
+    levels.update(app.config.get('LOG_LEVELS', {}))
+    set_log_levels(levels)
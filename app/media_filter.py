@@ -0,0 +1,76 @@
+import time
+from itertools import islice
+from flask import current_app
+from .models import db, Media
+from .tag_manager import get_tag_names_for_media
+from .utils import MediaProxy, compile_user_filter, chunked
+from .cache import VersionedCache
+from . import metrics
+from .logging_utils import get_logger
+
+media_filter_logger = get_logger('media_filter')
+
+# Rows fetched per round trip while streaming the library through a user filter.
+DEFAULT_FILTER_BATCH_SIZE = 1000
+
+# Columns in MediaProxy argument order (tags are added per batch).
+FILTER_COLUMNS = (Media.id, Media.filepath, Media.filename, Media.org_path, Media.capture_time,
+                  Media.modification_time, Media.filesize, Media.media_type,
+                  Media.width, Media.height, Media.orientation, Media.camera_make, Media.camera_model,
+                  Media.lens_model, Media.gps_latitude, Media.gps_longitude, Media.duration)
+
+_matching_ids_cache = VersionedCache(maxsize=8)
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def filter_media_ids(query, filter_code, batch_size=None):
+    """Runs the user's api_select over every row of `query` (a Media query, already filtered and
+    ordered) and returns the matching media IDs in query order.
+
+    Rows are streamed as plain column tuples in batches of FILTER_BATCH_SIZE with one tag query per
+    batch, so memory stays bounded by the batch size plus the list of matching IDs, no matter how large
+    the library is. No ORM objects are created.
+    """
+    predicate = compile_user_filter(filter_code)
+    if predicate is None:
+        return [media_id for (media_id,) in query.with_entities(Media.id)]
+    if batch_size is None:
+        batch_size = current_app.config.get('FILTER_BATCH_SIZE', DEFAULT_FILTER_BATCH_SIZE)
+
+    rows = query.with_entities(*FILTER_COLUMNS).yield_per(batch_size)
+    matching_ids = []
+    evaluated = 0
+    started = time.perf_counter()
+    for batch in _batches(rows, batch_size):
+        tag_names = get_tag_names_for_media([row[0] for row in batch])
+        for row in batch:
+            if predicate(MediaProxy(*row, tag_names.get(row[0], []))):
+                matching_ids.append(row[0])
+        evaluated += len(batch)
+    metrics.filter_evaluation_duration.observe(time.perf_counter() - started)
+    metrics.filter_items_evaluated_total.inc(evaluated)
+    media_filter_logger.info("Filter matched %s of %s items in %.3fs.", len(matching_ids), evaluated, time.perf_counter() - started)
+    return matching_ids
+
+def cached_filter_media_ids(query, filter_code, cache_key):
+    """filter_media_ids() for paging, the timeline and seeking, evaluated once per library data version.
+    cache_key must identify everything else that shaped `query` (SQL filters and order). The returned
+    list is shared between callers and must not be modified.
+    """
+    return _matching_ids_cache.get_or_compute((filter_code, cache_key), lambda: filter_media_ids(query, filter_code))
+
+def load_media_rows(media_ids, columns):
+    """Loads `columns` for the given IDs and returns the rows in the order of media_ids."""
+    if not media_ids:
+        return []
+    rows = []
+    for chunk in chunked(media_ids):
+        rows.extend(db.session.query(*columns).filter(Media.id.in_(chunk)))
+    position = {media_id: index for index, media_id in enumerate(media_ids)}
+    return sorted(rows, key=lambda row: position[row[0]])
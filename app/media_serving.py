@@ -0,0 +1,68 @@
+import os
+import mimetypes
+import functools
+from urllib.parse import quote
+from flask import current_app, send_file, abort, Response
+from .logging_utils import get_logger
+
+media_serving_logger = get_logger('media_serving')
+
+# How original media files are delivered (MEDIA_SENDFILE_MODE):
+#   None               Flask/Werkzeug streams the file itself. Range requests get 206 partial content, and
+#                      under a WSGI server that provides wsgi.file_wrapper (gunicorn, uWSGI) the body is sent
+#                      with the kernel's sendfile() instead of being copied through Python.
+#   'x-sendfile'       Only an X-Sendfile header is returned and the fronting Apache (mod_xsendfile) or
+#                      lighttpd streams the file, including ranges.
+#   'x-accel-redirect' Only an X-Accel-Redirect header pointing at MEDIA_X_ACCEL_PREFIX + the absolute file
+#                      path is returned, for an nginx `internal` location that maps that prefix onto /.
+SENDFILE_MODES = (None, 'x-sendfile', 'x-accel-redirect')
+DEFAULT_X_ACCEL_PREFIX = '/_protected_media'
+
+@functools.lru_cache(maxsize=8)
+def _library_roots(org_paths):
+    """Normalized library roots with a trailing separator, so '/photos' does not admit '/photos-old/...'."""
+    return tuple(os.path.join(os.path.abspath(org_path), '') for org_path in org_paths)
+
+def library_roots():
+    """Returns the normalized ORG_PATHS allowlist. Computed once per distinct configuration."""
+    return _library_roots(tuple(current_app.config.get('ORG_PATHS', [])))
+
+def is_within_libraries(filepath):
+    """True if filepath lies inside one of the configured libraries.
+    Scanned paths are already absolute and normalized, so this does no filesystem calls.
+    """
+    filepath = os.path.normpath(filepath)
+    return any(filepath.startswith(root) for root in library_roots())
+
+def _offloaded_response(filepath, mode):
+    mimetype = mimetypes.guess_type(filepath)[0] or 'application/octet-stream'
+    response = Response(mimetype=mimetype)
+    if mode == 'x-sendfile':
+        response.headers['X-Sendfile'] = filepath
+    else:
+        prefix = current_app.config.get('MEDIA_X_ACCEL_PREFIX', DEFAULT_X_ACCEL_PREFIX).rstrip('/')
+        response.headers['X-Accel-Redirect'] = prefix + quote(filepath)
+    return response
+
+def send_media_file(filepath):
+    """Returns the response delivering an original media file according to MEDIA_SENDFILE_MODE.
+    Aborts with 403 for paths outside the libraries and with 404 for missing files.
+    """
+    if not is_within_libraries(filepath):
+        abort(403)
+    mode = current_app.config.get('MEDIA_SENDFILE_MODE')
+    if mode not in SENDFILE_MODES:
+        media_serving_logger.error("Unknown MEDIA_SENDFILE_MODE %r, serving files directly.", mode)
+        mode = None
+    if mode is not None:
+        if not os.path.isfile(filepath):
+            abort(404)
+        return _offloaded_response(filepath, mode)
+    try:
+        # conditional=True answers Range requests with 206 and If-None-Match/If-Modified-Since with 304.
+        response = send_file(filepath, conditional=True, etag=True,
+                             max_age=current_app.config.get('MEDIA_CACHE_MAX_AGE', 3600))
+    except (FileNotFoundError, IsADirectoryError):
+        abort(404)
+    response.headers.setdefault('Accept-Ranges', 'bytes') # Lets <video> seek with Range requests from the first response
+    return response
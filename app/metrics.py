@@ -0,0 +1,158 @@
+import time
+import threading
+from contextlib import contextmanager
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from .models import db
+
+# Minimal in-process metrics with Prometheus text exposition.
+# Recording is a dict update under a lock; all formatting happens only when /metrics is scraped.
+# Values are per process: with several workers, each worker reports its own series.
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 1000)
+
+_registry = []
+
+def _escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}')
+        return lines
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {} # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for index, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    series[index] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for upper_bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, ("le", _format_value(upper_bound)))} {cumulative}')
+            lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, ("le", "+Inf"))} {series[-1]}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(float(series[-2]))}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {series[-1]}')
+        return lines
+
+http_request_duration = Histogram('pam_http_request_duration_seconds', 'HTTP request latency by route.', ('method', 'endpoint'))
+http_requests_total = Counter('pam_http_requests_total', 'HTTP requests by route and status code.', ('method', 'endpoint', 'status'))
+db_queries_per_request = Histogram('pam_db_queries_per_request', 'SQL statements executed per HTTP request.', ('endpoint',), QUERY_COUNT_BUCKETS)
+db_time_per_request = Histogram('pam_db_time_per_request_seconds', 'Time spent in SQL statements per HTTP request.', ('endpoint',))
+db_queries_total = Counter('pam_db_queries_total', 'SQL statements executed (including background jobs and CLI).')
+db_query_seconds_total = Counter('pam_db_query_seconds_total', 'Total time spent executing SQL statements.')
+thumbnail_requests_total = Counter('pam_thumbnail_requests_total', 'Thumbnail requests by cache result.', ('result',)) # hit | generated | failed
+preview_requests_total = Counter('pam_preview_requests_total', 'Preview rendition requests by cache result.', ('result',)) # hit | generated | failed
+scan_phase_duration = Histogram('pam_scan_phase_duration_seconds', 'Duration of library scan phases.', ('phase',))
+filter_evaluation_duration = Histogram('pam_filter_evaluation_seconds', 'Time to evaluate a user api_select filter over the library.')
+filter_items_evaluated_total = Counter('pam_filter_items_evaluated_total', 'Media items passed through user api_select filters.')
+
+def render_prometheus():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+def _endpoint_label():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+def _before_request():
+    g._metrics_start = time.perf_counter()
+    g._metrics_db_queries = 0
+    g._metrics_db_time = 0.0
+
+def _after_request(response):
+    start = g.pop('_metrics_start', None)
+    if start is not None:
+        endpoint = _endpoint_label()
+        http_request_duration.observe(time.perf_counter() - start, method=request.method, endpoint=endpoint)
+        http_requests_total.inc(method=request.method, endpoint=endpoint, status=str(response.status_code))
+        db_queries_per_request.observe(g.get('_metrics_db_queries', 0), endpoint=endpoint)
+        db_time_per_request.observe(g.get('_metrics_db_time', 0.0), endpoint=endpoint)
+    return response
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['_metrics_query_start'] = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info.pop('_metrics_query_start', None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    db_queries_total.inc()
+    db_query_seconds_total.inc(elapsed)
+    if has_request_context() and '_metrics_db_queries' in g:
+        g._metrics_db_queries += 1
+        g._metrics_db_time += elapsed
+
+def init_app(app):
+    """Registers the request hooks and SQLAlchemy engine listeners that feed the metrics."""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    with app.app_context():
+        engine = db.engine
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
@@ -1,20 +1,49 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
 from datetime import datetime
+import hashlib
 import os
+from .logging_utils import get_logger
+
+models_logger = get_logger('models')
 
 db = SQLAlchemy()
 
+SCHEMA_VERSION_KEY = 'schema_version' # AppMeta key of the schema_fingerprint() the database was last prepared for
+
 class Media(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     filepath = db.Column(db.String(1024), unique=True, nullable=False)
     org_path = db.Column(db.String(1024), nullable=False)
     filename = db.Column(db.String(255), nullable=False)
-    capture_time = db.Column(db.DateTime, default=datetime(1999, 1, 1, 0, 0, 0))
+    capture_time = db.Column(db.DateTime, default=datetime(1999, 1, 1, 0, 0, 0), index=True)
     modification_time = db.Column(db.DateTime, nullable=False)
     filesize = db.Column(db.Integer, nullable=False) # size in bytes
     media_type = db.Column(db.String(50), nullable=False) # 'image' or 'video'
     is_accessible = db.Column(db.Boolean, default=True, nullable=False, server_default='1') # True if part of current ORG_PATHS and exists
 
+    # Content hashes for duplicate detection (see duplicates.py). They are only valid while
+    # modification_time/filesize still equal the hash_mtime/hash_filesize they were computed at.
+    partial_hash = db.Column(db.String(64), nullable=True) # Hash of the head and tail blocks
+    content_hash = db.Column(db.String(64), nullable=True, index=True) # Hash of the full content
+    hash_mtime = db.Column(db.DateTime, nullable=True)
+    hash_filesize = db.Column(db.Integer, nullable=True)
+    phash = db.Column(db.String(16), nullable=True, index=True) # 64-bit perceptual (difference) hash as hex, see similarity.py
+
+    # Metadata captured at scan time (see scanner.read_image_metadata and video_reader.read_video_metadata),
+    # so filters and sorting never have to open files. Width/height are as displayed (EXIF orientation
+    # or the video track rotation applied).
+    width = db.Column(db.Integer, nullable=True, index=True)
+    height = db.Column(db.Integer, nullable=True, index=True)
+    orientation = db.Column(db.Integer, nullable=True) # EXIF orientation 1-8
+    camera_make = db.Column(db.String(100), nullable=True)
+    camera_model = db.Column(db.String(100), nullable=True, index=True)
+    lens_model = db.Column(db.String(100), nullable=True)
+    gps_latitude = db.Column(db.Float, nullable=True)
+    gps_longitude = db.Column(db.Float, nullable=True)
+    duration = db.Column(db.Float, nullable=True) # Videos only, in seconds
+
     tags = db.relationship('Tag', secondary='media_tag', backref=db.backref('media_items', lazy='dynamic'))
 
     def __repr__(self):
@@ -38,29 +67,140 @@ class FavoriteFilter(db.Model):
     # name = db.Column(db.String(100), nullable=True) # Optional: for named favorites
     code = db.Column(db.Text, nullable=False, unique=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Pinned favorites are smart albums with a materialized membership (see smart_albums.py)
+    is_pinned = db.Column(db.Boolean, default=False, nullable=False, server_default='0')
+    materialized_at = db.Column(db.DateTime, nullable=True)
 
     def __repr__(self):
         return f'<FavoriteFilter {self.id}: {self.code[:30]}...>'
 
-def init_db(app):
-    # Define the database URI.
-    # The database file will be created inside the 'data' directory.
-    # app.instance_path will be /app/photo_album_manager/photo_album_manager/instance
-    db_path = os.path.join(app.instance_path, '..', 'data', 'photo_album.sqlite')
-    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Media matching each pinned favorite filter. The primary key serves album reads, the media_id index
+# the per-item re-evaluation and deletes.
+smart_album_media = db.Table('smart_album_media',
+    db.Column('album_id', db.Integer, db.ForeignKey('favorite_filter.id'), primary_key=True),
+    db.Column('media_id', db.Integer, db.ForeignKey('media.id'), primary_key=True, index=True)
+)
+
+class AppMeta(db.Model):
+    """Small key/value store for application bookkeeping (e.g. the library data version)."""
+    __tablename__ = 'app_meta'
+    key = db.Column(db.String(100), primary_key=True)
+    value = db.Column(db.Text, nullable=False)
+
+    def __repr__(self):
+        return f'<AppMeta {self.key}={self.value}>'
+
+class ScanState(db.Model):
+    """Scan bookkeeping per library root (see scanner.scan_libraries).
+    generation is incremented when a scan of the root starts; while in_progress is set, the next scan
+    resumes that generation (and its full_rescan) instead of starting over.
+    """
+    __tablename__ = 'scan_state'
+    org_path = db.Column(db.String(1024), primary_key=True)
+    generation = db.Column(db.Integer, nullable=False, default=0)
+    in_progress = db.Column(db.Boolean, nullable=False, default=False)
+    last_completed_directory = db.Column(db.String(1024), nullable=True)
+    full_rescan = db.Column(db.Boolean, nullable=False, default=False, server_default='0') # Kept when an interrupted scan resumes
+    metadata_version = db.Column(db.Integer, nullable=True) # scanner.SCAN_METADATA_VERSION of the last completed scan
+    started_at = db.Column(db.DateTime, nullable=True)
+    completed_at = db.Column(db.DateTime, nullable=True)
 
-    # Ensure the 'data' directory exists.
-    # os.path.join(app.instance_path, '..', 'data') correctly navigates to
-    # /app/photo_album_manager/photo_album_manager/data
-    data_dir = os.path.dirname(db_path)
-    if not os.path.exists(data_dir):
-        os.makedirs(data_dir)
-        print(f"Created directory: {data_dir}")
+    def __repr__(self):
+        return f'<ScanState {self.org_path} gen={self.generation}>'
+
+class ScanDirectory(db.Model):
+    """A directory as of the last time its files were processed. While its mtime is unchanged no
+    entries were added, removed or renamed in it, so a scan can skip listing it and descend straight
+    into the stored subdirectories.
+    """
+    __tablename__ = 'scan_directory'
+    # Keyed per library: with nested ORG_PATHS the same directory is scanned as part of both.
+    org_path = db.Column(db.String(1024), primary_key=True)
+    path = db.Column(db.String(1024), primary_key=True)
+    mtime_ns = db.Column(db.Integer, nullable=False)
+    subdirs = db.Column(db.Text, nullable=False, default='[]') # JSON list of subdirectory names
+    generation = db.Column(db.Integer, nullable=False) # Scan generation that last processed the directory
+
+    def __repr__(self):
+        return f'<ScanDirectory {self.path}>'
+
+# Tables holding only scan bookkeeping, which _add_missing_columns() may drop and recreate when their
+# primary key changed (the next scan then lists every directory once).
+_REBUILDABLE_TABLES = {'scan_directory'}
+
+def _add_missing_columns():
+    """Brings tables created by older versions up to date.
+    db.create_all() only creates missing tables, so columns and indexes added to existing
+    models later are added here (new columns must be nullable or have a server_default).
+    """
+    inspector = db.inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            if table.name in _REBUILDABLE_TABLES:
+                existing_key = inspector.get_pk_constraint(table.name)['constrained_columns']
+                if sorted(existing_key) != sorted(column.name for column in table.primary_key.columns):
+                    # SQLite cannot alter a primary key; these tables only cache scan progress, so start over.
+                    table.drop(conn)
+                    table.create(conn)
+                    models_logger.info("Recreated table %s with primary key (%s)", table.name, ', '.join(c.name for c in table.primary_key.columns))
+                    continue
+            existing_columns = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=conn.dialect)
+                ddl = f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'
+                if column.server_default is not None:
+                    ddl += f" DEFAULT {column.server_default.arg}"
+                conn.exec_driver_sql(ddl)
+                models_logger.info("Added column %s.%s", table.name, column.name)
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
 
-    print(f"Database will be created at: {db_path}")
+def schema_fingerprint(extra_ddl=()):
+    """A short hash of the schema the models describe (tables, columns, indexes) plus extra_ddl, such as
+    the search index definition. It changes whenever a model does, so it never has to be bumped by hand.
+    """
+    parts = []
+    for table in db.metadata.sorted_tables:
+        parts.append(f'table {table.name}')
+        for column in table.columns:
+            default = column.server_default.arg if column.server_default is not None else None
+            parts.append(f'column {column.name} {column.type!r} nullable={column.nullable} default={default} pk={column.primary_key}')
+        parts.extend(sorted(f'index {index.name} {[c.name for c in index.columns]}' for index in table.indexes))
+    parts.extend(extra_ddl)
+    return hashlib.sha256('\n'.join(parts).encode()).hexdigest()[:16]
 
+def stored_schema_version():
+    """The fingerprint stored by store_schema_version(), or None for a new or older database."""
+    try:
+        row = db.session.execute(text("SELECT value FROM app_meta WHERE key = :key"), {'key': SCHEMA_VERSION_KEY}).first()
+    except OperationalError: # No app_meta table yet
+        db.session.rollback()
+        return None
+    return row[0] if row else None
+
+def store_schema_version(version):
+    db.session.merge(AppMeta(key=SCHEMA_VERSION_KEY, value=version))
+    db.session.commit()
+
+def create_schema():
+    """Creates missing tables and adds missing columns and indexes."""
+    db.create_all()
+    _add_missing_columns()
+
+def init_db(app):
+    """Configures the database for the app. Schema work is left to create_schema(), which create_app()
+    only runs when the stored schema version does not match the models.
+    """
+    # The database file lives in the 'data' directory next to the app package unless
+    # a DATABASE_PATH config value overrides the location (used e.g. by the benchmark suite).
+    db_path = app.config.get('DATABASE_PATH') or os.path.normpath(os.path.join(app.instance_path, '..', 'data', 'photo_album.sqlite'))
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    models_logger.debug("Database at %s", db_path)
     db.init_app(app)
-    with app.app_context():
-        db.create_all()
-    print("Database initialized and tables created.")
@@ -0,0 +1,288 @@
+import os
+import queue
+import itertools
+import threading
+from flask import current_app
+from sqlalchemy import tuple_
+from .models import db, Media
+from .media_filter import load_media_rows
+from . import metrics
+from .logging_utils import get_logger, RateLimitedLog
+
+previews_logger = get_logger('previews')
+per_preview_log = RateLimitedLog(previews_logger)
+
+# Preview renditions sit between the 256px grid thumbnails and the originals: a JPEG bounded by
+# PREVIEW_MAX_EDGE on its long edge, EXIF orientation applied, progressively encoded so the viewer
+# shows a full-frame image early. They are rendered by a small pool of background workers fed from
+# a bounded priority queue (viewer requests before neighbour prefetches) and cached on disk.
+DEFAULT_PREVIEW_MAX_EDGE = 2048
+DEFAULT_PREVIEW_QUALITY = 85
+DEFAULT_PREVIEW_WORKERS = 2
+DEFAULT_PREVIEW_QUEUE_SIZE = 64
+DEFAULT_PREVIEW_CACHE_MAX_MB = 2048
+DEFAULT_PREVIEW_PREFETCH_COUNT = 2 # Neighbours prefetched on each side of the viewed item
+PREVIEW_WAIT_SECONDS = 30
+REQUEST_PRIORITY, PREFETCH_PRIORITY = 0, 1
+_STOP_PRIORITY = 2 # Sorts after all work
+
+def render_preview(source_path, target_path, max_edge, quality):
+    """Writes the preview of source_path to target_path (atomically) and returns its size in bytes."""
+    from PIL import Image, ImageOps
+    with Image.open(source_path) as img:
+        img.draft('RGB', (max_edge, max_edge)) # JPEG: let the decoder downscale by up to 8x while decoding
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        img.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+        temp_path = f'{target_path}.{threading.get_ident()}.tmp'
+        try:
+            img.save(temp_path, 'JPEG', quality=quality, progressive=True, optimize=True)
+            os.replace(temp_path, target_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    return os.path.getsize(target_path)
+
+class PreviewService:
+    """Renders and caches preview renditions. One instance per app (see init_app)."""
+
+    def __init__(self, cache_dir, max_edge, quality, workers, queue_size, cache_max_bytes):
+        self.cache_dir = cache_dir
+        self.max_edge = max_edge
+        self.quality = quality
+        self.cache_max_bytes = cache_max_bytes
+        self._worker_count = max(1, workers)
+        self._queue = queue.PriorityQueue(maxsize=max(1, queue_size))
+        self._sequence = itertools.count() # Keeps FIFO order within a priority
+        self._pending = {} # media_id -> threading.Event set when its rendering finished
+        self._lock = threading.Lock()
+        self._workers = []
+        self._stopped = False
+        self._cache_bytes = None # Computed on first use
+
+    def preview_path(self, media_id):
+        return os.path.join(self.cache_dir, f'{media_id}_preview_{self.max_edge}.jpg')
+
+    def remove_previews(self, media_ids):
+        """Deletes the cached renditions (of any max_edge) of the given media, e.g. once they are archived."""
+        wanted = {str(media_id) for media_id in media_ids}
+        if not wanted:
+            return
+        with self._lock:
+            try:
+                entries = list(os.scandir(self.cache_dir))
+            except FileNotFoundError:
+                return
+            for entry in entries:
+                media_id, separator, _ = entry.name.partition('_preview_')
+                if not separator or media_id not in wanted:
+                    continue
+                try:
+                    size = entry.stat().st_size
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    continue
+                except OSError as e:
+                    previews_logger.warning("Could not remove stale preview %s: %s", entry.path, e)
+                    continue
+                if self._cache_bytes is not None:
+                    self._cache_bytes -= size
+
+    def cached_path(self, media_id, modification_time):
+        """Returns the cached preview path if it exists and is newer than the original's modification time."""
+        path = self.preview_path(media_id)
+        try:
+            preview_mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+        if modification_time is not None and preview_mtime < modification_time.timestamp():
+            return None
+        return path
+
+    def get_preview(self, media_id, filepath, modification_time):
+        """Returns the path of an up-to-date preview, rendering it first if needed, or None on failure."""
+        path = self.cached_path(media_id, modification_time)
+        if path is not None:
+            metrics.preview_requests_total.inc(result='hit')
+            self._mark_served(path)
+            return path
+        event = self._submit(media_id, filepath, REQUEST_PRIORITY)
+        if event is None: # Queue full of prefetches: render in this request rather than fail
+            self._render(media_id, filepath)
+        elif not event.wait(PREVIEW_WAIT_SECONDS):
+            per_preview_log.warning('timeout', "Timed out waiting for the preview of %s", filepath)
+            return None
+        path = self.cached_path(media_id, modification_time)
+        metrics.preview_requests_total.inc(result='generated' if path else 'failed')
+        return path
+
+    def prefetch(self, items):
+        """Queues previews for (media_id, filepath, modification_time) items that are not cached yet.
+        Best effort: items are dropped while the queue is full.
+        """
+        for media_id, filepath, modification_time in items:
+            if self.cached_path(media_id, modification_time) is None:
+                self._submit(media_id, filepath, PREFETCH_PRIORITY)
+
+    @staticmethod
+    def _mark_served(path):
+        """Refreshes the mtime of a served preview so cache trimming keeps recently viewed ones."""
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _submit(self, media_id, filepath, priority):
+        with self._lock:
+            if self._stopped:
+                return None
+            event = self._pending.get(media_id)
+            if event is not None:
+                return event
+            event = threading.Event()
+            try:
+                self._queue.put_nowait((priority, next(self._sequence), media_id, filepath, event))
+            except queue.Full:
+                return None
+            self._pending[media_id] = event
+            self._start_workers()
+        return event
+
+    def _start_workers(self):
+        while len(self._workers) < self._worker_count:
+            worker = threading.Thread(target=self._work, name=f'preview-worker-{len(self._workers)}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def stop(self, timeout=None):
+        """Drops queued work and waits up to `timeout` seconds for the workers to finish the previews
+        they are rendering. Requests after stop() render in the request thread.
+        """
+        with self._lock:
+            self._stopped = True
+            workers = list(self._workers)
+            while True:
+                try:
+                    _, _, media_id, _, event = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                self._pending.pop(media_id, None)
+                event.set()
+                self._queue.task_done()
+        for _ in workers:
+            self._queue.put((_STOP_PRIORITY, next(self._sequence), None, None, None))
+        for worker in workers:
+            worker.join(timeout)
+        previews_logger.debug("Preview workers stopped.")
+
+    def _work(self):
+        while True:
+            _, _, media_id, filepath, event = self._queue.get()
+            if media_id is None: # stop()
+                self._queue.task_done()
+                return
+            try:
+                self._render(media_id, filepath)
+            finally:
+                with self._lock:
+                    self._pending.pop(media_id, None)
+                event.set()
+                self._queue.task_done()
+
+    def _render(self, media_id, filepath):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            size = render_preview(filepath, self.preview_path(media_id), self.max_edge, self.quality)
+        except FileNotFoundError:
+            per_preview_log.warning('missing', "Original media file not found: %s", filepath)
+            return
+        except Exception as e:
+            per_preview_log.error('error', "Error generating preview for %s: %s", filepath, e)
+            return
+        per_preview_log.debug('generated', "Preview generated for %s", filepath)
+        self._account(size)
+
+    def _account(self, added_bytes):
+        """Keeps the cache under cache_max_bytes by removing the least recently written/served previews."""
+        with self._lock:
+            if self._cache_bytes is None:
+                self._cache_bytes = sum(entry.stat().st_size for entry in os.scandir(self.cache_dir) if entry.is_file())
+            else:
+                self._cache_bytes += added_bytes
+            if not self.cache_max_bytes or self._cache_bytes <= self.cache_max_bytes:
+                return
+            files = []
+            for entry in os.scandir(self.cache_dir):
+                if entry.is_file():
+                    stat_info = entry.stat()
+                    files.append((stat_info.st_mtime, stat_info.st_size, entry.path))
+            files.sort()
+            total = sum(size for _, size, _ in files)
+            target = self.cache_max_bytes * 0.9
+            for _, size, path in files:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+            self._cache_bytes = total
+        previews_logger.info("Preview cache trimmed to %.1f MB.", total / 1e6)
+
+def neighbour_images(query, media_id, sort_column, descending, count):
+    """Returns (id, filepath, modification_time) of up to `count` images on each side of media_id among
+    `query` (the listing's filtered, unordered Media query) in the given sort order, using keyset
+    conditions on (sort column, id) so each side is one indexed range query.
+    """
+    if count <= 0:
+        return []
+    sort_value = db.session.query(sort_column).filter(Media.id == media_id).scalar()
+    if sort_value is None:
+        return []
+    base = query.filter(Media.media_type == 'image').with_entities(Media.id, Media.filepath, Media.modification_time)
+    position = tuple_(sort_column, Media.id)
+    after = base.filter(position < (sort_value, media_id) if descending else position > (sort_value, media_id))
+    before = base.filter(position > (sort_value, media_id) if descending else position < (sort_value, media_id))
+    forward, backward = (sort_column.desc(), Media.id.desc()), (sort_column.asc(), Media.id.asc())
+    rows = after.order_by(*(forward if descending else backward)).limit(count).all()
+    rows += before.order_by(*(backward if descending else forward)).limit(count).all()
+    return [tuple(row) for row in rows]
+
+def neighbour_images_in_list(media_ids, media_id, count):
+    """Like neighbour_images() for an already ordered list of IDs (the listing's api_select filter
+    result). Returns [] if media_id is not in the list.
+    """
+    if count <= 0:
+        return []
+    try:
+        index = media_ids.index(media_id)
+    except ValueError:
+        return []
+    columns = (Media.id, Media.filepath, Media.modification_time, Media.media_type)
+    result = []
+    for side in (media_ids[index + 1:], media_ids[index - 1::-1] if index else []):
+        found = 0
+        # Videos in the list are skipped, so the window is widened until `count` images are found
+        for start in range(0, len(side), count * 4):
+            for row_id, filepath, modification_time, media_type in load_media_rows(side[start:start + count * 4], columns):
+                if media_type == 'image' and found < count:
+                    result.append((row_id, filepath, modification_time))
+                    found += 1
+            if found >= count:
+                break
+    return result
+
+def get_preview_service():
+    return current_app.extensions['previews']
+
+def init_app(app):
+    base_dir = app.config.get('BASE_DIR', os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    app.extensions['previews'] = PreviewService(
+        cache_dir=os.path.join(base_dir, 'data', 'previews'),
+        max_edge=app.config.get('PREVIEW_MAX_EDGE', DEFAULT_PREVIEW_MAX_EDGE),
+        quality=app.config.get('PREVIEW_QUALITY', DEFAULT_PREVIEW_QUALITY),
+        workers=app.config.get('PREVIEW_WORKERS', DEFAULT_PREVIEW_WORKERS),
+        queue_size=app.config.get('PREVIEW_QUEUE_SIZE', DEFAULT_PREVIEW_QUEUE_SIZE),
+        cache_max_bytes=app.config.get('PREVIEW_CACHE_MAX_MB', DEFAULT_PREVIEW_CACHE_MAX_MB) * 1024 * 1024)
@@ -1,20 +1,31 @@
-from flask import current_app, jsonify, request, send_from_directory, abort, render_template, session
+from flask import current_app, jsonify, request, send_from_directory, send_file, abort, make_response, render_template, session, Response
 from .models import db, Media, Tag, FavoriteFilter
-from app.tag_manager import get_all_global_tags, add_global_tag, delete_global_tag, add_tags_to_media, remove_tags_from_media
+from app.tag_manager import get_all_global_tags, add_global_tag, delete_global_tag, add_tags_to_media, remove_tags_from_media, get_tag_names_for_media, add_tags_to_media_bulk, remove_tags_from_media_bulk
+from app.schemas import MediaPage, TagPayload, FavoriteFilterPayload, MEDIA_PAYLOAD_COLUMNS, media_payloads_from_rows, json_response
 from app.image_utils import generate_thumbnail, get_thumbnail_path
+from app.media_serving import send_media_file, is_within_libraries
+from app.previews import get_preview_service, neighbour_images, neighbour_images_in_list, DEFAULT_PREVIEW_PREFETCH_COUNT
 from sqlalchemy.exc import IntegrityError
-from app.utils import execute_user_filter_function
-from app.scanner import scan_libraries
-from app.file_utils import move_media_to_archive
-import os, logging, traceback
-
-routes_logger = logging.getLogger('photo_album_manager.routes')
-if not routes_logger.handlers:
-    h = logging.StreamHandler()
-    h.setFormatter(logging.Formatter('%(asctime)s - ROUTES - %(levelname)s - %(message)s'))
-    routes_logger.addHandler(h)
-    routes_logger.setLevel(logging.DEBUG)
-    routes_logger.propagate = False
+from werkzeug.exceptions import HTTPException
+from app.media_filter import cached_filter_media_ids, load_media_rows
+from app.timeline import get_timeline, seek_index
+from app.smart_albums import pin_album, unpin_album, album_media_ids
+from app.cache import bump_data_version
+from app.scanner import scan_libraries, ScanInProgressError
+from app.archive_manager import archive_media_items
+from app.jobs import start_job, get_job
+from app.selections import create_selection, get_selection, delete_selection, DEFAULT_SELECTION_TTL_SECONDS
+from app.facets import get_facets
+from app.search import media_ids_matching
+from app.duplicates import find_duplicates, get_duplicate_groups
+from app.similarity import find_similar_media, compute_missing_phashes, DEFAULT_MAX_DISTANCE
+from app import metrics
+from app.events import event_bus, format_sse, format_event_id, parse_event_id, DEFAULT_EVENT_KEEPALIVE_SECONDS, DEFAULT_EVENT_STREAM_MAX_SECONDS
+from app.logging_utils import get_logger, get_log_levels, set_log_levels
+import os, traceback, time
+from datetime import datetime, timedelta
+
+routes_logger = get_logger('routes')
 
 @current_app.route('/')
 def index_page():
@@ -23,100 +34,75 @@ def index_page():
 @current_app.route('/api/scan/trigger', methods=['POST'])
 def trigger_scan_endpoint():
     routes_logger.info("POST /api/scan/trigger called.")
+    data = request.get_json(silent=True) or {}
     try:
-        scan_libraries()
+        counts = scan_libraries(force_rescan=bool(data.get('force_rescan')))
         routes_logger.info("API: Scan completed successfully.")
-        return jsonify({'message': 'Scan completed.'}), 200
+        return jsonify({'message': 'Scan completed.', 'counts': counts}), 200
+    except ScanInProgressError as e:
+        return jsonify({'error': str(e)}), 409
     except Exception as e:
         detailed_error = traceback.format_exc()
-        routes_logger.error(f'API Scan error: {e}\n{detailed_error}', exc_info=False)
+        routes_logger.error('API Scan error: %s\n%s', e, detailed_error, exc_info=False)
         return jsonify({'error': str(e), 'trace': detailed_error}), 500
 
+def _parse_media_id(value):
+    """A media ID from a JSON body: an integer, an integral float or a string of digits. Raises
+    ValueError for anything else, including booleans (which int() would turn into 0 and 1).
+    """
+    if isinstance(value, bool):
+        raise ValueError(value)
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    raise ValueError(value)
+
 @current_app.route('/api/media/delete_selected', methods=['POST'])
 def delete_selected_media_endpoint():
     data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({'error': "Invalid payload. A JSON object with 'media_ids' or 'selection_id' is required."}), 400
+    if data.get('selection_id'): # Server-side selection (see /api/selections) instead of an ID list
+        selection = get_selection(str(data['selection_id']), current_app.config.get('SELECTION_TTL_SECONDS', DEFAULT_SELECTION_TTL_SECONDS))
+        if selection is None:
+            return jsonify({'error': 'Selection not found or expired.'}), 404
+        data = {'media_ids': selection.ids.tolist()}
     if not data or 'media_ids' not in data or not isinstance(data['media_ids'], list):
         routes_logger.warning("POST /api/media/delete_selected: Invalid payload. 'media_ids' list is required.")
-        return jsonify({'error': "Invalid payload. 'media_ids' must be a list."}), 400
+        return jsonify({'error': "Invalid payload. 'media_ids' must be a list or 'selection_id' given."}), 400
 
     media_ids_to_delete = data['media_ids']
     if not media_ids_to_delete:
         routes_logger.info("POST /api/media/delete_selected: No media IDs provided.")
         return jsonify({'message': 'No media IDs provided for deletion.'}), 200
 
-    routes_logger.info(f"Attempting to delete media items with IDs: {media_ids_to_delete}")
+    media_ids = []
+    for media_id_raw in media_ids_to_delete:
+        try:
+            media_ids.append(_parse_media_id(media_id_raw))
+        except ValueError:
+            routes_logger.warning("Invalid media ID format received: %s", media_id_raw)
+            return jsonify({'error': f"Invalid media ID format: {media_id_raw}"}), 400
+    media_ids = list(dict.fromkeys(media_ids)) # De-duplicate, keep order
+
     archive_base_path = current_app.config.get('ARCHIVE_PATH')
     if not archive_base_path or not os.path.isabs(archive_base_path):
-        routes_logger.error(f"ARCHIVE_PATH not configured or not absolute: {archive_base_path}")
+        routes_logger.error("ARCHIVE_PATH not configured or not absolute: %s", archive_base_path)
         return jsonify({'error': 'Archive path not configured correctly.'}), 500
 
-    success_count = 0
-    failed_items_info = []
-    db_items_to_remove_from_db = []
+    job = start_job('archive_delete', archive_media_items, media_ids, archive_base_path)
+    routes_logger.info("Started archive job %s for %s media items.", job.id, len(media_ids))
+    return jsonify({'message': 'Deletion started.', 'job_id': job.id, 'status_url': f'/api/jobs/{job.id}'}), 202
 
-    for media_id_raw in media_ids_to_delete:
-        try:
-            media_id = int(media_id_raw)
-            media_item = Media.query.get(media_id)
-            if not media_item:
-                routes_logger.warning(f"Media item with ID {media_id} not found for deletion.")
-                failed_items_info.append({'id': media_id, 'reason': 'Not found in DB'})
-                continue
-
-            if not os.path.isabs(media_item.filepath):
-                routes_logger.error(f"Media item ID {media_id} has a non-absolute filepath: {media_item.filepath}. Skipping.")
-                failed_items_info.append({'id': media_id, 'reason': 'Invalid (non-absolute) filepath in DB'})
-                continue
-
-            new_path = move_media_to_archive(media_item.filepath, archive_base_path)
-            if new_path:
-                routes_logger.info(f"Successfully moved file for media ID {media_id} to archive: {new_path}")
-                db_items_to_remove_from_db.append(media_item)
-            else:
-                routes_logger.error(f"Failed to move file for media ID {media_id} (path: {media_item.filepath}) to archive.")
-                failed_items_info.append({'id': media_id, 'reason': 'File move failed'})
-        except ValueError:
-            routes_logger.warning(f"Invalid media ID format received: {media_id_raw}")
-            failed_items_info.append({'id': media_id_raw, 'reason': 'Invalid ID format'})
-        except Exception as e:
-            routes_logger.error(f"Unexpected error processing media ID {media_id_raw} for deletion: {e}", exc_info=True)
-            failed_items_info.append({'id': media_id_raw, 'reason': f'Unexpected error: {str(e)}'})
-
-    if db_items_to_remove_from_db:
-        try:
-            for item_to_remove in db_items_to_remove_from_db:
-                db.session.delete(item_to_remove)
-            db.session.commit()
-            success_count = len(db_items_to_remove_from_db)
-            routes_logger.info(f"Successfully deleted {success_count} items from database.")
-        except Exception as e:
-            db.session.rollback()
-            routes_logger.error(f"Error committing deletions to database: {e}", exc_info=True)
-            for item_to_remove in db_items_to_remove_from_db:
-                if not any(f_info['id'] == item_to_remove.id for f_info in failed_items_info):
-                    failed_items_info.append({'id': item_to_remove.id, 'reason': 'DB commit failed after move'})
-            success_count = 0
-
-    summary_message = f"Delete complete. Success: {success_count}. Fail: {len(failed_items_info)}."
-    routes_logger.info(summary_message)
-    if failed_items_info:
-        routes_logger.warning(f"Failed deletion details: {failed_items_info}")
-
-    status_code = 200
-    if failed_items_info and success_count > 0:
-        status_code = 207 # Multi-Status
-    elif failed_items_info and success_count == 0:
-        status_code = 500
-        # Refine status code based on failure reasons if all failed
-        all_not_found = all(f['reason'] == 'Not found in DB' for f in failed_items_info)
-        all_invalid_id = any('Invalid ID format' in f['reason'] for f in failed_items_info) # if any invalid id, it's a client error
-
-        if all_not_found and len(failed_items_info) == len(media_ids_to_delete):
-            status_code = 404 # All specified IDs were not found
-        elif all_invalid_id:
-             status_code = 400 # At least one ID was invalid format
-
-    return jsonify({'message': summary_message, 'success_count': success_count, 'failures': failed_items_info}), status_code
+@current_app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    job = get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found.'}), 404
+    return jsonify(job.to_dict())
 
 @current_app.route('/api/media/filter_config', methods=['POST', 'DELETE'])
 def media_filter_config():
@@ -130,13 +116,150 @@ def media_filter_config():
             routes_logger.warning("Filter config POST: 'def api_select(media):' not found in filter_code.")
             return jsonify({'error': 'Filter code must contain "def api_select(media):"'}), 400
         session['media_filter_code'] = filter_code_str
-        routes_logger.info(f"Filter code updated in session (len: {len(filter_code_str)}).")
+        routes_logger.info("Filter code updated in session (len: %s).", len(filter_code_str))
         return jsonify({'message': 'Filter saved.'})
     elif request.method == 'DELETE':
         session.pop('media_filter_code', None)
         routes_logger.info("Filter code cleared from session.")
         return jsonify({'message': 'Filter cleared.'})
 
+def _parse_media_types_filter(media_types_filter_str):
+    """Turns a 'image,video' style query argument into a list of media types ([] means no filter)."""
+    if not media_types_filter_str:
+        return []
+    return [t.strip() for t in media_types_filter_str.lower().split(',') if t.strip()]
+
+# sort_by values accepted by /api/media (and used for the viewer's neighbour prefetch).
+MEDIA_ORDER_COLUMNS = {
+    'capture_time': Media.capture_time,
+    'modification_time': Media.modification_time,
+    'filepath': Media.filepath,
+    'filename': Media.filename,
+    'filesize': Media.filesize,
+    'width': Media.width,
+    'height': Media.height,
+    'camera_make': Media.camera_make,
+    'camera_model': Media.camera_model,
+    'lens_model': Media.lens_model,
+    'duration': Media.duration
+}
+
+def _apply_metadata_filters(query, args):
+    """Applies the optional scanned-metadata filters of /api/media (camera_make, camera_model,
+    orientation=landscape|portrait|square, min_width, min_height, has_gps=1|0, min_duration,
+    max_duration) as SQL conditions.
+    """
+    for column_name in ('camera_make', 'camera_model'):
+        value = args.get(column_name, '', type=str).strip()
+        if value:
+            query = query.filter(getattr(Media, column_name) == value)
+    orientation = args.get('orientation', '', type=str).lower()
+    if orientation == 'landscape':
+        query = query.filter(Media.width > Media.height)
+    elif orientation == 'portrait':
+        query = query.filter(Media.height > Media.width)
+    elif orientation == 'square':
+        query = query.filter(Media.width == Media.height)
+    min_width = args.get('min_width', type=int)
+    if min_width is not None:
+        query = query.filter(Media.width >= min_width)
+    min_height = args.get('min_height', type=int)
+    if min_height is not None:
+        query = query.filter(Media.height >= min_height)
+    min_duration = args.get('min_duration', type=float)
+    if min_duration is not None:
+        query = query.filter(Media.duration >= min_duration)
+    max_duration = args.get('max_duration', type=float)
+    if max_duration is not None:
+        query = query.filter(Media.duration <= max_duration)
+    has_gps = args.get('has_gps', '', type=str).lower()
+    if has_gps in ('1', 'true'):
+        query = query.filter(Media.gps_latitude.isnot(None), Media.gps_longitude.isnot(None))
+    elif has_gps in ('0', 'false'):
+        query = query.filter(db.or_(Media.gps_latitude.is_(None), Media.gps_longitude.is_(None)))
+    return query
+
+# Query arguments that narrow the listed media (shared by /api/media, the timeline and seek).
+MEDIA_FILTER_ARGS = ('media_types_filter', 'q', 'camera_make', 'camera_model', 'orientation', 'min_width', 'min_height',
+                     'min_duration', 'max_duration', 'has_gps', 'album')
+
+def _filter_args_key(args):
+    return tuple((name, args.get(name, '', type=str)) for name in MEDIA_FILTER_ARGS)
+
+def _filtered_media_query(args):
+    """Accessible media narrowed by the MEDIA_FILTER_ARGS in args, unordered."""
+    query = Media.query.filter_by(is_accessible=True) # Only fetch accessible media
+
+    allowed_types = _parse_media_types_filter(args.get('media_types_filter', '', type=str))
+    if allowed_types:
+        query = query.filter(Media.media_type.in_(allowed_types))
+        routes_logger.debug("Filtering by media types: %s", allowed_types)
+
+    search_subquery = media_ids_matching(args.get('q', '', type=str)) # Full-text search over filename, filepath and tags
+    if search_subquery is not None:
+        query = query.filter(Media.id.in_(search_subquery))
+
+    album_id = args.get('album', type=int) # A pinned favorite filter (smart album): its stored membership
+    if album_id is not None:
+        if not db.session.query(FavoriteFilter.id).filter_by(id=album_id, is_pinned=True).first():
+            abort(make_response(jsonify({'error': f'Smart album {album_id} not found or not pinned.'}), 404))
+        query = query.filter(Media.id.in_(album_media_ids(album_id)))
+
+    return _apply_metadata_filters(query, args)
+
+def _session_filter_code(args):
+    """The session's api_select filter code, unless a smart album (which replaces it) is requested."""
+    if args.get('album'):
+        return None
+    return session.get('media_filter_code')
+
+def _matching_ids_by_capture_time(query, descending):
+    """IDs passing the session's api_select filter in capture_time order, or None without a filter."""
+    user_filter_code = _session_filter_code(request.args)
+    if not user_filter_code:
+        return None
+    sort_order = 'desc' if descending else 'asc'
+    query = query.order_by(Media.capture_time.desc() if descending else Media.capture_time.asc())
+    return cached_filter_media_ids(query, user_filter_code, (_filter_args_key(request.args), 'capture_time', sort_order))
+
+@current_app.route('/api/media/timeline', methods=['GET'])
+def media_timeline():
+    """Per-month counts (with each month's first index in capture_time order) for the current filters."""
+    descending = request.args.get('sort_order', 'desc', type=str).lower() != 'asc'
+    query = _filtered_media_query(request.args)
+    matching_ids = _matching_ids_by_capture_time(query, descending)
+    cache_key = (_filter_args_key(request.args), _session_filter_code(request.args) or '')
+    return jsonify(get_timeline(query, cache_key, matching_ids, descending))
+
+def _parse_seek_date(value, descending):
+    """Parses YYYY-MM, YYYY-MM-DD or an ISO datetime. For newest-first seeks a month or day means its
+    last moment, so the result points at the newest item within it."""
+    if len(value) == 7: # YYYY-MM
+        start = datetime.fromisoformat(value + '-01')
+        end = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    elif len(value) == 10: # YYYY-MM-DD
+        start = datetime.fromisoformat(value)
+        end = start + timedelta(days=1)
+    else:
+        return datetime.fromisoformat(value)
+    return end - timedelta(microseconds=1) if descending else start
+
+@current_app.route('/api/media/seek', methods=['GET'])
+def media_seek():
+    """Returns the index and page (of per_page items sorted by capture_time) of the first item captured
+    at or before (sort_order=desc) or at or after (asc) the given date, for the current filters."""
+    descending = request.args.get('sort_order', 'desc', type=str).lower() != 'asc'
+    try:
+        timestamp = _parse_seek_date(request.args.get('date', '', type=str), descending)
+    except ValueError:
+        return jsonify({'error': "Query parameter 'date' must be YYYY-MM, YYYY-MM-DD or an ISO datetime."}), 400
+    per_page = request.args.get('per_page', 20, type=int)
+    if per_page <= 0:
+        return jsonify({'error': "'per_page' must be positive."}), 400
+    query = _filtered_media_query(request.args)
+    index = seek_index(query, timestamp, _matching_ids_by_capture_time(query, descending), descending)
+    return jsonify({'index': index, 'page': index // per_page + 1, 'per_page': per_page})
+
 @current_app.route('/api/media', methods=['GET'])
 def list_media():
     page = request.args.get('page', 1, type=int)
@@ -144,76 +267,47 @@ def list_media():
     sort_by = request.args.get('sort_by', 'capture_time', type=str)
     sort_order = request.args.get('sort_order', 'desc', type=str)
     media_types_filter_str = request.args.get('media_types_filter', '', type=str) # e.g., "image" or "image,video"
+    search_text = request.args.get('q', '', type=str) # Full-text search over filename, filepath and tags
 
-    routes_logger.debug(f"GET /api/media: p={page},pp={per_page_arg},sb='{sort_by}',so='{sort_order}', types='{media_types_filter_str}'")
+    routes_logger.debug("GET /api/media: p=%s,pp=%s,sb='%s',so='%s', types='%s', q='%s'", page, per_page_arg, sort_by, sort_order, media_types_filter_str, search_text)
 
-    query = Media.query.filter_by(is_accessible=True) # Only fetch accessible media
-
-    if media_types_filter_str:
-        allowed_types = [t.strip() for t in media_types_filter_str.lower().split(',') if t.strip()]
-        if allowed_types:
-            query = query.filter(Media.media_type.in_(allowed_types))
-            routes_logger.debug(f"Filtering by media types: {allowed_types}")
-
-    order_column_map = {
-        'capture_time': Media.capture_time,
-        'modification_time': Media.modification_time,
-        'filepath': Media.filepath,
-        'filename': Media.filename,
-        'filesize': Media.filesize
-    }
-    order_column = order_column_map.get(sort_by, Media.capture_time)
+    query = _filtered_media_query(request.args)
+    order_column = MEDIA_ORDER_COLUMNS.get(sort_by, Media.capture_time)
     query = query.order_by(order_column.asc() if sort_order.lower() == 'asc' else order_column.desc())
 
-    user_filter_code = session.get('media_filter_code')
-    db_items = query.all() # Fetch all after sorting
-    filtered_items = []
+    user_filter_code = _session_filter_code(request.args)
+    start_index = (page - 1) * per_page_arg
 
     if user_filter_code:
-        routes_logger.info(f"Filtering {len(db_items)} items. Filter: {user_filter_code[:70]}...")
-        for item_from_db in db_items: # Use a more descriptive variable name
-            media_dict = {
-                'tags': [t.name for t in (item_from_db.tags or [])], # Changed key 'tag' to 'tags'
-                'org_path': item_from_db.org_path, # Changed key 'org_PATH' to 'org_path'
-                'filename': item_from_db.filename,
-                'filepath': item_from_db.filepath,
-                'capture_time': item_from_db.capture_time.isoformat() if item_from_db.capture_time else None,
-                'modification_time': item_from_db.modification_time.isoformat() if item_from_db.modification_time else None,
-                'filesize': item_from_db.filesize,
-                'media_type': item_from_db.media_type,
-                'id': item_from_db.id
-            }
-            if execute_user_filter_function(media_dict, user_filter_code):
-                filtered_items.append(item_from_db)
-        routes_logger.info(f"Filter result: {len(filtered_items)} items.")
+        routes_logger.info("Filtering with: %s...", user_filter_code[:70])
+        matching_ids = cached_filter_media_ids(query, user_filter_code, (_filter_args_key(request.args), sort_by, sort_order.lower()))
+        total_items = len(matching_ids)
+        page_ids = matching_ids[start_index:start_index + per_page_arg]
+        page_rows = load_media_rows(page_ids, [getattr(Media, column) for column in MEDIA_PAYLOAD_COLUMNS])
     else:
         routes_logger.debug("No user filter.")
-        filtered_items = db_items
+        # Without a filter only the requested page is loaded, as plain column tuples.
+        total_items = query.order_by(None).count()
+        if start_index < 0 or per_page_arg <= 0:
+            page_rows = []
+        else:
+            page_rows = (query.with_entities(*(getattr(Media, column) for column in MEDIA_PAYLOAD_COLUMNS))
+                         .offset(start_index).limit(per_page_arg).all())
 
-    total_items = len(filtered_items)
-    start_index = (page - 1) * per_page_arg
-    end_index = start_index + per_page_arg
-    paginated_slice = filtered_items[start_index:end_index]
     total_pages = (total_items + per_page_arg - 1) // per_page_arg if per_page_arg > 0 else 0
     if total_items == 0: total_pages = 0
 
-    routes_logger.debug(f"Paginate: total={total_items},page={page},per_page={per_page_arg},slice_len={len(paginated_slice)}")
-    media_list_response = [
-        {
-            'id': s.id, 'filepath': s.filepath, 'filename': s.filename, 'org_path': s.org_path,
-            'capture_time': s.capture_time.isoformat() if s.capture_time else None,
-            'modification_time': s.modification_time.isoformat() if s.modification_time else None,
-            'filesize': s.filesize, 'media_type': s.media_type, 'tags': [t.name for t in (s.tags or [])]
-        } for s in paginated_slice
-    ]
-    return jsonify({'media': media_list_response, 'total_pages': total_pages, 'current_page': page, 'total_items': total_items})
+    routes_logger.debug("Paginate: total=%s,page=%s,per_page=%s,slice_len=%s", total_items, page, per_page_arg, len(page_rows))
+    tag_names = get_tag_names_for_media([row[0] for row in page_rows])
+    return json_response(MediaPage(current_page=page, media=media_payloads_from_rows(page_rows, tag_names),
+                                   total_items=total_items, total_pages=total_pages))
 
 @current_app.route('/api/tags', methods=['GET', 'POST'])
 def manage_tags_endpoint():
     if request.method == 'GET':
         routes_logger.debug("GET /api/tags")
         tags_list = get_all_global_tags()
-        return jsonify([{'id': t.id, 'name': t.name} for t in tags_list])
+        return json_response([TagPayload(id=t.id, name=t.name) for t in tags_list])
     if request.method == 'POST':
         routes_logger.debug("POST /api/tags")
         data = request.get_json()
@@ -226,70 +320,154 @@ def manage_tags_endpoint():
             return jsonify({'error': 'Tag name cannot be empty.'}), 400
         tag_object = add_global_tag(tag_name)
         if tag_object:
-            routes_logger.info(f"Tag '{tag_object.name}' (ID:{tag_object.id}) processed.")
-            return jsonify({'id':tag_object.id,'name':tag_object.name})
+            routes_logger.info("Tag '%s' (ID:%s) processed.", tag_object.name, tag_object.id)
+            return json_response(TagPayload(id=tag_object.id, name=tag_object.name))
         else:
-            routes_logger.error(f"Failed to add tag '{tag_name}'.")
+            routes_logger.error("Failed to add tag '%s'.", tag_name)
             return jsonify({'error':'Failed to add tag.'}),500
 
 @current_app.route('/api/tags/<int:tag_id>', methods=['DELETE'])
 def delete_tag_endpoint(tag_id):
-    routes_logger.info(f"DELETE /api/tags/{tag_id}")
+    routes_logger.info("DELETE /api/tags/%s", tag_id)
     tag = Tag.query.get(tag_id)
     if not tag:
-        routes_logger.warning(f"Tag ID {tag_id} not found for DELETE.")
+        routes_logger.warning("Tag ID %s not found for DELETE.", tag_id)
         return jsonify({'error': 'Tag not found.'}), 404
     tag_name = tag.name
     if delete_global_tag(tag_name):
-        routes_logger.info(f"Tag '{tag_name}' deleted.")
+        routes_logger.info("Tag '%s' deleted.", tag_name)
         return jsonify({'message':f"Tag '{tag_name}' deleted."})
     else:
-        routes_logger.error(f"Failed to delete tag '{tag_name}'.")
+        routes_logger.error("Failed to delete tag '%s'.", tag_name)
         return jsonify({'error':'Failed to delete.'}),500
 
+def _selection_ttl():
+    return current_app.config.get('SELECTION_TTL_SECONDS', DEFAULT_SELECTION_TTL_SECONDS)
+
+@current_app.route('/api/selections', methods=['POST'])
+def create_selection_endpoint():
+    # Body {"media_ids": [...]} selects those IDs. Otherwise the selection is everything /api/media would
+    # list for the same query string (media types, q, metadata filters, plus the session's api_select
+    # filter), minus any "exclude_ids" in the body.
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Invalid payload. The body must be a JSON object.'}), 400
+    if not isinstance(data.get('exclude_ids') or [], list):
+        return jsonify({'error': "'exclude_ids' must be a list."}), 400
+    try:
+        if 'media_ids' in data:
+            if not isinstance(data['media_ids'], list):
+                return jsonify({'error': "'media_ids' must be a list."}), 400
+            media_ids = [_parse_media_id(media_id) for media_id in data['media_ids']]
+        else:
+            query = _filtered_media_query(request.args)
+            user_filter_code = _session_filter_code(request.args)
+            if user_filter_code:
+                sort_by = request.args.get('sort_by', 'capture_time', type=str)
+                sort_order = request.args.get('sort_order', 'desc', type=str).lower()
+                order_column = MEDIA_ORDER_COLUMNS.get(sort_by, Media.capture_time)
+                query = query.order_by(order_column.asc() if sort_order == 'asc' else order_column.desc())
+                # Same cache key as list_media, so selecting what is on screen reuses its filter result
+                media_ids = cached_filter_media_ids(query, user_filter_code, (_filter_args_key(request.args), sort_by, sort_order))
+            else:
+                media_ids = [media_id for (media_id,) in query.with_entities(Media.id)]
+        excluded = {_parse_media_id(media_id) for media_id in data.get('exclude_ids') or []}
+    except ValueError:
+        return jsonify({'error': 'Media IDs must be integers.'}), 400
+    selection = create_selection((media_id for media_id in media_ids if media_id not in excluded), _selection_ttl())
+    routes_logger.info("Created selection %s with %s items.", selection.id, len(selection))
+    return jsonify(selection.to_dict()), 201
+
+@current_app.route('/api/selections/<selection_id>', methods=['GET'])
+def get_selection_endpoint(selection_id):
+    selection = get_selection(selection_id, _selection_ttl())
+    if selection is None:
+        return jsonify({'error': 'Selection not found or expired.'}), 404
+    result = selection.to_dict()
+    contains = request.args.get('contains', '', type=str) # e.g. the IDs on the current page
+    if contains:
+        try:
+            result['contains'] = [media_id for media_id in (int(v) for v in contains.split(',') if v) if media_id in selection]
+        except ValueError:
+            return jsonify({'error': "'contains' must be comma-separated integers."}), 400
+    return jsonify(result)
+
+@current_app.route('/api/selections/<selection_id>', methods=['DELETE'])
+def delete_selection_endpoint(selection_id):
+    if not delete_selection(selection_id):
+        return jsonify({'error': 'Selection not found or expired.'}), 404
+    return jsonify({'message': 'Selection deleted.'})
+
+def _run_bulk_tagging(job, bulk_function, media_ids, tag_names):
+    job.set_total(len(media_ids))
+    return {'changed_associations': bulk_function(media_ids, tag_names, on_progress=job.advance)}
+
+@current_app.route('/api/selections/<selection_id>/tags', methods=['POST', 'DELETE'])
+def selection_tags_endpoint(selection_id):
+    # Adds (POST) or removes (DELETE) {"tag_names": [...]} for every item of the selection, in batches
+    # in a background job. Returns the job to poll at /api/jobs/<id>.
+    selection = get_selection(selection_id, _selection_ttl())
+    if selection is None:
+        return jsonify({'error': 'Selection not found or expired.'}), 404
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('tag_names'), list):
+        return jsonify({'error': "Invalid payload. 'tag_names' list required."}), 400
+    tag_names = [str(name).strip() for name in data['tag_names'] if str(name).strip()]
+    if not tag_names:
+        return jsonify({'error': 'Tags cannot be empty/whitespace only.'}), 400
+    if request.method == 'POST':
+        kind, bulk_function = 'selection_tag', add_tags_to_media_bulk
+    else:
+        kind, bulk_function = 'selection_untag', remove_tags_from_media_bulk
+    job = start_job(kind, _run_bulk_tagging, bulk_function, selection.ids.tolist(), tag_names)
+    routes_logger.info("Started %s job %s for %s items of selection %s.", kind, job.id, len(selection), selection_id)
+    return jsonify({'message': 'Tagging started.', 'job_id': job.id, 'status_url': f'/api/jobs/{job.id}'}), 202
+
 @current_app.route('/api/media/<int:media_id>/tags', methods=['POST'])
 def add_media_item_tags_endpoint(media_id):
     media_item = Media.query.get(media_id) # Ensure Media object is fetched
     if not media_item:
-        routes_logger.warning(f"Media {media_id} not found for POST tags.")
+        routes_logger.warning("Media %s not found for POST tags.", media_id)
         return jsonify({'error':'Media not found.'}),404
 
     data = request.get_json()
     if not data or 'tag_names' not in data or not isinstance(data['tag_names'], list):
-        routes_logger.warning(f"Invalid payload for POST /api/media/{media_id}/tags.")
+        routes_logger.warning("Invalid payload for POST /api/media/%s/tags.", media_id)
         return jsonify({'error':"Invalid payload. 'tag_names' list required."}),400
 
     tag_names = [str(name).strip() for name in data['tag_names'] if str(name).strip()]
     if not tag_names and data['tag_names']: # List was not empty but all tags were whitespace
-        routes_logger.warning(f"Empty tags after strip for media {media_id}. Original: {data['tag_names']}")
+        routes_logger.warning("Empty tags after strip for media %s. Original: %s", media_id, data['tag_names'])
         return jsonify({'error': 'Tags cannot be empty/whitespace only.'}), 400
 
-    routes_logger.info(f"Adding tags {tag_names} to media {media_id}")
+    routes_logger.info("Adding tags %s to media %s", tag_names, media_id)
     if not add_tags_to_media(media_id, tag_names):
-        routes_logger.error(f"Failed to add tags {tag_names} to media {media_id} via tag_manager.")
+        routes_logger.error("Failed to add tags %s to media %s via tag_manager.", tag_names, media_id)
         return jsonify({'error':'Failed to add tags.'}),500
 
     db.session.refresh(media_item)
     updated_tags = [t.name for t in media_item.tags]
-    routes_logger.info(f"Tags for media ID {media_id} are now: {updated_tags}")
+    routes_logger.info("Tags for media ID %s are now: %s", media_id, updated_tags)
     return jsonify({'message':'Tags added.','media_id':media_id,'tags':updated_tags}),200
 
 @current_app.route('/api/media/<int:media_id>/tags/<tag_name>', methods=['DELETE'])
 def remove_specific_tag_from_media_endpoint(media_id, tag_name):
-    routes_logger.info(f"DELETE /api/media/{media_id}/tags/{tag_name} called.")
+    routes_logger.info("DELETE /api/media/%s/tags/%s called.", media_id, tag_name)
     media_item = Media.query.get(media_id)
     if not media_item:
-        routes_logger.warning(f"Media item with ID {media_id} not found for tag removal.")
+        routes_logger.warning("Media item with ID %s not found for tag removal.", media_id)
         return jsonify({'error': 'Media not found.'}), 404
 
     tag_to_remove = Tag.query.filter_by(name=tag_name).first()
     if not tag_to_remove:
-        routes_logger.warning(f"Tag '{tag_name}' not found globally, cannot remove from media ID {media_id}.")
+        routes_logger.warning("Tag '%s' not found globally, cannot remove from media ID %s.", tag_name, media_id)
         return jsonify({'error': f"Tag '{tag_name}' not found globally."}), 404
 
     # Check if the tag is actually associated with the media item
     if tag_to_remove not in media_item.tags:
-        routes_logger.info(f"Tag '{tag_name}' is not associated with media ID {media_id}. No action needed.")
+        routes_logger.info("Tag '%s' is not associated with media ID %s. No action needed.", tag_name, media_id)
         # Return current tags as if successful, as the state is already achieved
         updated_tags = [t.name for t in media_item.tags]
         return jsonify({'message': f"Tag '{tag_name}' was not associated with media item {media_id}.", 'media_id': media_id, 'tags': updated_tags}), 200
@@ -297,29 +475,175 @@ def remove_specific_tag_from_media_endpoint(media_id, tag_name):
     if remove_tags_from_media(media_id, [tag_name]):
         db.session.refresh(media_item) # Refresh to get the updated tags list
         updated_tags = [t.name for t in media_item.tags]
-        routes_logger.info(f"Tag '{tag_name}' removed from media ID {media_id}. Current tags: {updated_tags}")
+        routes_logger.info("Tag '%s' removed from media ID %s. Current tags: %s", tag_name, media_id, updated_tags)
         return jsonify({'message': f"Tag '{tag_name}' removed from media item {media_id}.", 'media_id': media_id, 'tags': updated_tags}), 200
     else:
         # This case should ideally be rare if checks above are done,
         # but could happen if remove_tags_from_media has an internal issue (e.g. DB commit error)
-        routes_logger.error(f"Failed to remove tag '{tag_name}' from media ID {media_id} using tag_manager.")
+        routes_logger.error("Failed to remove tag '%s' from media ID %s using tag_manager.", tag_name, media_id)
         return jsonify({'error': f"Failed to remove tag '{tag_name}' from media item {media_id}."}), 500
 
+@current_app.route('/api/facets', methods=['GET'])
+def get_facets_endpoint():
+    media_types = _parse_media_types_filter(request.args.get('media_types_filter', '', type=str))
+    org_path = request.args.get('org_path', None, type=str)
+    tag_name = request.args.get('tag', None, type=str)
+    routes_logger.debug("GET /api/facets: types=%s, org_path=%s, tag=%s", media_types, org_path, tag_name)
+    return jsonify(get_facets(media_types, org_path=org_path, tag=tag_name))
+
+@current_app.route('/api/duplicates', methods=['GET'])
+def list_duplicates_endpoint():
+    groups = get_duplicate_groups()
+    routes_logger.debug("GET /api/duplicates: %s groups.", len(groups))
+    return jsonify({'groups': groups, 'total_groups': len(groups)})
+
+@current_app.route('/api/duplicates/scan', methods=['POST'])
+def scan_duplicates_endpoint():
+    job = start_job('find_duplicates', find_duplicates)
+    routes_logger.info("Started duplicate detection job %s.", job.id)
+    return jsonify({'message': 'Duplicate detection started.', 'job_id': job.id, 'status_url': f'/api/jobs/{job.id}'}), 202
+
+@current_app.route('/api/similar/scan', methods=['POST'])
+def scan_similar_endpoint():
+    # Computes the perceptual hashes still missing (images whose thumbnail was never generated), so
+    # /api/media/<id>/similar considers every image.
+    job = start_job('compute_phashes', compute_missing_phashes)
+    routes_logger.info("Started perceptual hash job %s.", job.id)
+    return jsonify({'message': 'Perceptual hashing started.', 'job_id': job.id, 'status_url': f'/api/jobs/{job.id}'}), 202
+
+@current_app.route('/api/media/<int:media_id>/similar', methods=['GET'])
+def similar_media_endpoint(media_id):
+    max_distance = request.args.get('max_distance', DEFAULT_MAX_DISTANCE, type=int)
+    media_item = Media.query.get_or_404(media_id)
+    if media_item.media_type != 'image':
+        return jsonify({'error': 'Similarity search is only available for images.'}), 400
+    if media_item.phash is None:
+        # Hashed when its thumbnail is generated or by POST /api/similar/scan; not computed on a GET.
+        return jsonify({'error': 'No perceptual hash for this image yet; load its thumbnail or run POST /api/similar/scan.'}), 409
+    matches = find_similar_media(media_id, max_distance) or []
+    info = {m.id: m for m in Media.query.filter(Media.id.in_([other_id for _, other_id in matches]))} if matches else {}
+    results = [{'id': other_id, 'distance': distance, 'filename': info[other_id].filename, 'filepath': info[other_id].filepath}
+               for distance, other_id in matches if other_id in info]
+    return jsonify({'media_id': media_id, 'max_distance': max_distance, 'similar': results})
+
+@current_app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@current_app.route('/api/events', methods=['GET'])
+def event_stream():
+    # Server-Sent Events (see app/events.py). A reconnecting EventSource sends Last-Event-ID and receives
+    # the events it missed; 'resync' tells it the history no longer reaches back that far.
+    client_event_id = request.headers.get('Last-Event-ID') or request.args.get('since')
+    last_event_id = parse_event_id(client_event_id)
+    # An id from before a server restart (or otherwise unknown) cannot be caught up: start now, with a resync.
+    resync = client_event_id is not None and (last_event_id is None or last_event_id > event_bus.last_id)
+    if last_event_id is None or resync:
+        last_event_id = event_bus.last_id
+    keepalive = current_app.config.get('EVENT_KEEPALIVE_SECONDS', DEFAULT_EVENT_KEEPALIVE_SECONDS)
+    max_seconds = current_app.config.get('EVENT_STREAM_MAX_SECONDS', DEFAULT_EVENT_STREAM_MAX_SECONDS)
+    if not event_bus.open_stream():
+        # Every stream holds a server thread; past the limit the client falls back to refetching.
+        response = Response('retry: 30000\n\n', status=503, mimetype='text/event-stream')
+        response.headers['Retry-After'] = '30'
+        return response
+
+    def generate(last_id):
+        # Runs after the request context is gone, so it touches neither the database nor the session.
+        yield f'retry: 3000\nid: {format_event_id(last_id)}\n\n'
+        if resync:
+            yield 'event: resync\ndata: {}\n\n'
+        deadline = time.monotonic() + max_seconds
+        while not event_bus.closed and time.monotonic() < deadline:
+            events, gap = event_bus.events_after(last_id, timeout=min(keepalive, max(0, deadline - time.monotonic())))
+            if gap:
+                yield 'event: resync\ndata: {}\n\n'
+                if not events:
+                    last_id = event_bus.last_id
+            for event_id, event_type, data in events:
+                yield format_sse(event_id, event_type, data)
+                last_id = event_id
+            if not events:
+                yield ': keepalive\n\n' # Also lets the server notice disconnected clients
+
+    response = Response(generate(last_event_id), mimetype='text/event-stream')
+    response.call_on_close(event_bus.close_stream) # Also runs if the generator never started
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no' # nginx: deliver events as they are written
+    return response
+
+@current_app.route('/api/logging/levels', methods=['GET'])
+def get_logging_levels_endpoint():
+    return jsonify(get_log_levels())
+
+@current_app.route('/api/logging/levels', methods=['PUT'])
+def set_logging_levels_endpoint():
+    # Body: {"default": "INFO", "scanner": "DEBUG", ...}. Applies to this process only and is not persisted.
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data:
+        return jsonify({'error': "Invalid payload. Expected an object mapping component names to levels."}), 400
+    try:
+        set_log_levels(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    routes_logger.info("Log levels changed at runtime: %s", data)
+    return jsonify(get_log_levels())
+
 @current_app.route('/api/org_paths', methods=['GET'])
 def list_org_paths():
     return jsonify(current_app.config.get('ORG_PATHS',[]))
 
 @current_app.route('/api/media/file/<int:media_id>')
 def get_media_file(media_id):
-    media_item = Media.query.get_or_404(media_id)
-    # Path safety check
-    if not any(os.path.abspath(media_item.filepath).startswith(os.path.abspath(p))
-               for p in current_app.config.get('ORG_PATHS', [])):
-        abort(403)
-    # File existence check
-    if not os.path.exists(media_item.filepath):
+    filepath = db.session.query(Media.filepath).filter(Media.id == media_id).scalar()
+    if filepath is None:
+        abort(404)
+    # Checks the path against the ORG_PATHS allowlist; supports Range requests and sendfile offload.
+    return send_media_file(filepath)
+
+def _preview_neighbours(media_id, count):
+    """Images next to media_id in the listing list_media returns for the same query string."""
+    if count <= 0:
+        return []
+    sort_by = request.args.get('sort_by', 'capture_time', type=str)
+    sort_order = request.args.get('sort_order', 'desc', type=str).lower()
+    order_column = MEDIA_ORDER_COLUMNS.get(sort_by, Media.capture_time)
+    try:
+        query = _filtered_media_query(request.args)
+    except HTTPException: # e.g. an album that was unpinned meanwhile; the preview itself is still served
+        return []
+    user_filter_code = _session_filter_code(request.args)
+    if user_filter_code:
+        query = query.order_by(order_column.asc() if sort_order == 'asc' else order_column.desc())
+        # Same cache key as list_media, so the viewer reuses the filter result of the page it was opened from
+        matching_ids = cached_filter_media_ids(query, user_filter_code, (_filter_args_key(request.args), sort_by, sort_order))
+        return neighbour_images_in_list(matching_ids, media_id, count)
+    return neighbour_images(query, media_id, order_column, sort_order != 'asc', count)
+
+@current_app.route('/api/media/preview/<int:media_id>')
+def get_media_preview(media_id):
+    """Serves the downscaled preview rendition of an image (see previews.py), rendering it on first use.
+    The query string carries the listing's arguments (sort order, MEDIA_FILTER_ARGS); the neighbouring
+    images in that listing are queued for prefetching. Falls back to the original if the preview cannot
+    be rendered.
+    """
+    row = db.session.query(Media.filepath, Media.media_type, Media.modification_time).filter(Media.id == media_id).first()
+    if row is None:
         abort(404)
-    return send_from_directory(os.path.dirname(media_item.filepath), os.path.basename(media_item.filepath))
+    if row.media_type != 'image':
+        return jsonify({'message': 'Previews for images only.'}), 404
+    if not is_within_libraries(row.filepath):
+        abort(403)
+
+    previews = get_preview_service()
+    preview_path = previews.get_preview(media_id, row.filepath, row.modification_time)
+    previews.prefetch(_preview_neighbours(media_id, current_app.config.get('PREVIEW_PREFETCH_COUNT', DEFAULT_PREVIEW_PREFETCH_COUNT)))
+    if preview_path is None:
+        return send_media_file(row.filepath)
+    # The ETag follows the original, not the preview file, whose mtime is refreshed on every view.
+    etag = f'preview-{media_id}-{previews.max_edge}-{row.modification_time.timestamp() if row.modification_time else 0}'
+    return send_file(preview_path, mimetype='image/jpeg', conditional=True, etag=etag,
+                     max_age=current_app.config.get('MEDIA_CACHE_MAX_AGE', 3600))
 
 @current_app.route('/api/media/thumbnail/<int:media_id>')
 def get_media_thumbnail(media_id):
@@ -331,11 +655,17 @@ def get_media_thumbnail(media_id):
     if not os.path.exists(thumb_path):
         generated_path = generate_thumbnail(media_item)
         if not generated_path:
+            metrics.thumbnail_requests_total.inc(result='failed')
             return jsonify({'message':'Thumb gen failed.'}),500
+        metrics.thumbnail_requests_total.inc(result='generated')
+        if db.session.is_modified(media_item): # Perceptual hash computed during generation
+            db.session.commit()
+    else:
+        metrics.thumbnail_requests_total.inc(result='hit')
 
     expected_thumb_base = os.path.join(current_app.config.get('BASE_DIR',''),'data','thumbnails')
     if not os.path.abspath(thumb_dir).startswith(os.path.abspath(expected_thumb_base)):
-        routes_logger.error(f"Thumb path {thumb_dir} outside base {expected_thumb_base}. Aborting.")
+        routes_logger.error("Thumb path %s outside base %s. Aborting.", thumb_dir, expected_thumb_base)
         abort(403)
     return send_from_directory(thumb_dir, thumb_filename)
 
@@ -346,9 +676,9 @@ def get_favorite_filters():
     routes_logger.debug("GET /api/filters/favorites called")
     try:
         favorites = FavoriteFilter.query.order_by(FavoriteFilter.created_at.desc()).all()
-        return jsonify([{'id': fav.id, 'code': fav.code} for fav in favorites]), 200
+        return json_response([FavoriteFilterPayload(code=fav.code, id=fav.id, is_pinned=fav.is_pinned) for fav in favorites])
     except Exception as e:
-        routes_logger.error(f"Error fetching favorite filters: {e}", exc_info=True)
+        routes_logger.error("Error fetching favorite filters: %s", e, exc_info=True)
         return jsonify({'error': 'Failed to fetch favorite filters.'}), 500
 
 @current_app.route('/api/filters/favorites', methods=['POST'])
@@ -370,7 +700,7 @@ def add_favorite_filter():
     try:
         db.session.add(new_favorite)
         db.session.commit()
-        routes_logger.info(f"Favorite filter added with ID {new_favorite.id}.")
+        routes_logger.info("Favorite filter added with ID %s.", new_favorite.id)
         return jsonify({'id': new_favorite.id, 'code': new_favorite.code, 'message': 'Favorite filter saved.'}), 201
     except IntegrityError:
         db.session.rollback()
@@ -379,30 +709,54 @@ def add_favorite_filter():
         # For simplicity, let's inform the user it already exists.
         existing = FavoriteFilter.query.filter_by(code=code_snippet).first()
         if existing:
-             routes_logger.warning(f"Attempted to add duplicate favorite filter: {existing.id}")
+             routes_logger.warning("Attempted to add duplicate favorite filter: %s", existing.id)
              return jsonify({'id': existing.id, 'code': existing.code, 'message': 'This filter already exists in favorites.'}), 200 # Or 409 Conflict
         else: # Should not happen if IntegrityError was due to unique constraint on code
-             routes_logger.error(f"IntegrityError on adding favorite filter, but could not find existing by code: {code_snippet}", exc_info=True)
+             routes_logger.error("IntegrityError on adding favorite filter, but could not find existing by code: %s", code_snippet, exc_info=True)
              return jsonify({'error': 'Failed to save favorite filter due to a database conflict.'}), 500
     except Exception as e:
         db.session.rollback()
-        routes_logger.error(f"Error saving favorite filter: {e}", exc_info=True)
+        routes_logger.error("Error saving favorite filter: %s", e, exc_info=True)
         return jsonify({'error': 'Failed to save favorite filter.'}), 500
 
 @current_app.route('/api/filters/favorites/<int:favorite_id>', methods=['DELETE'])
 def delete_favorite_filter(favorite_id):
-    routes_logger.debug(f"DELETE /api/filters/favorites/{favorite_id} called")
+    routes_logger.debug("DELETE /api/filters/favorites/%s called", favorite_id)
     try:
         favorite = FavoriteFilter.query.get(favorite_id)
         if not favorite:
-            routes_logger.warning(f"Favorite filter with ID {favorite_id} not found for deletion.")
+            routes_logger.warning("Favorite filter with ID %s not found for deletion.", favorite_id)
             return jsonify({'error': 'Favorite filter not found.'}), 404
 
+        if favorite.is_pinned:
+            unpin_album(favorite)
+            bump_data_version()
         db.session.delete(favorite)
         db.session.commit()
-        routes_logger.info(f"Favorite filter with ID {favorite_id} deleted.")
+        routes_logger.info("Favorite filter with ID %s deleted.", favorite_id)
         return jsonify({'message': 'Favorite filter deleted successfully.'}), 200
     except Exception as e:
         db.session.rollback()
-        routes_logger.error(f"Error deleting favorite filter ID {favorite_id}: {e}", exc_info=True)
+        routes_logger.error("Error deleting favorite filter ID %s: %s", favorite_id, e, exc_info=True)
         return jsonify({'error': 'Failed to delete favorite filter.'}), 500
+
+@current_app.route('/api/filters/favorites/<int:favorite_id>/pin', methods=['POST', 'DELETE'])
+def pin_favorite_filter(favorite_id):
+    # POST pins the favorite as a smart album (evaluating it once over the library; POST again to
+    # re-evaluate from scratch), DELETE unpins it. A pinned album is listed with /api/media?album=<id>.
+    favorite = db.session.get(FavoriteFilter, favorite_id)
+    if not favorite:
+        return jsonify({'error': 'Favorite filter not found.'}), 404
+    try:
+        count = pin_album(favorite) if request.method == 'POST' else unpin_album(favorite)
+        bump_data_version()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        routes_logger.error("Error %s favorite filter %s: %s", 'pinning' if request.method == 'POST' else 'unpinning', favorite_id, e, exc_info=True)
+        return jsonify({'error': 'Failed to update the smart album.'}), 500
+    routes_logger.info("Favorite filter %s %s.", favorite_id, 'pinned' if favorite.is_pinned else 'unpinned')
+    result = {'id': favorite.id, 'is_pinned': favorite.is_pinned}
+    if favorite.is_pinned:
+        result['count'] = count
+    return jsonify(result)
@@ -1,226 +1,411 @@
 import os
+import json
+import time
+import threading
+from collections import Counter, defaultdict
 from datetime import datetime
-from PIL import Image
-from PIL.ExifTags import TAGS
-from .models import db, Media
+from .models import db, Media, ScanState, ScanDirectory
+from .cache import bump_data_version
+from . import metrics, events
 from flask import current_app
-import logging # Using logging for better debug output control in future
+from .logging_utils import get_logger, RateLimitedLog
+from .exif_reader import (read_metadata, empty_metadata, apply_exif_fields, apply_display_size,
+                          EXIF_IFD_POINTER, GPS_IFD_POINTER, TAG_IMAGE_WIDTH, TAG_IMAGE_LENGTH, IMAGE_METADATA_FIELDS)
+from .video_reader import read_video_metadata
+from .smart_albums import update_memberships
+from .utils import chunked
 
-# Configure a simple logger for scanner (can be enhanced later)
-# Use a fixed name for the logger to ensure consistency if this module is reloaded
-scanner_logger = logging.getLogger('photo_album_manager.scanner')
+# Every Media metadata column filled at scan time (capture_time is handled separately).
+SCANNED_METADATA_FIELDS = IMAGE_METADATA_FIELDS + ('duration',)
 
-# Check if handlers are already added to avoid duplication if module is reloaded (e.g. in some dev environments)
-if not scanner_logger.handlers:
-    handler = logging.StreamHandler() # Outputs to stderr by default
-    formatter = logging.Formatter('%(asctime)s - SCANNER - %(levelname)s - %(message)s')
-    handler.setFormatter(formatter)
-    scanner_logger.addHandler(handler)
-    scanner_logger.setLevel(logging.DEBUG) # Set to INFO for less verbosity, DEBUG for detailed scan process
-    scanner_logger.propagate = False # Prevent Flask's root logger from duplicating messages if it's also configured for stream output
+# Bump when the scanner starts filling new metadata: the next scan of every library then re-reads all
+# files once instead of skipping unchanged directories and files.
+SCAN_METADATA_VERSION = 1
 
-def get_capture_time_from_exif(filepath):
-    try:
-        img = Image.open(filepath)
+# Processed directories are committed (checkpointed) together at most this often; an interrupted scan
+# redoes at most this much work.
+CHECKPOINT_INTERVAL_SECONDS = 1.0
 
-        # Skip EXIF attempt for formats that typically don't have it or handle it differently
-        if img.format in ['GIF', 'PNG', 'WEBP']:
-            scanner_logger.debug(f"EXIF: Skipping EXIF read for format {img.format} on {filepath}")
-            return None
+SCAN_COUNT_KEYS = ('added', 'updated', 'made_accessible', 'newly_inaccessible', 'directories_processed', 'directories_skipped')
+
+scanner_logger = get_logger('scanner')
+
+# One scan at a time per process: concurrent scans would interleave their checkpoints.
+_scan_lock = threading.Lock()
+
+class ScanInProgressError(Exception):
+    pass
+per_file_log = RateLimitedLog(scanner_logger)
+
+def read_image_metadata_pillow(filepath):
+    """Pillow-based metadata reader, used for formats the header reader does not handle (BMP, WEBP, ...).
+    Returns the same fields as exif_reader.read_metadata(), or None if the file cannot be read as an image.
+    """
+    from PIL import Image
+    metadata = empty_metadata()
+    try:
+        with Image.open(filepath) as img:
+            # Skip EXIF attempt for formats that typically don't have it or handle it differently
+            if img.format in ['GIF', 'PNG', 'WEBP']:
+                per_file_log.debug('exif_skip_format', "EXIF: Skipping EXIF read for format %s on %s", img.format, filepath)
+                apply_display_size(metadata, *img.size)
+                return metadata
 
-        exif_data = None
-        try:
-            exif_data = img.getexif() # Preferred method for Pillow 7+
-        except AttributeError:
-            scanner_logger.debug(f"EXIF: img.getexif() failed (likely older Pillow), trying img._getexif() for {filepath}")
             try:
-                exif_data = img._getexif()
-            except AttributeError: # If _getexif also fails (e.g. for non-JPEG types passed mistakenly or very old Pillow)
-                 scanner_logger.warning(f"EXIF: Neither getexif nor _getexif method found for image {filepath} (format: {img.format}).")
-                 return None
-        except Exception as e_getexif: # Catch other errors during getexif() itself
-            scanner_logger.warning(f"EXIF: Error calling getexif/ _getexif on {filepath}: {e_getexif}")
-            return None
-
-
-        if exif_data is not None: # Check if exif_data was successfully retrieved
-            for tag_id, value in exif_data.items():
-                tag_name = TAGS.get(tag_id, tag_id)
-                if tag_name in ['DateTimeOriginal', 'DateTimeDigitized']:
-                    date_str = None
-                    if isinstance(value, str):
-                        date_str = value.strip()
-                    elif isinstance(value, bytes):
-                        date_str = value.decode('utf-8', errors='ignore').strip()
-
-                    if date_str:
-                        try:
-                            return datetime.strptime(date_str, '%Y:%m:%d %H:%M:%S')
-                        except ValueError:
-                            scanner_logger.warning(f"EXIF: Could not parse date string '{date_str}' from {tag_name} in {filepath}")
-            scanner_logger.debug(f"EXIF: DateTimeOriginal/DateTimeDigitized tags not found or empty in {filepath}")
-        else:
-            scanner_logger.debug(f"EXIF: No EXIF data retrieved from {filepath} (format: {img.format})")
+                exif_data = img.getexif()
+            except Exception as e_getexif:
+                per_file_log.warning('exif_error', "EXIF: Error calling getexif on %s: %s", filepath, e_getexif)
+                exif_data = None
+
+            if exif_data:
+                apply_exif_fields(metadata, exif_data, exif_data.get_ifd(EXIF_IFD_POINTER), exif_data.get_ifd(GPS_IFD_POINTER), filepath)
+            else:
+                per_file_log.debug('exif_none', "EXIF: No EXIF data retrieved from %s (format: %s)", filepath, img.format)
+            width, height = img.size
+            if img.format == 'TIFF' and exif_data and TAG_IMAGE_WIDTH in exif_data and TAG_IMAGE_LENGTH in exif_data:
+                # Pillow may already report TIFF sizes with the orientation applied; use the stored size.
+                width, height = exif_data[TAG_IMAGE_WIDTH], exif_data[TAG_IMAGE_LENGTH]
+            apply_display_size(metadata, width, height)
+            return metadata
 
     except FileNotFoundError:
-        scanner_logger.warning(f"EXIF: File not found when trying to open for EXIF: {filepath}")
+        per_file_log.warning('exif_missing', "EXIF: File not found when trying to open for EXIF: %s", filepath)
     except Image.UnidentifiedImageError:
-        scanner_logger.warning(f"EXIF: Cannot identify image file (Pillow UnidentifiedImageError): {filepath}")
+        per_file_log.warning('exif_unidentified', "EXIF: Cannot identify image file (Pillow UnidentifiedImageError): %s", filepath)
     except Exception as e:
         # Log other, unexpected errors during EXIF processing as errors
-        scanner_logger.error(f"EXIF: Unexpected error processing EXIF for {filepath}: {e}", exc_info=False)
+        per_file_log.error('exif_unexpected', "EXIF: Unexpected error processing EXIF for %s: %s", filepath, e, exc_info=False)
+    return None
+
+def read_image_metadata(filepath):
+    """Reads capture time, dimensions, orientation, camera, lens and GPS position of an image.
+
+    Uses the header-only reader in exif_reader.py (one bounded read, no Pillow) and falls back to
+    Pillow for formats it does not handle. Width and height are as displayed, i.e. swapped for EXIF
+    orientations 5-8. Missing values are None; returns None if the file cannot be read as an image.
+    """
+    try:
+        metadata = read_metadata(filepath)
+    except FileNotFoundError:
+        per_file_log.warning('exif_missing', "EXIF: File not found when trying to open for EXIF: %s", filepath)
+        return None
+    except OSError as e:
+        per_file_log.warning('exif_error', "EXIF: Could not read %s: %s", filepath, e)
+        return None
+    if metadata is None:
+        return read_image_metadata_pillow(filepath)
+    if metadata['capture_time'] is None:
+        per_file_log.debug('exif_no_date', "EXIF: DateTimeOriginal/DateTimeDigitized tags not found or empty in %s", filepath)
+    return metadata
+
+def get_capture_time_from_exif(filepath):
+    metadata = read_image_metadata(filepath)
+    return metadata['capture_time'] if metadata else None
+
+def _record_scan_phase(phase, phase_started):
+    now = time.perf_counter()
+    metrics.scan_phase_duration.observe(now - phase_started, phase=phase)
+    return now
+
+def _list_directory(directory, image_extensions, video_extensions):
+    """Returns the supported media files [(filename, media_type)] and the subdirectory names of a directory, both sorted.
+    Like os.walk(), symlinked directories are listed but not descended into.
+    """
+    media_files, subdirs = [], []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    if not entry.is_symlink():
+                        subdirs.append(entry.name)
+                    continue
+            except OSError:
+                continue
+            ext = os.path.splitext(entry.name)[1].lower()
+            if ext in image_extensions: media_files.append((entry.name, 'image'))
+            elif ext in video_extensions: media_files.append((entry.name, 'video'))
+    return sorted(media_files), sorted(subdirs)
+
+def _scan_file(filepath, org_path, filename, media_type, media_item, reread_unchanged):
+    """Adds or updates the Media row of one file.
+    Returns 'added', 'updated', 'made_accessible' or None (nothing changed or the file is gone).
+    """
+    try:
+        stat_info = os.stat(filepath)
+    except FileNotFoundError:
+        per_file_log.warning('stat_missing', "File %s not found during stat (it was present in the directory listing). Skipping.", filepath)
+        return None
+
+    modification_time = datetime.fromtimestamp(stat_info.st_mtime)
+    filesize = stat_info.st_size
+    if (media_item is not None and not reread_unchanged and media_item.modification_time == modification_time and
+            media_item.filesize == filesize and media_item.org_path == org_path and media_item.media_type == media_type):
+        # Unchanged file: its metadata was read by an earlier scan.
+        if media_item.is_accessible is not True:
+            media_item.is_accessible = True
+            return 'made_accessible'
+        return None
+
+    scanned_metadata = dict.fromkeys(SCANNED_METADATA_FIELDS)
+    if media_type == 'image':
+        scanned_metadata.update(read_image_metadata(filepath) or {})
+    else:
+        scanned_metadata.update(read_video_metadata(filepath) or {})
+    capture_time = scanned_metadata.pop('capture_time', None)
+
+    # Fallback strategy for effective_capture_time:
+    # 1. EXIF capture time (images) or container creation time (videos)
+    # 2. File modification time
+    # 3. Hardcoded default (1999-01-01)
+    if capture_time:
+        effective_capture_time = capture_time
+    elif modification_time: # modification_time is already a datetime object
+        effective_capture_time = modification_time
+        per_file_log.debug('mtime_capture_time', "EXIF: Using file modification time %s as capture time for %s", effective_capture_time, filepath)
+    else: # Should be very rare if os.stat worked
+        effective_capture_time = datetime(1999, 1, 1, 0, 0, 0)
+        per_file_log.warning('default_capture_time', "EXIF: Using default 1999-01-01 capture time for %s (no EXIF and no mod time).", filepath)
+
+    if media_item is None:
+        per_file_log.debug('add', "ADDING new media: %s", filepath)
+        db.session.add(Media(
+            filepath=filepath, org_path=org_path,
+            filename=filename, capture_time=effective_capture_time,
+            modification_time=modification_time, filesize=filesize,
+            media_type=media_type,
+            is_accessible=True, # New items are accessible
+            **scanned_metadata
+        ))
+        return 'added'
+
+    # Compare relevant fields to see if an update is needed
+    if (media_item.modification_time != modification_time or
+        media_item.filesize != filesize or
+        media_item.capture_time != effective_capture_time or
+        media_item.media_type != media_type or
+        media_item.org_path != org_path or
+        media_item.filename != filename or
+        any(getattr(media_item, field) != value for field, value in scanned_metadata.items())):
+
+        per_file_log.debug('update', "UPDATING metadata (and/or marking accessible) for: %s", filepath)
+        if media_item.modification_time != modification_time or media_item.filesize != filesize:
+            media_item.phash = None # Content changed; recomputed with the next thumbnail or backfill
+        media_item.modification_time = modification_time
+        media_item.filesize = filesize
+        media_item.capture_time = effective_capture_time
+        media_item.media_type = media_type
+        media_item.org_path = org_path
+        media_item.filename = filename
+        for field, value in scanned_metadata.items():
+            setattr(media_item, field, value)
+        media_item.is_accessible = True # Mark as accessible
+        return 'updated'
+    if media_item.is_accessible is not True: # No metadata change, but was marked inaccessible
+        per_file_log.debug('mark_accessible', "Marking item as accessible (no other metadata changes): %s", filepath)
+        media_item.is_accessible = True
+        return 'made_accessible'
     return None
 
-def scan_libraries():
+def _mark_inaccessible(filepaths):
+    """Marks the accessible media among filepaths as inaccessible and returns how many there were."""
+    marked = 0
+    for chunk in chunked(sorted(filepaths)):
+        for filepath in chunk:
+            per_file_log.info('mark_inaccessible', "Marking as inaccessible (file deleted from disk): %s", filepath)
+        marked += (Media.query.filter(Media.filepath.in_(chunk), Media.is_accessible.is_(True))
+                   .update({Media.is_accessible: False}, synchronize_session=False))
+    return marked
+
+def _process_directory(directory, org_path, media_files, known_filepaths, reread_unchanged, counts, changed_filepaths):
+    """Adds/updates the media files of one directory and marks its media that are no longer on disk
+    as inaccessible. Appends the paths of added or updated media to changed_filepaths.
+    Returns True if anything in the database changed.
+    """
+    change_keys = ('added', 'updated', 'made_accessible', 'newly_inaccessible')
+    changes_before = sum(counts[key] for key in change_keys)
+    filepaths = [os.path.join(directory, filename) for filename, _ in media_files]
+    existing_media = {}
+    for chunk in chunked(filepaths):
+        existing_media.update((media.filepath, media) for media in Media.query.filter(Media.filepath.in_(chunk)))
+    for (filename, media_type), filepath in zip(media_files, filepaths):
+        outcome = _scan_file(filepath, org_path, filename, media_type, existing_media.get(filepath), reread_unchanged)
+        if outcome:
+            counts[outcome] += 1
+            if outcome != 'made_accessible':
+                changed_filepaths.append(filepath)
+    counts['newly_inaccessible'] += _mark_inaccessible(known_filepaths - set(filepaths))
+    return sum(counts[key] for key in change_keys) != changes_before
+
+def _update_smart_albums(changed_filepaths):
+    """Re-evaluates pinned smart albums for the media added or updated since the last checkpoint, in the
+    checkpoint's transaction. Clears changed_filepaths.
+    """
+    if not changed_filepaths:
+        return
+    db.session.flush()
+    media_ids = []
+    for chunk in chunked(changed_filepaths):
+        media_ids.extend(media_id for (media_id,) in db.session.query(Media.id).filter(Media.filepath.in_(chunk)))
+    update_memberships(media_ids)
+    changed_filepaths.clear()
+
+def _retire_library(org_path):
+    """Hides the media of a library that is no longer scanned and forgets its scan state, so the
+    library is processed in full if it comes back. Returns the number of media marked inaccessible.
+    """
+    marked = (Media.query.filter(Media.org_path == org_path, Media.is_accessible.is_(True))
+              .update({Media.is_accessible: False}, synchronize_session=False))
+    ScanDirectory.query.filter_by(org_path=org_path).delete(synchronize_session=False)
+    ScanState.query.filter_by(org_path=org_path).delete(synchronize_session=False)
+    if marked:
+        bump_data_version()
+    db.session.commit()
+    return marked
+
+def _scan_library(org_path, image_extensions, video_extensions, full_rescan, counts):
+    """Scans one library root depth-first, checkpointing processed directories every CHECKPOINT_INTERVAL_SECONDS."""
+    state = db.session.get(ScanState, org_path)
+    if state is None:
+        state = ScanState(org_path=org_path, generation=0, in_progress=False)
+        db.session.add(state)
+    full_rescan = full_rescan or state.metadata_version != SCAN_METADATA_VERSION
+    if state.in_progress:
+        scanner_logger.info("Resuming interrupted scan %s of %s (last completed directory: %s).", state.generation, org_path, state.last_completed_directory)
+        full_rescan = full_rescan or state.full_rescan # An interrupted full scan stays full
+    else:
+        state.generation += 1
+        state.in_progress = True
+        state.started_at = datetime.utcnow()
+        state.last_completed_directory = None
+    state.full_rescan = full_rescan
+    generation = state.generation
+    db.session.commit()
+    scanner_logger.info("Scanning library: %s (scan %s%s)", org_path, generation, ', full' if full_rescan else '')
+
+    known_by_directory = defaultdict(set)
+    for (filepath,) in db.session.query(Media.filepath).filter(Media.org_path == org_path, Media.is_accessible.is_(True)):
+        known_by_directory[os.path.dirname(filepath)].add(filepath)
+    stored_directories = {path: (mtime_ns, subdirs, directory_generation) for path, mtime_ns, subdirs, directory_generation in
+                          db.session.query(ScanDirectory.path, ScanDirectory.mtime_ns, ScanDirectory.subdirs, ScanDirectory.generation)
+                          .filter(ScanDirectory.org_path == org_path)}
+
+    visited = set()
+    pending = [org_path]
+    changed_filepaths = []
+    data_changed = False
+    last_checkpoint = time.monotonic()
+    while pending:
+        directory = pending.pop()
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns # Before listing, so a concurrent change is picked up next time
+        except OSError as e:
+            scanner_logger.warning("Cannot access directory %s: %s", directory, e)
+            continue
+        stored = stored_directories.get(directory)
+        if stored is not None and (stored[2] == generation or (not full_rescan and stored[0] == mtime_ns)):
+            # Already done by the interrupted run of this scan, or no entries added/removed since it was processed.
+            subdirs = json.loads(stored[1])
+            counts['directories_skipped'] += 1
+        else:
+            try:
+                media_files, subdirs = _list_directory(directory, image_extensions, video_extensions)
+            except OSError as e:
+                scanner_logger.warning("Cannot list directory %s: %s", directory, e)
+                continue
+            # Pending rows are flushed in one go at the checkpoint rather than before every query.
+            with db.session.no_autoflush:
+                changed = _process_directory(directory, org_path, media_files, known_by_directory.get(directory, set()), full_rescan, counts, changed_filepaths)
+                directory_state = {'mtime_ns': mtime_ns, 'subdirs': json.dumps(subdirs), 'generation': generation}
+                if stored is None:
+                    db.session.add(ScanDirectory(path=directory, org_path=org_path, **directory_state))
+                else:
+                    ScanDirectory.query.filter_by(org_path=org_path, path=directory).update(directory_state, synchronize_session=False)
+            state.last_completed_directory = directory
+            data_changed = data_changed or changed
+            counts['directories_processed'] += 1
+            if time.monotonic() - last_checkpoint >= CHECKPOINT_INTERVAL_SECONDS:
+                _update_smart_albums(changed_filepaths)
+                if data_changed:
+                    bump_data_version()
+                db.session.commit() # Checkpoint: an interrupted scan resumes after this directory
+                data_changed = False
+                last_checkpoint = time.monotonic()
+        visited.add(directory)
+        pending.extend(os.path.join(directory, name) for name in reversed(subdirs))
+
+    # Directories that disappeared (or could not be read) take their media with them.
+    newly_inaccessible = 0
+    for directory, filepaths in known_by_directory.items():
+        if directory not in visited:
+            newly_inaccessible += _mark_inaccessible(filepaths)
+    counts['newly_inaccessible'] += newly_inaccessible
+    data_changed = data_changed or newly_inaccessible > 0
+    for chunk in chunked([path for path in stored_directories if path not in visited]):
+        ScanDirectory.query.filter(ScanDirectory.org_path == org_path, ScanDirectory.path.in_(chunk)).delete(synchronize_session=False)
+    state.in_progress = False
+    state.full_rescan = False
+    state.completed_at = datetime.utcnow()
+    state.metadata_version = SCAN_METADATA_VERSION
+    _update_smart_albums(changed_filepaths)
+    if data_changed:
+        bump_data_version()
+    db.session.commit()
+
+def scan_libraries(force_rescan=False):
+    """Scans every ORG_PATHS library and returns a dict of counts (see SCAN_COUNT_KEYS).
+
+    Work is committed in per-directory checkpoints, and per-library scan state (ScanState, ScanDirectory) is
+    kept in the database: a scan that is interrupted resumes where it stopped, and, with
+    SCAN_SKIP_UNCHANGED_DIRS, directories whose mtime has not changed since they were processed are not
+    listed again and files whose mtime and size are unchanged are not re-read. force_rescan (or a new
+    SCAN_METADATA_VERSION) processes every directory and re-reads every file. Media are only marked
+    inaccessible once their file is known to be gone, so an aborted scan never hides a library.
+    Raises ScanInProgressError if another scan is running in this process.
+    """
+    if not _scan_lock.acquire(blocking=False):
+        raise ScanInProgressError("A library scan is already running.")
+    try:
+        return _scan_libraries(force_rescan)
+    finally:
+        _scan_lock.release()
+
+def _scan_libraries(force_rescan):
     scanner_logger.info("Starting library scan...")
+    scan_started = phase_started = time.perf_counter()
     ORG_PATHS = current_app.config.get('ORG_PATHS', [])
     SUPPORTED_IMAGE_EXTENSIONS = current_app.config.get('SUPPORTED_IMAGE_EXTENSIONS', [])
     SUPPORTED_VIDEO_EXTENSIONS = current_app.config.get('SUPPORTED_VIDEO_EXTENSIONS', [])
+    skip_unchanged = current_app.config.get('SCAN_SKIP_UNCHANGED_DIRS', True)
 
     if not ORG_PATHS:
         scanner_logger.warning("No ORG_PATHS configured. Aborting scan.")
-        return
+        return dict.fromkeys(SCAN_COUNT_KEYS, 0)
 
-    all_media_files_in_fs = []
-    total_files_found_in_fs = 0
+    counts = Counter()
+    # Libraries removed from the configuration stay in the database but are hidden.
+    configured_org_paths = set(ORG_PATHS)
+    previous_org_paths = {org_path for (org_path,) in db.session.query(Media.org_path).distinct()}
+    previous_org_paths.update(org_path for (org_path,) in db.session.query(ScanState.org_path))
+    for org_path in sorted(previous_org_paths - configured_org_paths):
+        counts['newly_inaccessible'] += _retire_library(org_path)
+    phase_started = _record_scan_phase('prepare', phase_started)
 
     for org_path_root in ORG_PATHS:
-        if not os.path.exists(org_path_root):
-            scanner_logger.warning(f"Library path {org_path_root} does not exist. Skipping.")
+        if not os.path.isdir(org_path_root):
+            scanner_logger.warning("Library path %s does not exist. Skipping.", org_path_root)
+            counts['newly_inaccessible'] += _retire_library(org_path_root)
             continue
-
-        scanner_logger.info(f"Scanning library: {org_path_root}")
-        files_in_org_path = 0
-        for root, _, files in os.walk(org_path_root):
-            for filename in files:
-                filepath = os.path.join(root, filename)
-                ext = os.path.splitext(filename)[1].lower()
-                media_type = None
-                if ext in SUPPORTED_IMAGE_EXTENSIONS: media_type = 'image'
-                elif ext in SUPPORTED_VIDEO_EXTENSIONS: media_type = 'video'
-
-                if media_type:
-                    files_in_org_path += 1
-                    all_media_files_in_fs.append({
-                        "filepath": filepath, "org_path": org_path_root,
-                        "filename": filename, "media_type": media_type
-                    })
-        scanner_logger.info(f"Found {files_in_org_path} supported media files in {org_path_root}.")
-        total_files_found_in_fs += files_in_org_path
-
-    scanner_logger.info(f"Total supported media files found across all libraries: {total_files_found_in_fs}")
-
-    # Phase 1: Mark all items as potentially inaccessible
-    # We commit this separately to ensure this state is captured before further processing
-    # if the scan is interrupted.
-    # However, for a single transaction, we might defer commit until the end.
-    # For simplicity and clarity of this step, let's make it part of the main transaction.
-    # If performance becomes an issue on very large DBs, this could be optimized.
-    scanner_logger.info("Marking all existing database media as potentially inaccessible before scan verification...")
-    all_db_media_count = Media.query.update({Media.is_accessible: False})
-    db.session.commit() # Commit this initial marking to ensure it's visible to subsequent queries
-    scanner_logger.info(f"Marked {all_db_media_count} items and committed. Note: is_accessible will be set to True for found/updated items.")
-
-
-    existing_media_in_db = {media.filepath: media for media in Media.query.all()} # Re-fetch to ensure objects reflect committed state
-    scanner_logger.debug(f"Found {len(existing_media_in_db)} media items currently in database (after initial marking).")
-
-    processed_paths_in_fs = set() # Keep track of paths found in this scan run
-    items_added_count = 0
-    items_updated_count = 0
-    # items_removed_count = 0 # Will be items_marked_inaccessible_or_retained_as_inaccessible
-    items_made_accessible_count = 0
-    items_newly_marked_inaccessible_fs = 0 # Files that disappeared from an active ORG_PATH
-
-    for media_data in all_media_files_in_fs:
-        filepath = media_data["filepath"]
-        processed_paths_in_fs.add(filepath) # Mark this path as seen in current FS scan
-
         try:
-            stat_info = os.stat(filepath)
-        except FileNotFoundError:
-            scanner_logger.warning(f"File {filepath} not found during stat (it was present during os.walk). Skipping.")
-            continue
-
-        modification_time = datetime.fromtimestamp(stat_info.st_mtime)
-        filesize = stat_info.st_size
-        capture_time = None
-        if media_data["media_type"] == 'image':
-            capture_time = get_capture_time_from_exif(filepath)
-
-        # Fallback strategy for effective_capture_time:
-        # 1. EXIF capture time
-        # 2. File modification time
-        # 3. Hardcoded default (1999-01-01)
-        if capture_time:
-            effective_capture_time = capture_time
-        elif modification_time: # modification_time is already a datetime object
-            effective_capture_time = modification_time
-            scanner_logger.debug(f"EXIF: Using file modification time {effective_capture_time} as capture time for {filepath}")
-        else: # Should be very rare if os.stat worked
-            effective_capture_time = datetime(1999, 1, 1, 0, 0, 0)
-            scanner_logger.warning(f"EXIF: Using default 1999-01-01 capture time for {filepath} (no EXIF and no mod time).")
-
-        if filepath in existing_media_in_db:
-            media_item = existing_media_in_db[filepath]
-            # Compare relevant fields to see if an update is needed
-            if (media_item.modification_time != modification_time or
-                media_item.filesize != filesize or
-                media_item.capture_time != effective_capture_time or
-                media_item.media_type != media_data["media_type"] or
-                media_item.org_path != media_data["org_path"] or
-                media_item.filename != media_data["filename"] or
-                media_item.is_accessible is not True): # Also update if it was marked inaccessible
-
-                scanner_logger.debug(f"UPDATING metadata (and/or marking accessible) for: {filepath}")
-                media_item.modification_time = modification_time
-                media_item.filesize = filesize
-                media_item.capture_time = effective_capture_time
-                media_item.media_type = media_data["media_type"]
-                media_item.org_path = media_data["org_path"]
-                media_item.filename = media_data["filename"]
-                media_item.is_accessible = True # Mark as accessible
-                items_updated_count += 1
-            elif media_item.is_accessible is not True: # No metadata change, but was marked inaccessible
-                scanner_logger.debug(f"Marking item as accessible (no other metadata changes): {filepath}")
-                media_item.is_accessible = True
-                items_made_accessible_count +=1 # Count this separately
-            # else:
-                # scanner_logger.debug(f"No changes detected for existing item: {filepath}, already accessible.")
-        else:
-            scanner_logger.debug(f"ADDING new media: {filepath}")
-            media_item = Media(
-                filepath=filepath, org_path=media_data["org_path"],
-                filename=media_data["filename"], capture_time=effective_capture_time,
-                modification_time=modification_time, filesize=filesize,
-                media_type=media_data["media_type"],
-                is_accessible=True # New items are accessible
-            )
-            db.session.add(media_item)
-            items_added_count += 1
-
-    # Phase 3: Identify items in DB that are part of an active ORG_PATH but were not found in FS.
-    # These are files that were deleted from the disk from a still-configured library.
-    # Instead of deleting them from DB, mark them as is_accessible = False.
-    # Items from ORG_PATHS that are no longer in config.py will remain is_accessible=False
-    # from the initial marking phase and won't be touched here.
-
-    current_configured_org_paths = set(ORG_PATHS)
-    for db_media_item in existing_media_in_db.values(): # Iterate through all items fetched at start of scan
-        if db_media_item.org_path in current_configured_org_paths: # If its library is still configured
-            if db_media_item.filepath not in processed_paths_in_fs: # But the file itself is no longer on disk
-                if db_media_item.is_accessible is True: # And it was previously accessible
-                    scanner_logger.info(f"Marking as inaccessible (file deleted from disk): {db_media_item.filepath}")
-                    db_media_item.is_accessible = False
-                    items_newly_marked_inaccessible_fs += 1
-        # else: item's org_path is not in current ORG_PATHS, it remains is_accessible=False from initial step.
-
-    try:
-        db.session.commit()
-        scanner_logger.info("Database changes committed successfully.")
-    except Exception as e:
-        db.session.rollback()
-        scanner_logger.error(f"Error committing changes to database: {e}", exc_info=True)
+            _scan_library(org_path_root, SUPPORTED_IMAGE_EXTENSIONS, SUPPORTED_VIDEO_EXTENSIONS,
+                          force_rescan or not skip_unchanged, counts)
+        except Exception:
+            db.session.rollback() # Keeps the checkpoints committed so far; the next scan resumes from there
+            raise
+    phase_started = _record_scan_phase('process_files', phase_started)
+    metrics.scan_phase_duration.observe(time.perf_counter() - scan_started, phase='total')
 
     total_accessible_in_db = Media.query.filter_by(is_accessible=True).count()
-    scanner_logger.info(f"Library scan finished. Added: {items_added_count}, Updated: {items_updated_count}, Newly Inaccessible (FS delete): {items_newly_marked_inaccessible_fs}. Total accessible in DB: {total_accessible_in_db} (Total in DB: {Media.query.count()}).")
+    scanner_logger.info("Library scan finished. Added: %s, Updated: %s, Made accessible: %s, Newly Inaccessible: %s, Directories processed: %s, skipped as unchanged: %s. Total accessible in DB: %s (Total in DB: %s).", counts['added'], counts['updated'], counts['made_accessible'], counts['newly_inaccessible'], counts['directories_processed'], counts['directories_skipped'], total_accessible_in_db, Media.query.count())
+    result = {key: counts[key] for key in SCAN_COUNT_KEYS}
+    events.publish('library_scanned', counts=result)
+    return result
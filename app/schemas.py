@@ -0,0 +1,59 @@
+from datetime import datetime
+from typing import Optional
+import msgspec
+from flask import current_app, Response
+
+# Typed response payloads encoded with msgspec instead of jsonify.
+# Fields are declared in alphabetical order because jsonify sorts keys; with that, the encoded
+# output is byte-identical to the previous jsonify output for ASCII data (msgspec writes non-ASCII
+# characters as UTF-8 instead of \uXXXX escapes, which is the same JSON value).
+# Naive datetimes encode exactly like datetime.isoformat().
+
+class TagPayload(msgspec.Struct):
+    id: int
+    name: str
+
+class MediaPayload(msgspec.Struct):
+    capture_time: Optional[datetime]
+    filename: str
+    filepath: str
+    filesize: Optional[int]
+    id: int
+    media_type: str
+    modification_time: Optional[datetime]
+    org_path: str
+    tags: list[str]
+
+class MediaPage(msgspec.Struct):
+    current_page: int
+    media: list[MediaPayload]
+    total_items: int
+    total_pages: int
+
+class FavoriteFilterPayload(msgspec.Struct):
+    code: str
+    id: int
+    is_pinned: bool = False
+
+# Column order of the tuples accepted by media_payloads_from_rows().
+MEDIA_PAYLOAD_COLUMNS = ('id', 'filepath', 'filename', 'org_path', 'capture_time', 'modification_time', 'filesize', 'media_type')
+
+_encoder = msgspec.json.Encoder()
+
+def media_payloads_from_rows(rows, tag_names_by_media_id):
+    """Builds MediaPayloads from (id, filepath, filename, org_path, capture_time, modification_time,
+    filesize, media_type) tuples and a {media_id: [tag names]} mapping.
+    """
+    return [MediaPayload(capture_time=capture_time, filename=filename, filepath=filepath, filesize=filesize,
+                         id=media_id, media_type=media_type, modification_time=modification_time,
+                         org_path=org_path, tags=tag_names_by_media_id.get(media_id, []))
+            for media_id, filepath, filename, org_path, capture_time, modification_time, filesize, media_type in rows]
+
+def json_response(payload, status=200):
+    """Encodes a Struct (or list of Structs) like jsonify would: compact with a trailing newline,
+    pretty-printed with two-space indentation when the app runs in debug mode.
+    """
+    body = _encoder.encode(payload)
+    if current_app.debug:
+        body = msgspec.json.format(body, indent=2)
+    return Response(body + b'\n', status=status, mimetype='application/json')
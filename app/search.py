@@ -0,0 +1,89 @@
+import re
+from contextlib import contextmanager
+from sqlalchemy import text, select, table, column
+from .models import db
+from .logging_utils import get_logger
+
+search_logger = get_logger('search')
+
+# FTS5 index over media filenames, paths and tag names. rowid is media.id.
+# It is kept in sync by SQLite triggers, so every writer (scanner, tag_manager,
+# bulk archive deletes, raw SQL) updates it without extra Python hooks.
+media_fts = table('media_fts', column('rowid'), column('media_fts'))
+
+_TAGS_FOR_MEDIA_SQL = ("SELECT coalesce(group_concat(tag.name, ' '), '') FROM media_tag "
+                       "JOIN tag ON tag.id = media_tag.tag_id WHERE media_tag.media_id = {media_id}")
+
+FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS media_fts USING fts5("
+    "filename, filepath, tags, tokenize = 'unicode61', prefix = '2 3')",
+    "CREATE TRIGGER IF NOT EXISTS media_fts_ai AFTER INSERT ON media BEGIN "
+    "INSERT INTO media_fts (rowid, filename, filepath, tags) VALUES (new.id, new.filename, new.filepath, ''); END",
+    "CREATE TRIGGER IF NOT EXISTS media_fts_au AFTER UPDATE OF filename, filepath ON media BEGIN "
+    "UPDATE media_fts SET filename = new.filename, filepath = new.filepath WHERE rowid = new.id; END",
+    "CREATE TRIGGER IF NOT EXISTS media_fts_ad AFTER DELETE ON media BEGIN "
+    "DELETE FROM media_fts WHERE rowid = old.id; END",
+    "CREATE TRIGGER IF NOT EXISTS media_tag_fts_ai AFTER INSERT ON media_tag BEGIN "
+    "UPDATE media_fts SET tags = (" + _TAGS_FOR_MEDIA_SQL.format(media_id='new.media_id') + ") "
+    "WHERE rowid = new.media_id; END",
+    "CREATE TRIGGER IF NOT EXISTS media_tag_fts_ad AFTER DELETE ON media_tag BEGIN "
+    "UPDATE media_fts SET tags = (" + _TAGS_FOR_MEDIA_SQL.format(media_id='old.media_id') + ") "
+    "WHERE rowid = old.media_id; END",
+]
+
+_FTS_TRIGGERS = ('media_fts_ai', 'media_fts_au', 'media_fts_ad', 'media_tag_fts_ai', 'media_tag_fts_ad')
+
+def _fill_search_index():
+    db.session.execute(text("DELETE FROM media_fts"))
+    db.session.execute(text(
+        "INSERT INTO media_fts (rowid, filename, filepath, tags) "
+        "SELECT media.id, media.filename, media.filepath, (" + _TAGS_FOR_MEDIA_SQL.format(media_id='media.id') + ") "
+        "FROM media"))
+
+def rebuild_search_index():
+    """Repopulates media_fts from the media and media_tag tables."""
+    _fill_search_index()
+    db.session.commit()
+
+@contextmanager
+def search_index_suspended():
+    """For bulk loads: drops the sync triggers, and afterwards recreates them and refills the index in
+    one pass instead of a trigger run (a tag list rebuild for media_tag) per inserted row.
+    Everything happens in the caller's transaction, which the caller commits or rolls back.
+    """
+    db.session.execute(text("DELETE FROM media_fts")) # DML first: it opens the transaction the DDL joins
+    for trigger in _FTS_TRIGGERS:
+        db.session.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+    yield
+    for statement in FTS_DDL:
+        db.session.execute(text(statement))
+    _fill_search_index()
+
+def init_search_index():
+    """Creates the FTS5 table and its sync triggers if missing; fills the table on first creation."""
+    exists = db.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'media_fts'")).first() is not None
+    for statement in FTS_DDL:
+        db.session.execute(text(statement))
+    db.session.commit()
+    if not exists:
+        search_logger.info("Created full-text search index; indexing existing media...")
+        rebuild_search_index()
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+def build_fts_query(search_text):
+    """Turns free text into an FTS5 MATCH expression: every token must match as a prefix.
+    Returns None when the text contains no searchable tokens.
+    """
+    tokens = _TOKEN_RE.findall(search_text or '')
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+def media_ids_matching(search_text):
+    """A subquery of media IDs matching search_text, or None if there is nothing to search for."""
+    fts_query = build_fts_query(search_text)
+    if fts_query is None:
+        return None
+    return select(media_fts.c.rowid).where(media_fts.c.media_fts.op('MATCH')(fts_query))
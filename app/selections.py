@@ -0,0 +1,67 @@
+import array
+import bisect
+import threading
+import time
+import uuid
+from .logging_utils import get_logger
+
+selections_logger = get_logger('selections')
+
+# Server-side selections: a set of media IDs (e.g. "everything matching the current filter") that the
+# client refers to by a handle instead of sending the IDs with every batch request. The IDs are kept as
+# a sorted array of 64-bit integers (8 bytes per item, no per-object overhead), so a selection of the
+# whole library stays small and batch operations can walk it in ID order.
+# Like jobs, selections live in process memory: unused ones expire after SELECTION_TTL_SECONDS and
+# only the MAX_SELECTIONS most recently used are kept.
+DEFAULT_SELECTION_TTL_SECONDS = 3600
+MAX_SELECTIONS = 100
+
+class Selection:
+    def __init__(self, media_ids):
+        self.id = uuid.uuid4().hex
+        self.ids = array.array('q', sorted(set(media_ids)))
+        self.created_at = time.time()
+        self.last_used = self.created_at
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, media_id):
+        index = bisect.bisect_left(self.ids, media_id)
+        return index < len(self.ids) and self.ids[index] == media_id
+
+    def to_dict(self):
+        return {'id': self.id, 'count': len(self.ids)}
+
+_selections = {}
+_selections_lock = threading.Lock()
+
+def _prune(ttl_seconds):
+    now = time.time()
+    for selection_id in [s.id for s in _selections.values() if now - s.last_used > ttl_seconds]:
+        del _selections[selection_id]
+    by_use = sorted(_selections.values(), key=lambda s: s.last_used)
+    for selection in by_use[:max(0, len(by_use) - MAX_SELECTIONS)]:
+        del _selections[selection.id]
+
+def create_selection(media_ids, ttl_seconds=DEFAULT_SELECTION_TTL_SECONDS):
+    """Stores the given media IDs as a new selection and returns it."""
+    selection = Selection(media_ids)
+    with _selections_lock:
+        _prune(ttl_seconds)
+        _selections[selection.id] = selection
+    selections_logger.debug("Created selection %s with %s items.", selection.id, len(selection))
+    return selection
+
+def get_selection(selection_id, ttl_seconds=DEFAULT_SELECTION_TTL_SECONDS):
+    """Returns the selection or None if it is unknown or expired."""
+    with _selections_lock:
+        _prune(ttl_seconds)
+        selection = _selections.get(selection_id)
+        if selection is not None:
+            selection.last_used = time.time()
+        return selection
+
+def delete_selection(selection_id):
+    with _selections_lock:
+        return _selections.pop(selection_id, None) is not None
@@ -0,0 +1,170 @@
+import importlib.util
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import request
+from werkzeug.serving import BaseWSGIServer
+from .models import db, FavoriteFilter
+from .events import event_bus
+from .jobs import wait_for_jobs
+from .previews import get_preview_service
+from .utils import compile_user_filter
+from .logging_utils import get_logger
+
+server_logger = get_logger('server')
+
+# Production serving for `flask serve`. With gunicorn installed, the app runs in SERVER_WORKERS
+# pre-forked processes with SERVER_THREADS threads each (gthread workers); the app is created and
+# warmed up once in the master before forking. Without gunicorn it runs in one process on a werkzeug
+# server with a pool of SERVER_THREADS request threads. Either way, SIGTERM/SIGINT stop accepting
+# connections, end the open event streams, let in-flight requests (including synchronous scans) finish
+# and wait up to SERVER_SHUTDOWN_TIMEOUT seconds for background jobs before the process exits.
+# Open /api/events streams each hold a request thread, so unless EVENT_MAX_STREAMS is configured they
+# are limited to half of SERVER_THREADS; the other threads always remain for ordinary requests.
+# Jobs, selections and the event bus live in process memory, so SERVER_WORKERS above 1 only works for
+# clients whose requests all reach the same worker (e.g. sticky sessions in a proxy).
+DEFAULT_SERVER_WORKERS = 1
+DEFAULT_SERVER_THREADS = 8
+DEFAULT_SERVER_SHUTDOWN_TIMEOUT = 60
+WARMUP_PER_PAGE = 60
+
+# Requests replayed (without going through the request hooks, so they show up neither in /metrics nor
+# in the SQL profile) to load the first responses' statements, modules and SQLite pages.
+_WARMUP_URLS = (
+    '/api/tags',
+    f'/api/media?page=1&per_page={WARMUP_PER_PAGE}&sort_by=capture_time&sort_order=desc',
+    '/api/filters/favorites',
+    '/',
+)
+
+def warm_up(app):
+    """Warms the caches that the first requests would otherwise fill: compiles the favorite filters
+    and runs the views for the tag list, the first page of the default sort and the favorites list.
+    """
+    start = time.perf_counter()
+    with app.app_context():
+        favorites = FavoriteFilter.query.all()
+        for favorite in favorites:
+            compile_user_filter(favorite.code)
+    for url in _WARMUP_URLS:
+        with app.test_request_context(url):
+            try:
+                response = app.make_response(app.view_functions[request.url_rule.endpoint](**request.view_args))
+            except Exception as e:
+                server_logger.warning("Warm-up request %s failed: %s", url, e)
+                continue
+            if response.status_code != 200:
+                server_logger.warning("Warm-up request %s returned %s.", url, response.status_code)
+    server_logger.info("Warm-up done in %.0f ms (%s favorite filters compiled).", (time.perf_counter() - start) * 1000, len(favorites))
+
+def shutdown_app(app, timeout=DEFAULT_SERVER_SHUTDOWN_TIMEOUT):
+    """Releases the app's background work after the server stopped serving: ends event streams, waits
+    up to `timeout` seconds for running jobs and stops the preview workers.
+    """
+    event_bus.close()
+    unfinished = wait_for_jobs(timeout)
+    if unfinished:
+        server_logger.warning("Exiting with %s unfinished jobs: %s", len(unfinished), ', '.join(f'{job.kind} {job.id}' for job in unfinished))
+    with app.app_context():
+        get_preview_service().stop(timeout=5)
+        db.engine.dispose()
+
+class PooledWSGIServer(BaseWSGIServer):
+    """A werkzeug server that handles requests on a fixed pool of threads. server_close() waits for the
+    requests in flight.
+    """
+    multithread = True
+
+    def __init__(self, host, port, app, threads):
+        self._executor = ThreadPoolExecutor(max_workers=max(1, threads), thread_name_prefix='request')
+        super().__init__(host, port, app)
+
+    def process_request(self, request, client_address):
+        self._executor.submit(self._process_request_thread, request, client_address)
+
+    def _process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=True)
+
+def _serve_werkzeug(app, host, port, threads, shutdown_timeout):
+    server = PooledWSGIServer(host, port, app, threads)
+
+    def request_stop(signum, frame):
+        server_logger.info("Received signal %s, shutting down after in-flight requests...", signum)
+        event_bus.close() # Lets open event streams end, so their threads are free
+        threading.Thread(target=server.shutdown, name='server-shutdown', daemon=True).start()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    server_logger.info("Serving on http://%s:%s with %s threads (werkzeug).", host, server.server_address[1], threads)
+    try:
+        server.serve_forever() # Calls server_close() when it returns
+    finally:
+        shutdown_app(app, shutdown_timeout)
+        server_logger.info("Server stopped.")
+
+def _serve_gunicorn(app, host, port, workers, threads, shutdown_timeout):
+    from gunicorn.app.base import BaseApplication
+
+    def post_worker_init(worker):
+        previous_handler = signal.getsignal(signal.SIGTERM)
+
+        def on_term(signum, frame):
+            threading.Thread(target=event_bus.close, daemon=True).start()
+            previous_handler(signum, frame)
+
+        signal.signal(signal.SIGTERM, on_term)
+
+    def worker_exit(server, worker):
+        shutdown_app(app, shutdown_timeout)
+
+    options = {
+        'bind': f'{host}:{port}',
+        'workers': workers,
+        'threads': threads,
+        'worker_class': 'gthread',
+        'preload_app': True,
+        'graceful_timeout': shutdown_timeout,
+        'post_worker_init': post_worker_init,
+        'worker_exit': worker_exit,
+    }
+
+    class _Application(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    server_logger.info("Serving on http://%s:%s with %s workers x %s threads (gunicorn).", host, port, workers, threads)
+    _Application().run()
+
+def serve(app, host, port, workers=DEFAULT_SERVER_WORKERS, threads=DEFAULT_SERVER_THREADS,
+          shutdown_timeout=DEFAULT_SERVER_SHUTDOWN_TIMEOUT, warmup=True):
+    """Serves the app until SIGTERM/SIGINT. Blocks."""
+    use_gunicorn = importlib.util.find_spec('gunicorn') is not None # Optional dependency
+    if workers > 1 and not use_gunicorn:
+        server_logger.warning("gunicorn is not installed; serving with one process instead of %s workers.", workers)
+    elif workers > 1:
+        server_logger.warning("Serving with %s workers: jobs, selections and live updates are per process, so a client "
+                              "whose requests reach different workers sees 404s for them and misses changes.", workers)
+    if app.config.get('EVENT_MAX_STREAMS') is None:
+        event_bus.set_max_streams(max(1, threads // 2))
+    if warmup:
+        warm_up(app)
+    with app.app_context():
+        db.engine.dispose() # Forked workers (and request threads) open their own SQLite connections
+    if use_gunicorn:
+        _serve_gunicorn(app, host, port, workers, threads, shutdown_timeout)
+    else:
+        _serve_werkzeug(app, host, port, threads, shutdown_timeout)
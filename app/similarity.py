@@ -0,0 +1,161 @@
+from sqlalchemy import func
+from .models import db, Media
+from .cache import VersionedCache
+from .logging_utils import get_logger
+
+similarity_logger = get_logger('similarity')
+
+DHASH_SIZE = 8 # 8x8 = 64-bit hash
+DEFAULT_MAX_DISTANCE = 10 # Hamming distance (out of 64 bits) still considered "similar"
+COMMIT_BATCH_SIZE = 200
+
+try:
+    _popcount = int.bit_count # Python 3.10+
+except AttributeError:
+    def _popcount(value):
+        return bin(value).count('1')
+
+def hamming_distance(hash_a, hash_b):
+    return _popcount(hash_a ^ hash_b)
+
+def compute_dhash(img):
+    """64-bit difference hash of an already decoded (and orientation-corrected) PIL image.
+    Returned as a 16-character hex string, the format stored in Media.phash.
+    """
+    from PIL import Image
+    small = img.convert('L').resize((DHASH_SIZE + 1, DHASH_SIZE), Image.Resampling.BOX)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(DHASH_SIZE):
+        offset = row * (DHASH_SIZE + 1)
+        for col in range(DHASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] < pixels[offset + col + 1])
+    return f'{value:016x}'
+
+def compute_dhash_for_file(filepath):
+    """Hash of the file decoded the same way generate_thumbnail decodes it, so both store the same value."""
+    from .image_utils import open_oriented_image, HASH_DECODE_SIZE
+    with open_oriented_image(filepath, HASH_DECODE_SIZE) as img:
+        return compute_dhash(img)
+
+class BKTree:
+    """Burkhard-Keller tree over 64-bit hashes for Hamming-radius lookups.
+    Each node is [hash, [media_ids...], {distance: child_node}].
+    """
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, hash_value, media_id):
+        self.size += 1
+        if self.root is None:
+            self.root = [hash_value, [media_id], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming_distance(hash_value, node[0])
+            if distance == 0:
+                node[1].append(media_id)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [hash_value, [media_id], {}]
+                return
+            node = child
+
+    def query(self, hash_value, max_distance):
+        """Returns [(distance, media_id)] for all entries within max_distance, nearest first."""
+        results = []
+        if self.root is None:
+            return results
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            distance = hamming_distance(hash_value, node[0])
+            if distance <= max_distance:
+                results.extend((distance, media_id) for media_id in node[1])
+            low, high = distance - max_distance, distance + max_distance
+            stack.extend(child for d, child in node[2].items() if low <= d <= high)
+        results.sort()
+        return results
+
+_index_cache = VersionedCache(maxsize=2)
+
+def _build_index():
+    tree = BKTree()
+    hashes = {}
+    rows = (db.session.query(Media.id, Media.phash)
+            .filter(Media.is_accessible.is_(True), Media.media_type == 'image', Media.phash.isnot(None)))
+    for media_id, phash in rows:
+        hash_value = int(phash, 16)
+        tree.add(hash_value, media_id)
+        hashes[media_id] = hash_value
+    similarity_logger.info("Built perceptual-hash BK-tree with %s images.", tree.size)
+    return tree, hashes
+
+def get_similarity_index():
+    """(BKTree, {media_id: hash}) for accessible images; rebuilt when library data or hash count changes."""
+    hashed_count = db.session.query(func.count(Media.phash)).scalar()
+    return _index_cache.get_or_compute(('bktree', hashed_count), _build_index)
+
+def find_similar_media(media_id, max_distance=DEFAULT_MAX_DISTANCE):
+    """[(distance, media_id)] of images perceptually similar to media_id (excluding itself).
+    Returns None if the media item has no perceptual hash yet.
+    """
+    tree, hashes = get_similarity_index()
+    hash_value = hashes.get(media_id)
+    if hash_value is None:
+        return None
+    return [(distance, other_id) for distance, other_id in tree.query(hash_value, max_distance) if other_id != media_id]
+
+def compute_missing_phashes(job=None):
+    """Computes perceptual hashes for accessible images that have none (thumbnail never generated).
+    Only (id, filepath) pairs are loaded; hashes are written and committed per COMMIT_BATCH_SIZE images.
+    """
+    missing = (db.session.query(Media.id, Media.filepath)
+               .filter(Media.is_accessible.is_(True), Media.media_type == 'image', Media.phash.is_(None))
+               .order_by(Media.id)
+               .all())
+    if job is not None:
+        job.set_total(len(missing))
+    computed = 0
+    for start in range(0, len(missing), COMMIT_BATCH_SIZE):
+        updates = []
+        for media_id, filepath in missing[start:start + COMMIT_BATCH_SIZE]:
+            try:
+                updates.append({'id': media_id, 'phash': compute_dhash_for_file(filepath)})
+            except Exception as e:
+                similarity_logger.warning("Could not compute perceptual hash for %s: %s", filepath, e)
+            if job is not None:
+                job.advance()
+        if updates:
+            db.session.bulk_update_mappings(Media, updates)
+            db.session.commit()
+            computed += len(updates)
+    similarity_logger.info("Computed %s of %s missing perceptual hashes.", computed, len(missing))
+    return computed
+
+def cluster_near_duplicates(max_distance=DEFAULT_MAX_DISTANCE):
+    """Groups images into clusters whose members are chained by Hamming distance <= max_distance.
+    Returns a list of media-ID lists (clusters of two or more), largest first.
+    """
+    tree, hashes = get_similarity_index()
+    parent = {media_id: media_id for media_id in hashes}
+
+    def find(media_id):
+        while parent[media_id] != media_id:
+            parent[media_id] = parent[parent[media_id]]
+            media_id = parent[media_id]
+        return media_id
+
+    for media_id, hash_value in hashes.items():
+        for _, other_id in tree.query(hash_value, max_distance):
+            root_a, root_b = find(media_id), find(other_id)
+            if root_a != root_b:
+                parent[root_b] = root_a
+
+    clusters = {}
+    for media_id in hashes:
+        clusters.setdefault(find(media_id), []).append(media_id)
+    return sorted((sorted(ids) for ids in clusters.values() if len(ids) > 1), key=len, reverse=True)
@@ -0,0 +1,83 @@
+from datetime import datetime
+from .models import db, Media, FavoriteFilter, smart_album_media
+from .media_filter import FILTER_COLUMNS, filter_media_ids
+from .tag_manager import get_tag_names_for_media
+from .utils import MediaProxy, compile_user_filter, chunked
+from .logging_utils import get_logger
+
+smart_albums_logger = get_logger('smart_albums')
+
+# A pinned favorite filter is a smart album: the IDs of the media its api_select accepts are stored in
+# smart_album_media, so opening the album is one indexed read instead of a pass over the library.
+# Membership is evaluated over all media rows (accessibility is applied when listing, so hiding or
+# restoring a library needs no re-evaluation) and kept current incrementally: the scanner re-evaluates
+# the rows it added or updated and tag_manager the items whose tags changed, in the same transaction
+# as the change. Filters that depend on anything else (e.g. the current date) are only as fresh as the
+# last full materialization (pin again to refresh).
+
+def materialize_album(favorite):
+    """Evaluates the favorite's filter against the whole library and replaces its stored membership.
+    Does not commit.
+    """
+    db.session.execute(smart_album_media.delete().where(smart_album_media.c.album_id == favorite.id))
+    media_ids = filter_media_ids(Media.query.order_by(Media.id), favorite.code)
+    for chunk in chunked(media_ids):
+        db.session.execute(smart_album_media.insert(), [{'album_id': favorite.id, 'media_id': media_id} for media_id in chunk])
+    favorite.materialized_at = datetime.utcnow()
+    smart_albums_logger.info("Smart album %s materialized with %s items.", favorite.id, len(media_ids))
+    return len(media_ids)
+
+def pin_album(favorite):
+    """Pins a favorite filter as a smart album and materializes it. Does not commit."""
+    favorite.is_pinned = True
+    return materialize_album(favorite)
+
+def unpin_album(favorite):
+    """Unpins a smart album and drops its stored membership. Does not commit."""
+    favorite.is_pinned = False
+    favorite.materialized_at = None
+    db.session.execute(smart_album_media.delete().where(smart_album_media.c.album_id == favorite.id))
+
+def _pinned_predicates():
+    predicates = []
+    for album_id, code in db.session.query(FavoriteFilter.id, FavoriteFilter.code).filter(FavoriteFilter.is_pinned.is_(True)):
+        predicates.append((album_id, compile_user_filter(code) or (lambda media_proxy: True)))
+    return predicates
+
+def update_memberships(media_ids):
+    """Re-evaluates the given media against every pinned album and adds or removes their membership
+    rows accordingly. Runs inside the caller's transaction (pending changes are flushed first) and
+    does not commit, so the membership changes are committed together with the change that caused them.
+    Returns the number of membership rows added plus removed.
+    """
+    if not media_ids:
+        return 0
+    predicates = _pinned_predicates()
+    if not predicates:
+        return 0
+    db.session.flush()
+    changes = 0
+    album_ids = [album_id for album_id, _ in predicates]
+    for chunk in chunked(sorted(set(media_ids))):
+        rows = db.session.query(*FILTER_COLUMNS).filter(Media.id.in_(chunk)).all()
+        tag_names = get_tag_names_for_media([row[0] for row in rows])
+        proxies = [MediaProxy(*row, tag_names.get(row[0], [])) for row in rows]
+        current = set(db.session.query(smart_album_media.c.album_id, smart_album_media.c.media_id)
+                      .filter(smart_album_media.c.media_id.in_(chunk), smart_album_media.c.album_id.in_(album_ids)))
+        wanted = {(album_id, proxy.id) for album_id, predicate in predicates for proxy in proxies if predicate(proxy)}
+        to_add = wanted - current
+        to_remove = current - wanted
+        if to_add:
+            db.session.execute(smart_album_media.insert(), [{'album_id': a, 'media_id': m} for a, m in sorted(to_add)])
+        for album_id in {a for a, _ in to_remove}:
+            db.session.execute(smart_album_media.delete().where(
+                smart_album_media.c.album_id == album_id,
+                smart_album_media.c.media_id.in_([m for a, m in to_remove if a == album_id])))
+        changes += len(to_add) + len(to_remove)
+    if changes:
+        smart_albums_logger.debug("Smart album membership changed for %s rows after re-evaluating %s media.", changes, len(media_ids))
+    return changes
+
+def album_media_ids(album_id):
+    """The subquery of media IDs stored for a pinned album (read through the table's primary key)."""
+    return db.select(smart_album_media.c.media_id).where(smart_album_media.c.album_id == album_id)
@@ -0,0 +1,110 @@
+import os
+import sys
+import time
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from .models import db
+from .logging_utils import get_logger
+
+sql_profiler_logger = get_logger('sql_profiler')
+
+# Opt-in SQL profiling (SQL_PROFILING = True in config.py). When enabled it:
+#  * logs statements slower than SQL_SLOW_QUERY_MS with their call site and EXPLAIN QUERY PLAN,
+#  * aggregates identical statements per request and flags likely N+1 patterns
+#    (the same statement run SQL_N_PLUS_ONE_THRESHOLD or more times),
+#  * adds an X-SQL-Profile summary header to every response.
+
+APP_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+HEADER_STATEMENT_CHARS = 80
+
+def _call_site():
+    """file:line (function) of the innermost app frame outside this module that issued the statement."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(APP_PACKAGE_DIR) and filename != __file__:
+            return f"{os.path.relpath(filename, os.path.dirname(APP_PACKAGE_DIR))}:{frame.f_lineno} ({frame.f_code.co_name})"
+        frame = frame.f_back
+    return 'unknown'
+
+def _one_line(statement, limit=None):
+    text = ' '.join(statement.split())
+    return text if limit is None or len(text) <= limit else text[:limit - 3] + '...'
+
+def _explain(cursor, statement, parameters):
+    try:
+        rows = cursor.connection.execute('EXPLAIN QUERY PLAN ' + statement, parameters or ()).fetchall()
+        return '; '.join(str(row[-1]) for row in rows)
+    except Exception as e:
+        return f'(EXPLAIN failed: {e})'
+
+class SQLProfiler:
+    def __init__(self, slow_query_ms, n_plus_one_threshold, add_header):
+        self.slow_query_seconds = slow_query_ms / 1000.0
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.add_header = add_header
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info['_profiler_query_start'] = time.perf_counter()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start = conn.info.pop('_profiler_query_start', None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        in_request = has_request_context() and '_sql_profile' in g
+
+        if in_request:
+            stats = g._sql_profile.get(statement)
+            if stats is None:
+                stats = g._sql_profile[statement] = {'count': 0, 'seconds': 0.0, 'call_site': _call_site()}
+            stats['count'] += 1
+            stats['seconds'] += elapsed
+
+        if elapsed >= self.slow_query_seconds:
+            plan = None
+            if not executemany and statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+                plan = _explain(cursor, statement, parameters)
+            call_site = stats['call_site'] if in_request else _call_site()
+            sql_profiler_logger.warning("Slow SQL (%.1f ms) at %s: %s | params=%r | plan: %s", elapsed * 1000, call_site, _one_line(statement), parameters, plan)
+            if in_request:
+                g._sql_profile_slow += 1
+
+    def before_request(self):
+        g._sql_profile = {}
+        g._sql_profile_slow = 0
+
+    def after_request(self, response):
+        profile = g.pop('_sql_profile', None)
+        if profile is None:
+            return response
+        total_count = sum(s['count'] for s in profile.values())
+        total_ms = sum(s['seconds'] for s in profile.values()) * 1000
+        repeated = sorted(((s['count'], statement, s) for statement, s in profile.items()
+                           if s['count'] >= self.n_plus_one_threshold), key=lambda item: item[0], reverse=True)
+        for count, statement, stats in repeated:
+            sql_profiler_logger.warning("Possible N+1 in %s %s: statement ran %sx (%.1f ms total) from %s: %s", request.method, request.path, count, stats['seconds'] * 1000, stats['call_site'], _one_line(statement, 200))
+        sql_profiler_logger.debug("%s %s: %s statements, %.1f ms in SQL, %s distinct.", request.method, request.path, total_count, total_ms, len(profile))
+        if self.add_header:
+            summary = f"queries={total_count}; distinct={len(profile)}; time_ms={total_ms:.1f}; slow={g.pop('_sql_profile_slow', 0)}"
+            if repeated:
+                count, statement, stats = repeated[0]
+                top = _one_line(statement, HEADER_STATEMENT_CHARS).encode('ascii', 'replace').decode('ascii')
+                summary += f"; repeated={count}x {top} @ {stats['call_site']}"
+            response.headers['X-SQL-Profile'] = summary
+        return response
+
+def init_app(app):
+    """Enables SQL profiling for the app if SQL_PROFILING is set in the config."""
+    if not app.config.get('SQL_PROFILING', False):
+        return
+    profiler = SQLProfiler(slow_query_ms=app.config.get('SQL_SLOW_QUERY_MS', 50),
+                           n_plus_one_threshold=app.config.get('SQL_N_PLUS_ONE_THRESHOLD', 10),
+                           add_header=app.config.get('SQL_PROFILE_HEADER', True))
+    app.before_request(profiler.before_request)
+    app.after_request(profiler.after_request)
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', profiler.before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', profiler.after_cursor_execute)
+    sql_profiler_logger.info("SQL profiling enabled (slow threshold %.0f ms).", profiler.slow_query_seconds * 1000)
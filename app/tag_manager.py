@@ -1,15 +1,15 @@
-from .models import db, Media, Tag
+from .models import db, Media, Tag, media_tag
+from .cache import bump_data_version
 from sqlalchemy.exc import IntegrityError
-import logging
+from .logging_utils import get_logger
+from .utils import chunked
+from . import events
 
-tag_manager_logger = logging.getLogger('photo_album_manager.tag_manager') # Use fixed name
-if not tag_manager_logger.handlers:
-    handler = logging.StreamHandler()
-    formatter = logging.Formatter('%(asctime)s - TAG_MANAGER - %(levelname)s - %(message)s')
-    handler.setFormatter(formatter)
-    tag_manager_logger.addHandler(handler)
-    tag_manager_logger.setLevel(logging.DEBUG)
-    tag_manager_logger.propagate = False
+tag_manager_logger = get_logger('tag_manager')
+
+def _update_smart_albums(media_ids):
+    from .smart_albums import update_memberships # Deferred: smart_albums imports this module
+    update_memberships(media_ids)
 
 def add_global_tag(tag_name):
     tag_name = str(tag_name).strip() # Ensure it's a string before stripping
@@ -19,22 +19,24 @@ def add_global_tag(tag_name):
 
     existing_tag = Tag.query.filter_by(name=tag_name).first()
     if existing_tag:
-        tag_manager_logger.debug(f"Global tag '{tag_name}' already exists with ID {existing_tag.id}, returning existing.")
+        tag_manager_logger.debug("Global tag '%s' already exists with ID %s, returning existing.", tag_name, existing_tag.id)
         return existing_tag
 
     new_tag = Tag(name=tag_name)
     try:
         db.session.add(new_tag)
+        bump_data_version()
         db.session.commit()
-        tag_manager_logger.info(f"Global tag '{tag_name}' added with ID {new_tag.id}.")
+        tag_manager_logger.info("Global tag '%s' added with ID %s.", tag_name, new_tag.id)
+        events.publish('tag_added', id=new_tag.id, name=new_tag.name)
         return new_tag
     except IntegrityError:
         db.session.rollback()
-        tag_manager_logger.warning(f"IntegrityError adding global tag '{tag_name}', likely added concurrently. Querying again.", exc_info=True)
+        tag_manager_logger.warning("IntegrityError adding global tag '%s', likely added concurrently. Querying again.", tag_name, exc_info=True)
         return Tag.query.filter_by(name=tag_name).first() # Attempt to fetch the concurrently added tag
     except Exception as e:
         db.session.rollback()
-        tag_manager_logger.error(f"Error adding global tag '{tag_name}': {e}", exc_info=True)
+        tag_manager_logger.error("Error adding global tag '%s': %s", tag_name, e, exc_info=True)
         return None
 
 def delete_global_tag(tag_name):
@@ -45,62 +47,69 @@ def delete_global_tag(tag_name):
 
     tag_to_delete = Tag.query.filter_by(name=tag_name).first()
     if not tag_to_delete:
-        tag_manager_logger.warning(f"Attempted to delete non-existent global tag: '{tag_name}'")
+        tag_manager_logger.warning("Attempted to delete non-existent global tag: '%s'", tag_name)
         return False
     try:
         tag_id_cache = tag_to_delete.id # Cache for logging
-        tag_manager_logger.info(f"Deleting global tag '{tag_name}' (ID: {tag_id_cache}). This will remove it from all associated media.")
+        tag_manager_logger.info("Deleting global tag '%s' (ID: %s). This will remove it from all associated media.", tag_name, tag_id_cache)
+        tagged_media_ids = [media_id for (media_id,) in db.session.query(media_tag.c.media_id).filter(media_tag.c.tag_id == tag_id_cache)]
         db.session.delete(tag_to_delete)
+        _update_smart_albums(tagged_media_ids)
+        bump_data_version()
         db.session.commit()
-        tag_manager_logger.info(f"Global tag '{tag_name}' (ID: {tag_id_cache}) deleted successfully.")
+        tag_manager_logger.info("Global tag '%s' (ID: %s) deleted successfully.", tag_name, tag_id_cache)
+        events.publish('tag_deleted', id=tag_id_cache, name=tag_name)
         return True
     except Exception as e:
         db.session.rollback()
-        tag_manager_logger.error(f"Error deleting global tag '{tag_name}': {e}", exc_info=True)
+        tag_manager_logger.error("Error deleting global tag '%s': %s", tag_name, e, exc_info=True)
         return False
 
 def add_tags_to_media(media_id, tag_names_list):
     media_item = Media.query.get(media_id)
     if not media_item:
-        tag_manager_logger.warning(f"add_tags_to_media: Media item ID {media_id} not found.")
+        tag_manager_logger.warning("add_tags_to_media: Media item ID %s not found.", media_id)
         return False
     if not isinstance(tag_names_list, list):
-        tag_manager_logger.warning(f"add_tags_to_media: tag_names_list was not a list for media ID {media_id}.")
+        tag_manager_logger.warning("add_tags_to_media: tag_names_list was not a list for media ID %s.", media_id)
         return False
 
     added_any_new_association = False
     for tag_name_raw in tag_names_list:
         tag_name = str(tag_name_raw).strip()
         if not tag_name:
-            tag_manager_logger.debug(f"Skipping empty tag name in list for media ID {media_id}.")
+            tag_manager_logger.debug("Skipping empty tag name in list for media ID %s.", media_id)
             continue
 
         tag = Tag.query.filter_by(name=tag_name).first()
         if not tag:
-            tag_manager_logger.info(f"Tag '{tag_name}' not found globally, attempting to create it while adding to media ID {media_id}.")
+            tag_manager_logger.info("Tag '%s' not found globally, attempting to create it while adding to media ID %s.", tag_name, media_id)
             tag = add_global_tag(tag_name)
             if not tag:
-                tag_manager_logger.warning(f"Could not find or create global tag '{tag_name}' for media ID {media_id}. Skipping this tag for this media item.")
+                tag_manager_logger.warning("Could not find or create global tag '%s' for media ID %s. Skipping this tag for this media item.", tag_name, media_id)
                 continue # Skip this tag if it couldn't be created
 
         if tag not in media_item.tags:
             media_item.tags.append(tag)
             added_any_new_association = True
-            tag_manager_logger.debug(f"Associated tag '{tag_name}' (ID: {tag.id}) with media ID {media_id}.")
+            tag_manager_logger.debug("Associated tag '%s' (ID: %s) with media ID %s.", tag_name, tag.id, media_id)
         else:
-            tag_manager_logger.debug(f"Media ID {media_id} already has tag '{tag_name}' (ID: {tag.id}). No new association needed for this tag-media pair.")
+            tag_manager_logger.debug("Media ID %s already has tag '%s' (ID: %s). No new association needed for this tag-media pair.", media_id, tag_name, tag.id)
 
     if added_any_new_association:
         try:
+            _update_smart_albums([media_id])
+            bump_data_version()
             db.session.commit()
-            tag_manager_logger.info(f"Successfully committed new tag associations for media ID {media_id}.")
+            tag_manager_logger.info("Successfully committed new tag associations for media ID %s.", media_id)
+            events.publish('media_tags_changed', media_id=media_id, tags=[tag.name for tag in media_item.tags])
             return True
         except Exception as e:
             db.session.rollback()
-            tag_manager_logger.error(f"Error committing new tag associations for media ID {media_id}: {e}", exc_info=True)
+            tag_manager_logger.error("Error committing new tag associations for media ID %s: %s", media_id, e, exc_info=True)
             return False
 
-    tag_manager_logger.info(f"No new tag associations were needed or made for media ID {media_id} with tags {tag_names_list} (all might have existed already).")
+    tag_manager_logger.info("No new tag associations were needed or made for media ID %s with tags %s (all might have existed already).", media_id, tag_names_list)
     return True
 
 # Removed set_tags_for_media function as per subtask instruction
@@ -108,46 +117,120 @@ def add_tags_to_media(media_id, tag_names_list):
 def remove_tags_from_media(media_id, tag_names_list_to_remove):
     media_item = Media.query.get(media_id)
     if not media_item:
-        tag_manager_logger.warning(f"remove_tags_from_media: Media item ID {media_id} not found.")
+        tag_manager_logger.warning("remove_tags_from_media: Media item ID %s not found.", media_id)
         return False
     if not isinstance(tag_names_list_to_remove, list):
-        tag_manager_logger.warning(f"remove_tags_from_media: tag_names_list_to_remove was not a list for media ID {media_id}.")
+        tag_manager_logger.warning("remove_tags_from_media: tag_names_list_to_remove was not a list for media ID %s.", media_id)
         return False
 
     removed_any = False
     for tag_name_raw in tag_names_list_to_remove:
         tag_name = str(tag_name_raw).strip()
         if not tag_name:
-            tag_manager_logger.debug(f"Skipping empty tag name in removal list for media ID {media_id}.")
+            tag_manager_logger.debug("Skipping empty tag name in removal list for media ID %s.", media_id)
             continue
 
         tag_to_remove = Tag.query.filter_by(name=tag_name).first()
         if tag_to_remove and tag_to_remove in media_item.tags:
             media_item.tags.remove(tag_to_remove)
             removed_any = True
-            tag_manager_logger.debug(f"Disassociated tag '{tag_name}' (ID: {tag_to_remove.id}) from media ID {media_id}.")
+            tag_manager_logger.debug("Disassociated tag '%s' (ID: %s) from media ID %s.", tag_name, tag_to_remove.id, media_id)
         elif not tag_to_remove:
-            tag_manager_logger.debug(f"Tag '{tag_name}' not found globally, so cannot remove from media ID {media_id}.")
+            tag_manager_logger.debug("Tag '%s' not found globally, so cannot remove from media ID %s.", tag_name, media_id)
         else: # Tag exists globally but not on item
-            tag_manager_logger.debug(f"Media ID {media_id} does not have tag '{tag_name}'. No removal needed for this tag-media pair.")
+            tag_manager_logger.debug("Media ID %s does not have tag '%s'. No removal needed for this tag-media pair.", media_id, tag_name)
 
     if removed_any:
         try:
+            _update_smart_albums([media_id])
+            bump_data_version()
             db.session.commit()
-            tag_manager_logger.info(f"Successfully committed tag removals for media ID {media_id}.")
+            tag_manager_logger.info("Successfully committed tag removals for media ID %s.", media_id)
+            events.publish('media_tags_changed', media_id=media_id, tags=[tag.name for tag in media_item.tags])
             return True
         except Exception as e:
             db.session.rollback()
-            tag_manager_logger.error(f'Error committing tag removals for media ID {media_id}: {e}', exc_info=True)
+            tag_manager_logger.error('Error committing tag removals for media ID %s: %s', media_id, e, exc_info=True)
             return False
 
-    tag_manager_logger.info(f"No tags needed to be removed from media ID {media_id} for list {tag_names_list_to_remove} (none might have been present).")
+    tag_manager_logger.info("No tags needed to be removed from media ID %s for list %s (none might have been present).", media_id, tag_names_list_to_remove)
     return True
 
+def _clean_tag_names(tag_names_list):
+    return list(dict.fromkeys(name for name in (str(raw).strip() for raw in tag_names_list) if name))
+
+def add_tags_to_media_bulk(media_ids, tag_names_list, on_progress=None):
+    """Adds the tags to every existing media item in media_ids, creating missing global tags.
+    Works through the IDs in chunks with one multi-row insert and one commit per chunk, so large
+    selections never hold a long write transaction. on_progress(count) is called after each chunk.
+    Returns the number of new tag associations.
+    """
+    tags = [tag for tag in (add_global_tag(name) for name in _clean_tag_names(tag_names_list)) if tag]
+    if not tags:
+        return 0
+    tag_ids = [tag.id for tag in tags]
+    tag_names = [tag.name for tag in tags]
+    added = 0
+    for chunk in chunked(list(media_ids)):
+        existing_media = [media_id for (media_id,) in db.session.query(Media.id).filter(Media.id.in_(chunk))]
+        existing_pairs = set(db.session.query(media_tag.c.media_id, media_tag.c.tag_id)
+                             .filter(media_tag.c.media_id.in_(existing_media), media_tag.c.tag_id.in_(tag_ids)))
+        rows = [{'media_id': media_id, 'tag_id': tag_id} for media_id in existing_media for tag_id in tag_ids
+                if (media_id, tag_id) not in existing_pairs]
+        if rows:
+            try:
+                db.session.execute(media_tag.insert(), rows)
+                _update_smart_albums({row['media_id'] for row in rows})
+                bump_data_version()
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                tag_manager_logger.error("Error adding tags %s to a chunk of %s media items.", tag_names, len(chunk), exc_info=True)
+                raise
+            added += len(rows)
+            events.publish('media_tags_added', media_ids=sorted({row['media_id'] for row in rows}), tags=tag_names)
+        else:
+            db.session.rollback() # Ends the read transaction between chunks
+        if on_progress:
+            on_progress(len(chunk))
+    tag_manager_logger.info("Added tags %s to %s media items (%s new associations).", tag_names, len(media_ids), added)
+    return added
+
+def remove_tags_from_media_bulk(media_ids, tag_names_list, on_progress=None):
+    """Removes the tags from every media item in media_ids, chunked like add_tags_to_media_bulk.
+    Returns the number of removed tag associations.
+    """
+    tags = Tag.query.filter(Tag.name.in_(_clean_tag_names(tag_names_list))).all()
+    if not tags:
+        return 0
+    tag_ids = [tag.id for tag in tags]
+    tag_names = [tag.name for tag in tags]
+    removed = 0
+    for chunk in chunked(list(media_ids)):
+        condition = media_tag.c.media_id.in_(chunk) & media_tag.c.tag_id.in_(tag_ids)
+        affected = sorted({media_id for (media_id,) in db.session.query(media_tag.c.media_id).filter(condition)})
+        if affected:
+            try:
+                removed += db.session.execute(media_tag.delete().where(condition)).rowcount
+                _update_smart_albums(affected)
+                bump_data_version()
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                tag_manager_logger.error("Error removing tags %s from a chunk of %s media items.", tag_names, len(chunk), exc_info=True)
+                raise
+            events.publish('media_tags_removed', media_ids=affected, tags=tag_names)
+        else:
+            db.session.rollback()
+        if on_progress:
+            on_progress(len(chunk))
+    tag_manager_logger.info("Removed tags %s from %s media items (%s associations).", tag_names, len(media_ids), removed)
+    return removed
+
 def get_tags_for_media(media_id):
     media_item = Media.query.get(media_id)
     if not media_item:
-        tag_manager_logger.warning(f"get_tags_for_media: Media item ID {media_id} not found.")
+        tag_manager_logger.warning("get_tags_for_media: Media item ID %s not found.", media_id)
         return []
     return list(media_item.tags)
 
@@ -158,9 +241,23 @@ def get_media_for_tag(tag_name):
         return []
     tag = Tag.query.filter_by(name=tag_name_stripped).first()
     if not tag:
-        tag_manager_logger.debug(f"get_media_for_tag: Tag '{tag_name_stripped}' not found.")
+        tag_manager_logger.debug("get_media_for_tag: Tag '%s' not found.", tag_name_stripped)
         return []
     return list(tag.media_items)
 
 def get_all_global_tags():
     return Tag.query.all()
+
+def get_tag_names_for_media(media_ids):
+    """Returns {media_id: [tag names]} for the given IDs with one query per chunk instead of a lazy
+    load per item. Names are in tag ID order, like the Media.tags relationship loads them.
+    """
+    tag_names = {}
+    for chunk in chunked(list(media_ids)):
+        rows = (db.session.query(media_tag.c.media_id, Tag.name)
+                .join(Tag, Tag.id == media_tag.c.tag_id)
+                .filter(media_tag.c.media_id.in_(chunk))
+                .order_by(media_tag.c.media_id, media_tag.c.tag_id))
+        for media_id, tag_name in rows:
+            tag_names.setdefault(media_id, []).append(tag_name)
+    return tag_names
@@ -0,0 +1,53 @@
+from collections import Counter
+from sqlalchemy import func, or_
+from .models import db, Media
+from .cache import VersionedCache
+from .utils import chunked
+
+_timeline_cache = VersionedCache(maxsize=32)
+
+MONTH_COLUMN = func.strftime('%Y-%m', Media.capture_time)
+
+def _month_counts(query, matching_ids):
+    if matching_ids is None:
+        return Counter(dict(query.order_by(None).with_entities(MONTH_COLUMN, func.count(Media.id)).group_by(MONTH_COLUMN)))
+    counts = Counter()
+    for chunk in chunked(matching_ids):
+        for month, count in (db.session.query(MONTH_COLUMN, func.count(Media.id))
+                             .filter(Media.id.in_(chunk)).group_by(MONTH_COLUMN)):
+            counts[month] += count
+    return counts
+
+def _compute_timeline(query, matching_ids, descending):
+    counts = _month_counts(query, matching_ids)
+    undated = counts.pop(None, 0)
+    months = []
+    offset = 0 if descending else undated # Undated media sort first ascending and last descending
+    for month in sorted(counts, reverse=descending):
+        months.append({'month': month, 'count': counts[month], 'first_index': offset})
+        offset += counts[month]
+    return {'months': months, 'undated': undated, 'total_items': sum(counts.values()) + undated}
+
+def get_timeline(query, cache_key, matching_ids=None, descending=True):
+    """Media counts per capture month for `query` (a filtered Media query) or, when an api_select filter
+    is active, for its matching_ids. Each month also gets first_index, the position of its first item
+    when the same media are listed by capture_time in the given direction, so a client can turn a month
+    into a page number without another request. Cached until the library data version changes;
+    cache_key must identify the filters that shaped the query.
+    """
+    return _timeline_cache.get_or_compute((cache_key, descending),
+                                          lambda: _compute_timeline(query, matching_ids, descending))
+
+def seek_index(query, timestamp, matching_ids=None, descending=True):
+    """Returns the index of the first item captured at or before `timestamp` (descending) or at or after
+    it (ascending) when the media are listed by capture_time, i.e. how many items come before it.
+    One indexed count query (per ID chunk when filtered).
+    """
+    if descending:
+        before = Media.capture_time > timestamp
+    else:
+        before = or_(Media.capture_time < timestamp, Media.capture_time.is_(None))
+    if matching_ids is None:
+        return query.order_by(None).filter(before).count()
+    return sum(db.session.query(func.count(Media.id)).filter(Media.id.in_(chunk), before).scalar()
+               for chunk in chunked(matching_ids))
@@ -1,59 +1,86 @@
-from types import SimpleNamespace
-import logging
+import functools
 import builtins # To access the standard __builtins__
+from .logging_utils import get_logger, RateLimitedLog
 
-utils_logger = logging.getLogger('photo_album_manager.utils')
-if not utils_logger.handlers:
-    handler = logging.StreamHandler()
-    formatter = logging.Formatter('%(asctime)s - UTILS - %(levelname)s - %(message)s')
-    handler.setFormatter(formatter)
-    utils_logger.addHandler(handler)
-    utils_logger.setLevel(logging.DEBUG)
-    utils_logger.propagate = False
-
-def execute_user_filter_function(media_item_dict, filter_function_str):
-    # If filter string is empty or only whitespace, consider it a pass for all items.
-    if not filter_function_str or not filter_function_str.strip():
-        return True
-
-    media_proxy = SimpleNamespace(**media_item_dict)
-
-    # Prepare a limited global scope for exec.
-    # We provide standard builtins and the media_proxy object.
-    # User's code can also define other helper functions if they wish,
-    # they will be defined in local_namespace.
-    exec_globals = {
-        '__builtins__': builtins, # Provide standard Python builtins
-        'media': media_proxy
-    }
-    local_namespace = {}
+utils_logger = get_logger('utils')
+# The filter runs once per media item; a broken filter would otherwise log an error for every item.
+per_item_log = RateLimitedLog(utils_logger)
 
-    filename = media_item_dict.get('filename', media_item_dict.get('filepath', 'N/A'))
-    utils_logger.debug(f"Executing filter for media: {filename}")
+# Keeps every IN (...) list below SQLite's default bound-parameter limit.
+IN_CLAUSE_CHUNK_SIZE = 500
 
-    try:
-        # Execute the user-provided Python code string.
-        # This will define the api_select function within local_namespace.
-        exec(filter_function_str, exec_globals, local_namespace)
+def chunked(values, size=IN_CLAUSE_CHUNK_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+class MediaProxy:
+    """The `media` object passed to api_select(): the media payload fields (capture_time and
+    modification_time as ISO strings) plus the scanned image/video metadata. Uses __slots__, so a
+    streaming filter pass allocates one small object per row.
+    """
+    __slots__ = ('id', 'filepath', 'filename', 'org_path', 'capture_time', 'modification_time', 'filesize', 'media_type',
+                 'width', 'height', 'orientation', 'camera_make', 'camera_model', 'lens_model', 'gps_latitude', 'gps_longitude',
+                 'duration', 'tags')
+
+    def __init__(self, id, filepath, filename, org_path, capture_time, modification_time, filesize, media_type,
+                 width, height, orientation, camera_make, camera_model, lens_model, gps_latitude, gps_longitude, duration, tags):
+        self.id = id
+        self.filepath = filepath
+        self.filename = filename
+        self.org_path = org_path
+        self.capture_time = capture_time.isoformat() if capture_time else None
+        self.modification_time = modification_time.isoformat() if modification_time else None
+        self.filesize = filesize
+        self.media_type = media_type
+        self.width = width
+        self.height = height
+        self.orientation = orientation
+        self.camera_make = camera_make
+        self.camera_model = camera_model
+        self.lens_model = lens_model
+        self.gps_latitude = gps_latitude
+        self.gps_longitude = gps_longitude
+        self.duration = duration
+        self.tags = tags
 
-        api_select_func = local_namespace.get('api_select')
+    @property
+    def has_gps(self):
+        return self.gps_latitude is not None and self.gps_longitude is not None
 
-        if not callable(api_select_func):
-            utils_logger.error(f"User filter code for {filename} did not define a callable 'api_select' function.")
-            return True # Permissive: if api_select isn't defined, treat as pass
+    def __repr__(self):
+        return f'<MediaProxy {self.id}: {self.filename}>'
 
-        # Call the user's api_select function
-        result = api_select_func(media_proxy)
-        final_outcome = bool(result)
-        utils_logger.debug(f"Filter outcome for {filename}: {final_outcome}")
+@functools.lru_cache(maxsize=32)
+def _compile_filter_code(filter_function_str):
+    return compile(filter_function_str, '<api_select>', 'exec')
 
-    except SyntaxError as se:
-        utils_logger.error(f"Syntax error in user filter function for {filename}: {se}")
-        utils_logger.error(f"Problematic filter code:\n{filter_function_str}")
-        final_outcome = True # Permissive on syntax error
+def compile_user_filter(filter_function_str):
+    """Compiles and executes the user's filter code once and returns a predicate proxy -> bool.
+
+    A filter that does not compile or does not define a callable api_select lets everything pass, and an
+    item whose api_select raises passes.
+    The code's module level runs once per call here rather than once per item, and `media` is rebound
+    in the code's globals before each call. Returns None when the filter string is empty.
+    """
+    if not filter_function_str or not filter_function_str.strip():
+        return None
+    exec_globals = {'__builtins__': builtins, 'media': None}
+    local_namespace = {}
+    try:
+        exec(_compile_filter_code(filter_function_str), exec_globals, local_namespace)
     except Exception as e:
-        utils_logger.error(f"Error executing user filter function for {filename}: {e}", exc_info=True)
-        utils_logger.error(f"Problematic filter code:\n{filter_function_str}")
-        final_outcome = True # Permissive on runtime error in user function
+        utils_logger.error("Error in user filter code, letting all items pass: %s\nProblematic filter code:\n%s", e, filter_function_str)
+        return lambda media_proxy: True
+    api_select_func = local_namespace.get('api_select')
+    if not callable(api_select_func):
+        utils_logger.error("User filter code did not define a callable 'api_select' function; letting all items pass.")
+        return lambda media_proxy: True
 
-    return final_outcome
+    def predicate(media_proxy):
+        exec_globals['media'] = media_proxy
+        try:
+            return bool(api_select_func(media_proxy))
+        except Exception as e:
+            per_item_log.error('runtime_error', "Error executing user filter function for %s: %s", media_proxy.filename, e)
+            return True # Permissive on runtime error in user function
+    return predicate
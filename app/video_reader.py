@@ -0,0 +1,170 @@
+import os
+import time
+import struct
+from datetime import datetime
+from .logging_utils import get_logger, RateLimitedLog
+
+video_reader_logger = get_logger('video_reader')
+per_file_log = RateLimitedLog(video_reader_logger)
+
+# Container-header metadata for videos (capture time, duration, display size) without decoding.
+# Readers are registered per file extension; each gets an open binary file and seeks straight to
+# the structures it needs, so the cost does not depend on the size of the video. Register support
+# for further containers with register_video_reader().
+
+VIDEO_METADATA_FIELDS = ('capture_time', 'duration', 'width', 'height')
+
+# QuickTime/ISO-BMFF creation times count seconds since 1904-01-01 UTC.
+MP4_EPOCH_OFFSET = 2082844800 # Seconds from 1904-01-01 to 1970-01-01
+
+TOP_LEVEL_FIRST_BOXES = (b'ftyp', b'moov', b'mdat', b'wide', b'free', b'skip', b'pnot')
+
+_readers = {} # extension -> reader(f, file_size) -> dict or None
+
+class VideoFormatError(Exception):
+    """The file is not in a layout the reader understands."""
+
+def register_video_reader(extensions, reader):
+    """Registers reader(f, file_size) for the given extensions ('.mp4', ...). The reader returns a
+    dict with any of VIDEO_METADATA_FIELDS, or None, and may raise VideoFormatError.
+    """
+    for extension in extensions:
+        _readers[extension.lower()] = reader
+
+def read_video_metadata(filepath):
+    """Returns {capture_time, duration, width, height} (missing values None) for a video,
+    or None if no reader is registered for its extension or the header cannot be parsed.
+    """
+    reader = _readers.get(os.path.splitext(filepath)[1].lower())
+    if reader is None:
+        return None
+    try:
+        with open(filepath, 'rb') as f:
+            result = reader(f, os.fstat(f.fileno()).st_size)
+    except FileNotFoundError:
+        per_file_log.warning('missing', "Video file not found: %s", filepath)
+        return None
+    except (OSError, VideoFormatError, struct.error, ValueError, OverflowError) as e:
+        per_file_log.debug('unparsable', "Could not read container metadata of %s: %s", filepath, e)
+        return None
+    if result is None:
+        return None
+    metadata = dict.fromkeys(VIDEO_METADATA_FIELDS)
+    metadata.update(result)
+    return metadata
+
+def _read_exact(f, size):
+    data = f.read(size)
+    if len(data) != size:
+        raise VideoFormatError('Unexpected end of file.')
+    return data
+
+# --- MP4 / QuickTime (ISO base media file format) ---
+
+def _iter_boxes(f, start, end):
+    """Yields (type, payload offset, box end) for the boxes in [start, end), seeking over payloads."""
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        box_size, box_type = struct.unpack('>L4s', _read_exact(f, 8))
+        header_size = 8
+        if box_size == 1:
+            box_size = struct.unpack('>Q', _read_exact(f, 8))[0]
+            header_size = 16
+        elif box_size == 0: # Extends to the end of the file
+            box_size = end - offset
+        if box_size < header_size:
+            raise VideoFormatError(f'Invalid size for box {box_type!r}.')
+        yield box_type, offset + header_size, min(offset + box_size, end)
+        offset += box_size
+
+def _find_box(f, start, end, box_type):
+    for found_type, payload_start, box_end in _iter_boxes(f, start, end):
+        if found_type == box_type:
+            return payload_start, box_end
+    return None
+
+def _mp4_timestamp(seconds):
+    """Converts an mvhd creation time to a naive local datetime like the scanner's mtimes; None if unset or implausible."""
+    if not seconds:
+        return None
+    unix_seconds = seconds - MP4_EPOCH_OFFSET
+    if unix_seconds <= 0 or unix_seconds > time.time() + 86400:
+        return None
+    return datetime.fromtimestamp(unix_seconds)
+
+def _parse_mvhd(data):
+    version = data[0]
+    if version == 1:
+        creation_time, _, timescale, duration = struct.unpack_from('>QQLQ', data, 4)
+    else:
+        creation_time, _, timescale, duration = struct.unpack_from('>LLLL', data, 4)
+    return _mp4_timestamp(creation_time), (duration / timescale if timescale and duration not in (0, 0xFFFFFFFF, 0xFFFFFFFFFFFFFFFF) else None)
+
+def _parse_tkhd(data):
+    """Returns the display (width, height) of a track, applying a 90/270 degree rotation matrix."""
+    matrix_offset = 40 if data[0] == 0 else 52
+    a, b, _, c, d = struct.unpack_from('>lllll', data, matrix_offset)
+    width, height = struct.unpack_from('>LL', data, matrix_offset + 36)
+    width, height = width >> 16, height >> 16 # 16.16 fixed point
+    if a == 0 and d == 0 and b != 0 and c != 0: # Rotated by 90 or 270 degrees
+        width, height = height, width
+    return width, height
+
+def _track_handler(f, trak_start, trak_end):
+    mdia = _find_box(f, trak_start, trak_end, b'mdia')
+    if mdia is None:
+        return None
+    hdlr = _find_box(f, *mdia, b'hdlr')
+    if hdlr is None:
+        return None
+    f.seek(hdlr[0] + 8) # version/flags, pre_defined
+    return _read_exact(f, 4)
+
+def read_mp4_metadata(f, file_size):
+    """Walks the top-level boxes (seeking over mdat, so moov may be at either end) and reads mvhd
+    and the tkhd of the first video track."""
+    moov = None
+    for index, (box_type, payload_start, box_end) in enumerate(_iter_boxes(f, 0, file_size)):
+        if index == 0 and box_type not in TOP_LEVEL_FIRST_BOXES:
+            raise VideoFormatError('Not an ISO-BMFF/QuickTime file.')
+        if box_type == b'moov':
+            moov = (payload_start, box_end)
+            break
+    if moov is None:
+        return None
+
+    metadata = {}
+    mvhd = _find_box(f, *moov, b'mvhd')
+    if mvhd is not None:
+        f.seek(mvhd[0])
+        metadata['capture_time'], metadata['duration'] = _parse_mvhd(_read_exact(f, min(mvhd[1] - mvhd[0], 32)))
+
+    for box_type, trak_start, trak_end in _iter_boxes(f, *moov):
+        if box_type != b'trak':
+            continue
+        tkhd = _find_box(f, trak_start, trak_end, b'tkhd')
+        if tkhd is None or tkhd[1] - tkhd[0] < 84:
+            continue
+        f.seek(tkhd[0])
+        width, height = _parse_tkhd(_read_exact(f, tkhd[1] - tkhd[0]))
+        if width and height and _track_handler(f, trak_start, trak_end) == b'vide':
+            metadata['width'], metadata['height'] = width, height
+            break
+    return metadata
+
+register_video_reader(('.mp4', '.m4v', '.mov', '.3gp', '.3g2'), read_mp4_metadata)
+
+# --- AVI (RIFF) ---
+
+def read_avi_metadata(f, file_size):
+    """Reads the main AVI header ('avih'), which follows the RIFF and hdrl LIST headers at the start of the file."""
+    header = _read_exact(f, 88)
+    if header[:4] != b'RIFF' or header[8:12] != b'AVI ' or header[12:16] != b'LIST' or header[20:24] != b'hdrl' or header[24:28] != b'avih':
+        raise VideoFormatError('Not an AVI file.')
+    micro_seconds_per_frame, _, _, _, total_frames = struct.unpack_from('<LLLLL', header, 32)
+    width, height = struct.unpack_from('<LL', header, 64)
+    duration = micro_seconds_per_frame * total_frames / 1e6 if micro_seconds_per_frame and total_frames else None
+    return {'duration': duration, 'width': width or None, 'height': height or None}
+
+register_video_reader(('.avi',), read_avi_metadata)
@@ -0,0 +1 @@
+"""Benchmark and load-testing tools; see benchmarks/README.md."""
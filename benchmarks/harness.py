@@ -0,0 +1,91 @@
+"""Helpers shared by the benchmark scripts: an isolated app instance and timing/memory measurement."""
+import os
+import sys
+import gc
+import time
+import logging
+import contextlib
+import statistics
+import tracemalloc
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+BENCH_CONFIG_TEMPLATE = '''
+BASE_DIR = {base_dir!r}
+ORG_PATHS = {org_paths!r}
+ARCHIVE_PATH = {archive_path!r}
+DATABASE_PATH = {database_path!r}
+SUPPORTED_IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp']
+SUPPORTED_VIDEO_EXTENSIONS = ['.mp4', '.mov', '.avi', '.mkv', '.wmv', '.flv']
+SQLALCHEMY_TRACK_MODIFICATIONS = False
+SECRET_KEY = 'benchmark-only-secret'
+'''
+
+def make_bench_app(workdir, org_paths, log_level=logging.WARNING):
+    """Creates an app whose database, thumbnails and sessions all live under workdir."""
+    os.makedirs(workdir, exist_ok=True)
+    config_path = os.path.join(workdir, 'bench_config.py')
+    with open(config_path, 'w') as f:
+        f.write(BENCH_CONFIG_TEMPLATE.format(
+            base_dir=workdir, org_paths=list(org_paths),
+            archive_path=os.path.join(workdir, 'archive'),
+            database_path=os.path.join(workdir, 'data', 'bench.sqlite')))
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        from app import create_app
+        app = create_app(config_path)
+    set_app_log_level(log_level)
+    return app
+
+def set_app_log_level(level):
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith('photo_album_manager'):
+            logging.getLogger(name).setLevel(level)
+
+def reset_database(app):
+    """Drops and recreates all tables, giving the next scan a cold start."""
+    from app.models import db
+    from app.search import init_search_index
+    with app.app_context():
+        db.session.remove()
+        db.session.execute(db.text('DROP TABLE IF EXISTS media_fts'))
+        db.session.commit()
+        db.drop_all()
+        db.create_all()
+        init_search_index()
+
+def measure(func, repeat=3, setup=None, trace_memory=True):
+    """Runs func() `repeat` times (calling setup() before each run, untimed) and reports
+    wall-clock statistics plus the tracemalloc peak of one extra traced run.
+    """
+    timings = []
+    devnull = open(os.devnull, 'w')
+    for _ in range(repeat):
+        if setup:
+            setup()
+        gc.collect()
+        with contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+    result = {
+        'runs': repeat,
+        'min_s': min(timings),
+        'median_s': statistics.median(timings),
+        'mean_s': statistics.fmean(timings),
+        'max_s': max(timings),
+    }
+    if trace_memory:
+        if setup:
+            setup()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            with contextlib.redirect_stdout(devnull):
+                func()
+            result['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    devnull.close()
+    return result
@@ -0,0 +1,215 @@
+"""Multi-client HTTP load replay against a locally served app.
+
+Starts the app on a threaded WSGI server over a synthetic library, then drives concurrent
+simulated browser sessions that follow the request pattern of static/js/main.js:
+  * page through /api/media (some sessions with an api_select filter in their session),
+  * load the thumbnails of each page in bursts of parallel requests,
+  * now and then tag an item (POST /api/media/<id>/tags) and refresh /api/tags,
+while a separate client triggers /api/scan/trigger periodically.
+Reports p50/p95/p99 latency and throughput per endpoint.
+
+Usage:
+    python -m benchmarks.load_replay --images 2000 --sessions 6 --duration 30 --out load.json
+"""
+import os
+import re
+import math
+import json
+import time
+import logging
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import http.cookiejar
+import urllib.request
+import urllib.error
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from .harness import make_bench_app
+from .synthetic_library import generate_library
+from .run_benchmarks import _populate_tags, SAMPLE_FILTER
+
+THUMBNAIL_PARALLELISM = 6 # Browsers open about six connections per host
+
+_ID_SEGMENT_RE = re.compile(r'/\d+(?=/|$)')
+
+def endpoint_label(method, path):
+    """'/api/media/thumbnail/17?x=1' -> 'GET /api/media/thumbnail/<id>'."""
+    return f"{method} {_ID_SEGMENT_RE.sub('/<id>', path.split('?', 1)[0])}"
+
+class LatencyRecorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, label, seconds, ok):
+        with self._lock:
+            self.samples[label].append(seconds)
+            if not ok:
+                self.errors[label] += 1
+
+    def report(self, elapsed):
+        def percentile(sorted_values, pct):
+            # Nearest-rank percentile
+            index = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+            return sorted_values[index]
+
+        report = {}
+        with self._lock:
+            for label, values in sorted(self.samples.items()):
+                values = sorted(values)
+                report[label] = {
+                    'count': len(values),
+                    'errors': self.errors.get(label, 0),
+                    'throughput_rps': len(values) / elapsed if elapsed else 0.0,
+                    'p50_ms': percentile(values, 50) * 1000,
+                    'p95_ms': percentile(values, 95) * 1000,
+                    'p99_ms': percentile(values, 99) * 1000,
+                    'max_ms': values[-1] * 1000,
+                }
+        return report
+
+class SimulatedSession:
+    """One browser tab: its own cookie jar (and therefore its own Flask session)."""
+
+    def __init__(self, base_url, recorder, rng):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.rng = rng
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, method, path, payload=None):
+        data = json.dumps(payload).encode() if payload is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'} if data else {})
+        start = time.perf_counter()
+        status, body = None, b''
+        try:
+            with self.opener.open(req, timeout=120) as response:
+                status, body = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            status, body = e.code, e.read()
+        except OSError:
+            status = None
+        self.recorder.record(endpoint_label(method, path), time.perf_counter() - start,
+                             ok=status is not None and status < 500)
+        return status, body
+
+    def get_json(self, path):
+        status, body = self.request('GET', path)
+        try:
+            return json.loads(body) if status == 200 else None
+        except ValueError:
+            return None
+
+def browse(session, stop_at, use_filter, per_page, tag_probability, thumbnail_pool):
+    if use_filter:
+        session.request('POST', '/api/media/filter_config', {'filter_code': SAMPLE_FILTER})
+    session.request('GET', '/api/org_paths')
+    session.request('GET', '/api/tags')
+    page, total_pages = 1, 1
+    while time.monotonic() < stop_at:
+        types = 'image' if session.rng.random() < 0.3 else 'image,video'
+        listing = session.get_json(f'/api/media?page={page}&per_page={per_page}&sort_by=capture_time'
+                                   f'&sort_order=desc&media_types_filter={types}')
+        if not listing:
+            page = 1
+            continue
+        total_pages = max(1, listing.get('total_pages', 1))
+        items = listing.get('media', [])
+        # Thumbnails of a page are requested in parallel, like the browser does for background images.
+        list(thumbnail_pool.map(lambda item: session.request('GET', f"/api/media/thumbnail/{item['id']}"), items))
+        if items and session.rng.random() < tag_probability:
+            target = session.rng.choice(items)
+            session.request('POST', f"/api/media/{target['id']}/tags", {'tag_names': ['load_test']})
+            session.request('GET', '/api/tags')
+        page = page + 1 if page < total_pages else 1
+
+def trigger_scans(session, stop_at, interval):
+    while time.monotonic() < stop_at:
+        session.request('POST', '/api/scan/trigger')
+        time.sleep(interval)
+
+def run_load(app, sessions, filtered_sessions, duration, per_page, tag_probability, scan_interval, seed):
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.WARNING) # Per-request access lines would skew timings
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+    recorder = LatencyRecorder()
+    stop_at = time.monotonic() + duration
+    started = time.perf_counter()
+    try:
+        workers = []
+        pools = []
+        for index in range(sessions):
+            session = SimulatedSession(base_url, recorder, random.Random(seed + index))
+            pool = ThreadPoolExecutor(max_workers=THUMBNAIL_PARALLELISM)
+            pools.append(pool)
+            workers.append(threading.Thread(target=browse, args=(session, stop_at, index < filtered_sessions,
+                                                                 per_page, tag_probability, pool)))
+        if scan_interval > 0:
+            scanner = SimulatedSession(base_url, recorder, random.Random(seed - 1))
+            workers.append(threading.Thread(target=trigger_scans, args=(scanner, stop_at, scan_interval)))
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        for pool in pools:
+            pool.shutdown()
+    finally:
+        server.shutdown()
+    return recorder.report(time.perf_counter() - started)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay concurrent browser-like load against the app.')
+    parser.add_argument('--images', type=int, default=1000)
+    parser.add_argument('--videos', type=int, default=50)
+    parser.add_argument('--max-resolution', type=int, default=2048)
+    parser.add_argument('--library', help='Reuse an existing synthetic library root.')
+    parser.add_argument('--sessions', type=int, default=4, help='Concurrent browsing sessions (tabs).')
+    parser.add_argument('--filtered-sessions', type=int, default=2, help='How many of them use an api_select filter.')
+    parser.add_argument('--duration', type=float, default=20.0, help='Seconds of load.')
+    parser.add_argument('--per-page', type=int, default=60)
+    parser.add_argument('--tag-probability', type=float, default=0.2, help='Chance of a tag POST after each page.')
+    parser.add_argument('--scan-interval', type=float, default=10.0, help='Seconds between scan triggers (0 disables).')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--out', help='Write the report as JSON to this file.')
+    args = parser.parse_args(argv)
+
+    scratch = tempfile.mkdtemp(prefix='pam_load_')
+    try:
+        if args.library:
+            org_paths = sorted(os.path.join(args.library, d) for d in os.listdir(args.library)
+                               if os.path.isdir(os.path.join(args.library, d)))
+        else:
+            print(f'Generating synthetic library ({args.images} images, {args.videos} videos)...')
+            org_paths = generate_library(os.path.join(scratch, 'library'), images=args.images, videos=args.videos,
+                                         max_resolution=args.max_resolution)['org_paths']
+        app = make_bench_app(os.path.join(scratch, 'work'), org_paths)
+        with app.app_context():
+            from app.scanner import scan_libraries
+            scan_libraries()
+        _populate_tags(app)
+        print(f'Running {args.sessions} sessions ({args.filtered_sessions} filtered) for {args.duration:.0f}s...')
+        report = run_load(app, args.sessions, args.filtered_sessions, args.duration, args.per_page,
+                          args.tag_probability, args.scan_interval, args.seed)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    print(f"{'endpoint':<42}{'count':>7}{'err':>5}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for label, stats in report.items():
+        print(f"{label:<42}{stats['count']:>7}{stats['errors']:>5}{stats['throughput_rps']:>8.1f}"
+              f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'parameters': vars(args), 'endpoints': report}, f, indent=2)
+        print(f'Report written to {args.out}')
+
+if __name__ == '__main__':
+    main()
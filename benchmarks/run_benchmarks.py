@@ -0,0 +1,203 @@
+"""Offline benchmark suite for the hot paths of the app.
+
+Generates (or reuses) a synthetic library, then times and memory-profiles:
+  cold_scan, rescan_no_change, catalog_export, catalog_import, list_media_unfiltered,
+  list_media_filtered, tagging and thumbnail_generation.
+Results are written as JSON; pass --compare to diff against an earlier results file.
+
+Usage:
+    python -m benchmarks.run_benchmarks --images 2000 --out bench_results.json
+    python -m benchmarks.run_benchmarks --images 2000 --out new.json --compare bench_results.json
+"""
+import os
+import sys
+import json
+import random
+import shutil
+import argparse
+import platform
+import subprocess
+import tempfile
+from datetime import datetime
+
+from .harness import PROJECT_ROOT, make_bench_app, reset_database, measure
+from .synthetic_library import generate_library
+
+SAMPLE_FILTER = '''def api_select(media):
+    if 'bench_tag_0' in media.tags:
+        return True
+    return media.filesize > 200000 and 'library1' in media.org_path
+'''
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _populate_tags(app, tag_count=20, max_tags_per_media=3, seed=42):
+    from app.models import db, Media, Tag, media_tag
+    rng = random.Random(seed)
+    with app.app_context():
+        tags = [Tag(name=f'bench_tag_{n}') for n in range(tag_count)]
+        db.session.add_all(tags)
+        db.session.flush()
+        media_ids = [row[0] for row in db.session.query(Media.id)]
+        rows = []
+        for media_id in media_ids:
+            for tag in rng.sample(tags, rng.randint(0, max_tags_per_media)):
+                rows.append({'media_id': media_id, 'tag_id': tag.id})
+        if rows:
+            db.session.execute(media_tag.insert(), rows)
+        db.session.commit()
+
+def run_suite(library_root, workdir, org_paths, repeat, pages, thumbnails):
+    from app.scanner import scan_libraries
+    from app.models import db, Media
+    from app.tag_manager import add_tags_to_media
+    from app.image_utils import generate_thumbnail
+    from app.catalog import export_catalog, import_catalog
+    from app.cache import bump_data_version
+
+    app = make_bench_app(workdir, org_paths)
+    results = {}
+
+    def scan():
+        with app.app_context():
+            scan_libraries()
+
+    results['cold_scan'] = measure(scan, repeat=repeat, setup=lambda: reset_database(app))
+    reset_database(app)
+    scan()
+    _populate_tags(app)
+    results['rescan_no_change'] = measure(scan, repeat=repeat)
+
+    snapshot_path = os.path.join(workdir, 'catalog.snapshot.gz')
+
+    def export_snapshot():
+        with app.app_context():
+            export_catalog(snapshot_path, compress=True)
+
+    def import_snapshot():
+        with app.app_context():
+            import_catalog(snapshot_path, replace=True, keep_caches=True)
+
+    results['catalog_export'] = measure(export_snapshot, repeat=repeat)
+    results['catalog_export']['snapshot_bytes'] = os.path.getsize(snapshot_path)
+    results['catalog_import'] = measure(import_snapshot, repeat=repeat)
+
+    with app.app_context():
+        total = Media.query.filter_by(is_accessible=True).count()
+    results['library'] = {'accessible_media': total}
+
+    def page_through(client):
+        for page in range(1, pages + 1):
+            response = client.get(f'/api/media?page={page}&per_page=60&sort_by=capture_time&sort_order=desc'
+                                  f'&media_types_filter=image,video')
+            assert response.status_code == 200, response.status_code
+
+    unfiltered_client = app.test_client()
+    results['list_media_unfiltered'] = measure(lambda: page_through(unfiltered_client), repeat=repeat)
+
+    filtered_client = app.test_client()
+    response = filtered_client.post('/api/media/filter_config', json={'filter_code': SAMPLE_FILTER})
+    assert response.status_code == 200, response.get_data(as_text=True)
+
+    def invalidate_filter_cache():
+        with app.app_context():
+            bump_data_version() # Otherwise every run after the first is served from cached_filter_media_ids
+            db.session.commit()
+
+    results['list_media_filtered'] = measure(lambda: page_through(filtered_client), repeat=repeat, setup=invalidate_filter_cache)
+
+    with app.app_context():
+        tag_targets = [row[0] for row in db.session.query(Media.id).order_by(Media.id).limit(200)]
+    tag_round = {'n': 0}
+
+    def tag_media():
+        tag_round['n'] += 1
+        with app.app_context():
+            for media_id in tag_targets:
+                add_tags_to_media(media_id, [f"bench_round_{tag_round['n']}", 'bench_common'])
+
+    results['tagging'] = measure(tag_media, repeat=repeat)
+    results['tagging']['items'] = len(tag_targets)
+
+    with app.app_context():
+        thumb_ids = [row[0] for row in db.session.query(Media.id).filter(Media.media_type == 'image')
+                     .order_by(Media.id).limit(thumbnails)]
+
+    def make_thumbnails():
+        with app.app_context():
+            for media_item in Media.query.filter(Media.id.in_(thumb_ids)):
+                generate_thumbnail(media_item, force_generate=True)
+            db.session.commit()
+
+    results['thumbnail_generation'] = measure(make_thumbnails, repeat=repeat)
+    results['thumbnail_generation']['items'] = len(thumb_ids)
+    return results
+
+def compare(new_results, old_results):
+    """Prints median time and peak memory deltas for benchmarks present in both result sets."""
+    print(f"{'benchmark':<24}{'old median':>12}{'new median':>12}{'change':>9}{'old peak MB':>13}{'new peak MB':>13}")
+    for name, new in new_results['benchmarks'].items():
+        old = old_results.get('benchmarks', {}).get(name)
+        if not old or 'median_s' not in new or 'median_s' not in old:
+            continue
+        change = (new['median_s'] - old['median_s']) / old['median_s'] * 100 if old['median_s'] else 0.0
+        old_peak = old.get('peak_memory_bytes', 0) / 1e6
+        new_peak = new.get('peak_memory_bytes', 0) / 1e6
+        print(f"{name:<24}{old['median_s']:>11.3f}s{new['median_s']:>11.3f}s{change:>+8.1f}%{old_peak:>13.1f}{new_peak:>13.1f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the offline benchmark suite.')
+    parser.add_argument('--images', type=int, default=1000)
+    parser.add_argument('--videos', type=int, default=50)
+    parser.add_argument('--max-resolution', type=int, default=2048, help='Cap on generated image long edge.')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--pages', type=int, default=5, help='Pages of /api/media fetched per paging run.')
+    parser.add_argument('--thumbnails', type=int, default=50)
+    parser.add_argument('--library', help='Reuse an existing synthetic library root instead of generating one.')
+    parser.add_argument('--workdir', help='Where to keep the benchmark DB and thumbnails (default: temp dir).')
+    parser.add_argument('--out', default='bench_results.json')
+    parser.add_argument('--compare', help='Earlier results JSON to compare against.')
+    args = parser.parse_args(argv)
+
+    scratch = tempfile.mkdtemp(prefix='pam_bench_')
+    try:
+        library_root = args.library or os.path.join(scratch, 'library')
+        if args.library:
+            org_paths = sorted(os.path.join(library_root, d) for d in os.listdir(library_root)
+                               if os.path.isdir(os.path.join(library_root, d)))
+            manifest = {'root': library_root, 'org_paths': org_paths}
+        else:
+            print(f'Generating synthetic library ({args.images} images, {args.videos} videos)...')
+            manifest = generate_library(library_root, images=args.images, videos=args.videos,
+                                        max_resolution=args.max_resolution)
+        workdir = args.workdir or os.path.join(scratch, 'work')
+        benchmarks = run_suite(library_root, workdir, manifest['org_paths'], args.repeat, args.pages, args.thumbnails)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    output = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': _git_revision(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'parameters': vars(args),
+        'library': {k: v for k, v in manifest.items() if k != 'root'},
+        'benchmarks': benchmarks,
+    }
+    with open(args.out, 'w') as f:
+        json.dump(output, f, indent=2)
+    print(f'Results written to {args.out}')
+    for name, result in benchmarks.items():
+        if 'median_s' in result:
+            print(f"  {name:<24} median {result['median_s']:.3f}s  peak {result.get('peak_memory_bytes', 0) / 1e6:.1f} MB")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(output, json.load(f))
+
+if __name__ == '__main__':
+    main()
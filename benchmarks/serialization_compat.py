@@ -0,0 +1,158 @@
+"""Checks that the msgspec-encoded API responses match the previous jsonify output and times both.
+
+For every page of /api/media (without and with an api_select filter) and for /api/tags and
+/api/filters/favorites, the response body is compared byte for byte with what the previous
+implementation produced (ORM objects -> dicts -> jsonify). Bodies containing non-ASCII text are
+compared as parsed JSON instead, since jsonify escapes non-ASCII characters and msgspec writes UTF-8.
+Exits with status 1 on any mismatch.
+
+Usage:
+    python -m benchmarks.serialization_compat --images 500 --per-page 60
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import builtins
+import tempfile
+from types import SimpleNamespace
+
+from .harness import make_bench_app, measure
+from .synthetic_library import generate_library
+from .run_benchmarks import _populate_tags, SAMPLE_FILTER
+
+def _legacy_media_dict(media_item):
+    return {
+        'id': media_item.id, 'filepath': media_item.filepath, 'filename': media_item.filename, 'org_path': media_item.org_path,
+        'capture_time': media_item.capture_time.isoformat() if media_item.capture_time else None,
+        'modification_time': media_item.modification_time.isoformat() if media_item.modification_time else None,
+        'filesize': media_item.filesize, 'media_type': media_item.media_type, 'tags': [t.name for t in (media_item.tags or [])]
+    }
+
+def _legacy_filter(media_item_dict, filter_code):
+    """The previous per-item api_select evaluation (exec of the filter code for every item), kept as the
+    reference the compiled filter is compared against. Permissive: errors let the item pass.
+    """
+    media_proxy = SimpleNamespace(**media_item_dict)
+    local_namespace = {}
+    try:
+        exec(filter_code, {'__builtins__': builtins, 'media': media_proxy}, local_namespace)
+        api_select_func = local_namespace.get('api_select')
+        return bool(api_select_func(media_proxy)) if callable(api_select_func) else True
+    except Exception:
+        return True
+
+def _legacy_pages(app, per_page, filter_code=None):
+    """Yields (page, legacy body bytes) using the pre-msgspec list_media logic."""
+    from flask import jsonify
+    from app.models import Media
+    with app.test_request_context():
+        items = (Media.query.filter_by(is_accessible=True).filter(Media.media_type.in_(['image', 'video']))
+                 .order_by(Media.capture_time.desc()).all())
+        if filter_code:
+            items = [item for item in items if _legacy_filter(
+                dict(_legacy_media_dict(item), capture_time=item.capture_time.isoformat() if item.capture_time else None),
+                filter_code)]
+        total_items = len(items)
+        total_pages = (total_items + per_page - 1) // per_page if total_items else 0
+        for page in range(1, total_pages + 1):
+            page_items = items[(page - 1) * per_page:page * per_page]
+            body = jsonify({'media': [_legacy_media_dict(item) for item in page_items], 'total_pages': total_pages,
+                            'current_page': page, 'total_items': total_items}).get_data()
+            yield page, body
+
+def _same(new_body, legacy_body):
+    if new_body == legacy_body:
+        return True
+    if not new_body.isascii():
+        return json.loads(new_body) == json.loads(legacy_body)
+    return False
+
+def check(app, per_page):
+    mismatches = []
+    for label, filter_code in (('unfiltered', None), ('filtered', SAMPLE_FILTER)):
+        client = app.test_client()
+        if filter_code:
+            client.post('/api/media/filter_config', json={'filter_code': filter_code})
+        pages = 0
+        for page, legacy_body in _legacy_pages(app, per_page, filter_code):
+            new_body = client.get(f'/api/media?page={page}&per_page={per_page}&sort_by=capture_time'
+                                  f'&sort_order=desc&media_types_filter=image,video').get_data()
+            pages += 1
+            if not _same(new_body, legacy_body):
+                mismatches.append(f'/api/media {label} page {page}')
+        print(f'/api/media {label}: compared {pages} pages')
+
+    from flask import jsonify
+    from app.models import Tag, FavoriteFilter
+    client = app.test_client()
+    client.post('/api/filters/favorites', json={'code': SAMPLE_FILTER})
+    with app.test_request_context():
+        legacy_tags = jsonify([{'id': t.id, 'name': t.name} for t in Tag.query.all()]).get_data()
+        legacy_favorites = jsonify([{'id': f.id, 'code': f.code, 'is_pinned': f.is_pinned} for f in
+                                    FavoriteFilter.query.order_by(FavoriteFilter.created_at.desc()).all()]).get_data()
+    if not _same(client.get('/api/tags').get_data(), legacy_tags):
+        mismatches.append('/api/tags')
+    if not _same(client.get('/api/filters/favorites').get_data(), legacy_favorites):
+        mismatches.append('/api/filters/favorites')
+    return mismatches
+
+def time_encoders(app, per_page, repeat):
+    """Times serializing one page of `per_page` items with the legacy and the msgspec path (queries excluded)."""
+    from flask import jsonify
+    from app.models import db, Media
+    from app.schemas import MediaPage, MEDIA_PAYLOAD_COLUMNS, media_payloads_from_rows, json_response
+    from app.tag_manager import get_tag_names_for_media
+    with app.test_request_context():
+        items = Media.query.order_by(Media.capture_time.desc()).limit(per_page).all()
+        for item in items:
+            item.tags # Load the relationship up front
+        rows = [tuple(getattr(item, column) for column in MEDIA_PAYLOAD_COLUMNS) for item in items]
+        tag_names = get_tag_names_for_media([row[0] for row in rows])
+
+        def legacy():
+            jsonify({'media': [_legacy_media_dict(item) for item in items], 'total_pages': 1,
+                     'current_page': 1, 'total_items': len(items)}).get_data()
+
+        def new():
+            json_response(MediaPage(current_page=1, media=media_payloads_from_rows(rows, tag_names),
+                                    total_items=len(rows), total_pages=1)).get_data()
+
+        results = {'legacy_jsonify': measure(legacy, repeat=repeat, trace_memory=False),
+                   'msgspec': measure(new, repeat=repeat, trace_memory=False)}
+        db.session.rollback()
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare msgspec API responses with the previous jsonify output.')
+    parser.add_argument('--images', type=int, default=500)
+    parser.add_argument('--videos', type=int, default=20)
+    parser.add_argument('--per-page', type=int, default=60)
+    parser.add_argument('--timing-per-page', type=int, default=500, help='Page size for the encoder timing.')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    scratch = tempfile.mkdtemp(prefix='pam_serialization_')
+    try:
+        org_paths = generate_library(os.path.join(scratch, 'library'), images=args.images, videos=args.videos,
+                                     max_resolution=256)['org_paths']
+        app = make_bench_app(os.path.join(scratch, 'work'), org_paths)
+        with app.app_context():
+            from app.scanner import scan_libraries
+            scan_libraries()
+        _populate_tags(app)
+        mismatches = check(app, args.per_page)
+        timings = time_encoders(app, args.timing_per_page, args.repeat)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    for name, result in timings.items():
+        print(f"  {name:<16} median {result['median_s'] * 1000:.2f} ms for {args.timing_per_page} items")
+    if mismatches:
+        print('MISMATCH: ' + ', '.join(mismatches))
+        sys.exit(1)
+    print('All responses match the previous output.')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Measures process start-up: importing the app and running create_app() in a fresh interpreter.
+
+Each run is a new `python` process (like a CLI command or a respawned worker), timed from the parent:
+  first_boot     create_app() against a database that does not exist yet (schema is created)
+  warm_boot      create_app() against the database prepared by first_boot (schema work is skipped)
+  import_only    `import app` without create_app()
+The child also reports its own create_app() time and which heavy optional modules (Pillow, ...) were
+loaded; none of them should be, since they are imported on first use. With --importtime, the 15
+slowest modules of one warm boot are listed from `python -X importtime`.
+
+Usage:
+    python -m benchmarks.startup_time --repeat 10
+    python -m benchmarks.startup_time --repeat 10 --importtime --out startup.json
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import statistics
+import subprocess
+import tempfile
+import time
+
+from .harness import PROJECT_ROOT, BENCH_CONFIG_TEMPLATE
+
+HEAVY_MODULES = ('PIL', 'numpy', 'av', 'cv2')
+
+_CHILD_SCRIPT = '''
+import sys, time, json
+sys.path.insert(0, {project_root!r})
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+if {create!r}:
+    create_app({config_path!r})
+done = time.perf_counter()
+print(json.dumps({{'import_s': imported - start, 'create_app_s': done - imported,
+                  'heavy_modules': [m for m in {heavy!r} if m in sys.modules]}}))
+'''
+
+def _write_config(workdir):
+    config_path = os.path.join(workdir, 'bench_config.py')
+    with open(config_path, 'w') as f:
+        f.write(BENCH_CONFIG_TEMPLATE.format(
+            base_dir=workdir, org_paths=[os.path.join(workdir, 'library')],
+            archive_path=os.path.join(workdir, 'archive'),
+            database_path=os.path.join(workdir, 'data', 'bench.sqlite')))
+    return config_path
+
+def _run_child(config_path, create=True, extra_args=()):
+    script = _CHILD_SCRIPT.format(project_root=PROJECT_ROOT, config_path=config_path, create=create, heavy=HEAVY_MODULES)
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, *extra_args, '-c', script], capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - start
+    report = json.loads(completed.stdout.strip().splitlines()[-1])
+    report['wall_s'] = wall
+    return report, completed.stderr
+
+def _summary(reports):
+    result = {'runs': len(reports), 'heavy_modules': sorted({m for r in reports for m in r['heavy_modules']})}
+    for key in ('wall_s', 'import_s', 'create_app_s'):
+        values = [r[key] for r in reports]
+        result[f'{key[:-2]}_median_s'] = statistics.median(values)
+        result[f'{key[:-2]}_min_s'] = min(values)
+    return result
+
+def _slowest_imports(stderr, count=15):
+    """Parses `-X importtime` output into (cumulative microseconds, module) tuples, slowest first."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = [part.strip() for part in line[len('import time:'):].split('|')]
+        rows.append((int(cumulative), module))
+    return sorted(rows, reverse=True)[:count]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--importtime', action='store_true', help='List the slowest imports of one warm boot.')
+    parser.add_argument('--out', help='Write the results as JSON to this file.')
+    parser.add_argument('--keep', action='store_true', help='Keep the temporary working directory.')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='startup_bench_')
+    try:
+        config_path = _write_config(workdir)
+        first = []
+        for _ in range(args.repeat):
+            shutil.rmtree(os.path.join(workdir, 'data'), ignore_errors=True)
+            first.append(_run_child(config_path)[0])
+        warm = [_run_child(config_path)[0] for _ in range(args.repeat)]
+        import_only = [_run_child(config_path, create=False)[0] for _ in range(args.repeat)]
+        results = {'first_boot': _summary(first), 'warm_boot': _summary(warm), 'import_only': _summary(import_only)}
+        heavy_loaded = any(result['heavy_modules'] for result in results.values())
+
+        for name, result in results.items():
+            print(f"{name:12s} wall {result['wall_median_s'] * 1000:7.1f} ms  import {result['import_median_s'] * 1000:7.1f} ms  "
+                  f"create_app {result['create_app_median_s'] * 1000:7.1f} ms  (median of {result['runs']})  "
+                  f"heavy modules loaded: {', '.join(result['heavy_modules']) or 'none'}")
+
+        if args.importtime:
+            _, stderr = _run_child(config_path, extra_args=('-X', 'importtime'))
+            slowest = _slowest_imports(stderr)
+            results['slowest_imports'] = [{'module': module, 'cumulative_us': us} for us, module in slowest]
+            print('\nSlowest imports (cumulative):')
+            for us, module in slowest:
+                print(f'  {us / 1000:7.1f} ms  {module}')
+
+        if args.out:
+            with open(args.out, 'w') as f:
+                json.dump(results, f, indent=2)
+        return 1 if heavy_loaded else 0
+    finally:
+        if args.keep:
+            print(f'Working directory kept at {workdir}')
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    sys.exit(main())
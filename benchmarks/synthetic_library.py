@@ -0,0 +1,141 @@
+"""Generates synthetic photo/video libraries for benchmarking.
+
+The layout mimics a real camera dump: <root>/library<N>/<year>/<month>/<event>/IMG_xxxx.jpg,
+JPEGs of mixed resolutions (some with EXIF capture time, camera, lens, orientation and GPS tags, some without)
+and MP4 files with a real container header (ftyp, mdat, then moov at the end) around random payload bytes.
+
+Usage:
+    python -m benchmarks.synthetic_library /tmp/bench_lib --images 2000 --videos 100
+"""
+import os
+import struct
+import random
+import argparse
+from datetime import datetime, timedelta
+from PIL import Image
+from PIL.TiffImagePlugin import IFDRational
+
+RESOLUTIONS = [(640, 480), (1024, 768), (1600, 1200), (2048, 1536), (3000, 2000)]
+RESOLUTION_WEIGHTS = [30, 30, 20, 15, 5]
+CAMERAS = [('Canon', 'Canon EOS 5D Mark IV'), ('NIKON CORPORATION', 'NIKON D750'),
+           ('Apple', 'iPhone 13'), ('SONY', 'ILCE-7M3')]
+LENSES = {'Canon EOS 5D Mark IV': 'EF24-70mm f/2.8L II USM', 'NIKON D750': 'AF-S NIKKOR 50mm f/1.8G',
+          'iPhone 13': 'iPhone 13 back dual wide camera 5.1mm f/1.6', 'ILCE-7M3': 'FE 24-105mm F4 G OSS'}
+EXIF_IFD_POINTER, GPS_IFD_POINTER = 0x8769, 0x8825
+TAG_MAKE, TAG_MODEL, TAG_ORIENTATION, TAG_DATETIME = 0x010F, 0x0110, 0x0112, 0x0132
+TAG_DATETIME_ORIGINAL, TAG_DATETIME_DIGITIZED, TAG_LENS_MODEL = 0x9003, 0x9004, 0xA434
+
+def _random_image(rng, size):
+    # Upscaling a tiny noise canvas gives smooth, unique content that compresses like a photo.
+    seed_canvas = Image.frombytes('RGB', (16, 12), rng.randbytes(16 * 12 * 3))
+    return seed_canvas.resize(size, Image.Resampling.BICUBIC)
+
+def _exif_for(rng, capture_time):
+    make, model = rng.choice(CAMERAS)
+    exif = Image.Exif()
+    stamp = capture_time.strftime('%Y:%m:%d %H:%M:%S')
+    exif[TAG_MAKE] = make
+    exif[TAG_MODEL] = model
+    exif[TAG_DATETIME] = stamp
+    exif_ifd = exif.get_ifd(EXIF_IFD_POINTER)
+    exif_ifd[TAG_DATETIME_ORIGINAL] = stamp
+    exif_ifd[TAG_DATETIME_DIGITIZED] = stamp
+    exif_ifd[TAG_LENS_MODEL] = LENSES[model]
+    # Orientation (every tenth image rotated) and GPS (every third minute) follow from the capture time.
+    exif[TAG_ORIENTATION] = 6 if capture_time.second % 10 == 3 else 1
+    if capture_time.minute % 3 == 0:
+        gps_ifd = exif.get_ifd(GPS_IFD_POINTER)
+        gps_ifd[1], gps_ifd[2] = 'N', (IFDRational(48), IFDRational(capture_time.minute), IFDRational(capture_time.second * 100, 100))
+        gps_ifd[3], gps_ifd[4] = 'E', (IFDRational(2), IFDRational(capture_time.hour), IFDRational(1234, 100))
+    return exif
+
+MP4_EPOCH_OFFSET = 2082844800 # Seconds from 1904-01-01 to 1970-01-01
+IDENTITY_MATRIX = (0x10000, 0, 0, 0, 0x10000, 0, 0, 0, 0x40000000)
+ROTATE_90_MATRIX = (0, 0x10000, 0, -0x10000, 0, 0, 0, 0, 0x40000000)
+
+def _box(box_type, payload):
+    return struct.pack('>L4s', 8 + len(payload), box_type) + payload
+
+def _mp4_moov(capture_time, duration_s, width, height, rotated):
+    created = int(capture_time.timestamp()) + MP4_EPOCH_OFFSET
+    mvhd = _box(b'mvhd', struct.pack('>B3xLLLL', 0, created, created, 1000, int(duration_s * 1000))
+                + struct.pack('>lH10x9l', 0x10000, 0x100, *IDENTITY_MATRIX) + bytes(24) + struct.pack('>L', 2))
+    tkhd = _box(b'tkhd', struct.pack('>B3sLLL4xL', 0, b'\x00\x00\x03', created, created, 1, int(duration_s * 1000))
+                + bytes(8) + struct.pack('>hhh2x9lLL', 0, 0, 0, *(ROTATE_90_MATRIX if rotated else IDENTITY_MATRIX),
+                                         width << 16, height << 16))
+    hdlr = _box(b'hdlr', bytes(8) + b'vide' + bytes(12) + b'VideoHandler\x00')
+    return _box(b'moov', mvhd + _box(b'trak', tkhd + _box(b'mdia', hdlr)))
+
+def _write_dummy_video(rng, path, size_bytes, capture_time):
+    # A minimal MP4 (ftyp, mdat with random payload, moov) of size_bytes; the moov fields (creation time,
+    # duration, size, rotation) follow from the capture time.
+    payload = rng.randbytes(size_bytes)
+    width, height = (1920, 1080) if capture_time.second % 2 else (3840, 2160)
+    moov = _mp4_moov(capture_time, 5 + capture_time.second % 60, width, height, rotated=capture_time.second % 3 == 0)
+    ftyp = _box(b'ftyp', b'isom' + struct.pack('>L', 512) + b'isomiso2mp41')
+    mdat_size = max(8, size_bytes - len(ftyp) - len(moov))
+    with open(path, 'wb') as f:
+        f.write(ftyp + struct.pack('>L4s', mdat_size, b'mdat') + payload[:mdat_size - 8] + moov)
+
+def _event_dirs(rng, library_root, depth, events_per_month):
+    """Yields (directory, base capture time) for nested year/month/event directories."""
+    start = datetime(2012, 1, 1)
+    for year in range(2012, 2012 + max(1, depth)):
+        for month in (1, 4, 7, 10):
+            for event in range(events_per_month):
+                directory = os.path.join(library_root, str(year), f'{month:02d}', f'event_{event:02d}')
+                yield directory, start.replace(year=year, month=month) + timedelta(days=event)
+
+def generate_library(root, images=500, videos=20, libraries=2, depth=3, events_per_month=2,
+                     exif_ratio=0.7, max_resolution=None, seed=1234):
+    """Creates the library under root and returns a manifest dict (org_paths, counts, bytes)."""
+    rng = random.Random(seed)
+    resolutions = [r for r in RESOLUTIONS if max_resolution is None or max(r) <= max_resolution] or RESOLUTIONS[:1]
+    weights = RESOLUTION_WEIGHTS[:len(resolutions)]
+    org_paths = [os.path.join(root, f'library{n + 1}') for n in range(libraries)]
+
+    slots = [(org_path, directory, base_time)
+             for org_path in org_paths
+             for directory, base_time in _event_dirs(rng, org_path, depth, events_per_month)]
+    total_bytes = 0
+    for index in range(images + videos):
+        _, directory, base_time = slots[index % len(slots)]
+        os.makedirs(directory, exist_ok=True)
+        capture_time = base_time + timedelta(seconds=index * 7)
+        if index < images:
+            path = os.path.join(directory, f'IMG_{index:06d}.jpg')
+            size = rng.choices(resolutions, weights)[0]
+            img = _random_image(rng, size)
+            if rng.random() < exif_ratio:
+                img.save(path, 'JPEG', quality=85, exif=_exif_for(rng, capture_time))
+            else:
+                img.save(path, 'JPEG', quality=85)
+        else:
+            path = os.path.join(directory, f'MOV_{index:06d}.mp4')
+            _write_dummy_video(rng, path, rng.randint(64, 512) * 1024, capture_time)
+        mtime = capture_time.timestamp()
+        os.utime(path, (mtime, mtime))
+        total_bytes += os.path.getsize(path)
+
+    return {'root': root, 'org_paths': org_paths, 'images': images, 'videos': videos,
+            'bytes': total_bytes, 'seed': seed}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a synthetic media library for benchmarks.')
+    parser.add_argument('root', help='Directory to create the libraries in.')
+    parser.add_argument('--images', type=int, default=500)
+    parser.add_argument('--videos', type=int, default=20)
+    parser.add_argument('--libraries', type=int, default=2, help='Number of ORG_PATHS roots.')
+    parser.add_argument('--depth', type=int, default=3, help='Number of year directories per library.')
+    parser.add_argument('--exif-ratio', type=float, default=0.7, help='Share of JPEGs written with EXIF.')
+    parser.add_argument('--max-resolution', type=int, default=None, help='Cap on the long edge, in pixels.')
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args(argv)
+    manifest = generate_library(args.root, images=args.images, videos=args.videos, libraries=args.libraries,
+                                depth=args.depth, exif_ratio=args.exif_ratio,
+                                max_resolution=args.max_resolution, seed=args.seed)
+    print(f"Generated {manifest['images']} images and {manifest['videos']} videos "
+          f"({manifest['bytes'] / 1e6:.1f} MB) in {', '.join(manifest['org_paths'])}")
+
+if __name__ == '__main__':
+    main()
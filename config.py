@@ -34,6 +34,83 @@ ORG_PATHS = [
 # **NOTE:** You MUST create this directory on your filesystem if it does not already exist.
 ARCHIVE_PATH = '/mnt/c/Users/root/Desktop/ac' # Default sample path
 
+# Library scans keep per-directory state in the database. When True, directories whose mtime has not
+# changed since the last scan are not listed again (no files were added, removed or renamed in them)
+# and files whose mtime and size are unchanged are not re-read. Files edited in place without a change
+# to their directory are then only picked up by `flask scan libraries --force-rescan`.
+SCAN_SKIP_UNCHANGED_DIRS = True
+
+# How /api/media/file/<id> delivers originals. None: the app streams the file itself (with HTTP Range
+# support; zero-copy sendfile under gunicorn/uWSGI). 'x-sendfile': Apache mod_xsendfile or lighttpd
+# streams it. 'x-accel-redirect': nginx streams it from an internal location mapping
+# MEDIA_X_ACCEL_PREFIX onto the filesystem root. MEDIA_CACHE_MAX_AGE is the browser cache lifetime in seconds.
+MEDIA_SENDFILE_MODE = None
+MEDIA_X_ACCEL_PREFIX = '/_protected_media'
+MEDIA_CACHE_MAX_AGE = 3600
+
+# Preview renditions shown by the full-size viewer instead of the originals: JPEGs at most PREVIEW_MAX_EDGE
+# pixels on the long edge, rendered by PREVIEW_WORKERS background threads (at most PREVIEW_QUEUE_SIZE
+# waiting) and cached in data/previews up to PREVIEW_CACHE_MAX_MB, least recently viewed removed first.
+# PREVIEW_PREFETCH_COUNT neighbours on each side of the viewed image are rendered ahead of time.
+PREVIEW_MAX_EDGE = 2048
+PREVIEW_QUALITY = 85
+PREVIEW_WORKERS = 2
+PREVIEW_QUEUE_SIZE = 64
+PREVIEW_CACHE_MAX_MB = 2048
+PREVIEW_PREFETCH_COUNT = 2
+
+# Change events streamed to open clients at /api/events. The last EVENT_HISTORY_SIZE events are kept so a
+# reconnecting client can catch up; idle streams get a keep-alive comment every EVENT_KEEPALIVE_SECONDS.
+# Each connected client holds one server thread while the stream is open.
+# At most EVENT_MAX_STREAMS streams are open at once (None: half of SERVER_THREADS under `flask serve`,
+# unlimited otherwise); further clients get 503 and refetch instead. Streams end after
+# EVENT_STREAM_MAX_SECONDS and the browser reconnects, which also frees threads of stale connections.
+EVENT_HISTORY_SIZE = 1000
+EVENT_KEEPALIVE_SECONDS = 15
+EVENT_MAX_STREAMS = None
+EVENT_STREAM_MAX_SECONDS = 300
+
+# Server-side selections ("Select All Matching") expire after SELECTION_TTL_SECONDS without use.
+SELECTION_TTL_SECONDS = 3600
+
+# `flask serve` (production server). With gunicorn installed, SERVER_WORKERS processes with SERVER_THREADS
+# request threads each; otherwise one process with SERVER_THREADS threads. Keep SERVER_WORKERS at 1:
+# background jobs, selections and live-update events are kept in process memory, so more than one worker
+# needs that state shared (or sticky sessions); otherwise job polling and selections fail with 404 and
+# pages miss their own changes. On SIGTERM/SIGINT the server finishes in-flight requests and waits up to
+# SERVER_SHUTDOWN_TIMEOUT seconds for background jobs. SERVER_WARMUP loads the tag list, the first media
+# page and the favorite filters before the first connection is accepted.
+SERVER_WORKERS = 1
+SERVER_THREADS = 8
+SERVER_SHUTDOWN_TIMEOUT = 60
+SERVER_WARMUP = True
+
+# Number of files moved to ARCHIVE_PATH in parallel by a bulk delete.
+# Moves within one filesystem are cheap renames; keep this low if the archive is on a slow disk.
+ARCHIVE_MOVE_WORKERS = 4
+
+# Number of files hashed in parallel by duplicate detection (`flask duplicates find`).
+DUPLICATE_HASH_WORKERS = 4
+
+# Rows streamed per batch when an api_select filter is evaluated over the library.
+FILTER_BATCH_SIZE = 1000
+
+# Log levels. LOG_LEVEL applies to every component (scanner, routes, tag_manager, utils, ...);
+# LOG_LEVELS overrides single components, e.g. {'scanner': 'DEBUG'}. Both can be changed at runtime
+# through PUT /api/logging/levels. Per-item messages (per file, per filtered media item) are
+# rate-limited so DEBUG stays usable on large libraries.
+LOG_LEVEL = 'INFO'
+LOG_LEVELS = {}
+
+# Opt-in SQL profiling for development. When True, statements slower than SQL_SLOW_QUERY_MS are
+# logged with their call site and EXPLAIN QUERY PLAN, statements repeated SQL_N_PLUS_ONE_THRESHOLD
+# or more times within one request are reported as possible N+1 patterns, and each response gets an
+# X-SQL-Profile summary header (disable with SQL_PROFILE_HEADER = False).
+SQL_PROFILING = False
+SQL_SLOW_QUERY_MS = 50
+SQL_N_PLUS_ONE_THRESHOLD = 10
+SQL_PROFILE_HEADER = True
+
 
 # --- Supported File Extensions (lowercase) ---
 # You can extend these lists if you have other common media file types.
@@ -41,50 +118,11 @@ SUPPORTED_IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff',
 SUPPORTED_VIDEO_EXTENSIONS = ['.mp4', '.mov', '.avi', '.mkv', '.wmv', '.flv']
 
 
-# --- Automatic Sample Directory Creation (for demo purposes) ---
-# If you are using the default ORG_PATHS and ARCHIVE_PATH as defined above
-# (pointing to 'sample_media' within this project), this code will create them
-# and add a few dummy files to help you get started quickly.
-# If you define your own custom paths above, this section will likely not affect them
-# unless your custom paths happen to be the same as these defaults.
-def create_sample_dirs_and_files():
-    default_sample_org_paths = [
-        os.path.join(BASE_DIR, 'sample_media', 'library1'),
-        os.path.join(BASE_DIR, 'sample_media', 'library2')
-    ]
-    default_sample_archive_path = os.path.join(BASE_DIR, 'sample_media', 'archive')
-
-    # Check if current ORG_PATHS are the default sample ones
-    if sorted(ORG_PATHS) == sorted(default_sample_org_paths):
-        print("Using default sample ORG_PATHS. Checking/creating sample directories...")
-        for p in ORG_PATHS:
-            if not os.path.exists(p):
-                try:
-                    os.makedirs(p)
-                    print(f"Created sample library directory: {p}")
-                    # Add a dummy file for testing
-                    with open(os.path.join(p, f"sample_image_{os.path.basename(p)}.jpg"), "w") as f:
-                        f.write("dummy image content")
-                    with open(os.path.join(p, f"sample_video_{os.path.basename(p)}.mp4"), "w") as f:
-                        f.write("dummy video content")
-                except OSError as e:
-                    print(f"Error creating sample directory {p}: {e}. Please check permissions.")
-            # else:
-                # print(f"Sample library directory already exists: {p}")
-
-    # Check if current ARCHIVE_PATH is the default sample one
-    if ARCHIVE_PATH == default_sample_archive_path:
-        print("Using default sample ARCHIVE_PATH. Checking/creating sample archive directory...")
-        if not os.path.exists(ARCHIVE_PATH):
-            try:
-                os.makedirs(ARCHIVE_PATH)
-                print(f"Created sample archive directory: {ARCHIVE_PATH}")
-            except OSError as e:
-                print(f"Error creating sample archive directory {ARCHIVE_PATH}: {e}. Please check permissions.")
-        # else:
-            # print(f"Sample archive directory already exists: {ARCHIVE_PATH}")
-
-create_sample_dirs_and_files() # Call the function to set up sample dirs if applicable
+# --- Sample Directories (for demo purposes) ---
+# Loading this file has no side effects (it is read by every process start, including CLI commands and
+# worker respawns). To create the default sample libraries and archive with a few dummy files, point
+# ORG_PATHS at sample_media/library1 and sample_media/library2 and ARCHIVE_PATH at sample_media/archive
+# below BASE_DIR, then run `flask sample create`.
 
 
 # --- Database Configuration ---
@@ -93,10 +131,6 @@ create_sample_dirs_and_files() # Call the function to set up sample dirs if appl
 SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(BASE_DIR, 'data', 'photo_album.sqlite')}"
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 
-print(f"Config loaded. ORG_PATHS set to: {ORG_PATHS}")
-print(f"ARCHIVE_PATH set to: {ARCHIVE_PATH}")
-print(f"Database URI set to: {SQLALCHEMY_DATABASE_URI}")
-
 # --- Flask Session Configuration ---
 # IMPORTANT: This is a RANDOMLY GENERATED key for development/testing.
 # For production, REPLACE this with a strong, unique, and static secret value.
@@ -8,13 +8,16 @@ document.addEventListener('DOMContentLoaded', () => {
     const sortBySelect = document.getElementById('sort-by');
     const sortOrderSelect = document.getElementById('sort-order');
     const refreshBtn = document.getElementById('refresh-btn');
+    const searchInput = document.getElementById('search-input');
     const tagManagementBtn = document.getElementById('tag-management-btn');
     const batchTagBtn = document.getElementById('batch-tag-btn');
+    const selectAllMatchingBtn = document.getElementById('select-all-matching-btn');
     const deleteSelectedBtn = document.getElementById('delete-selected-btn'); // Added
 
     const prevPageBtn = document.getElementById('prev-page');
     const nextPageBtn = document.getElementById('next-page');
     const pageInfoSpan = document.getElementById('page-info');
+    const jumpToMonthInput = document.getElementById('jump-to-month');
     const orgPathsList = document.getElementById('org-paths-list');
     const filterConfigBtn = document.getElementById('filter-config-btn');
     const imageViewerModal = document.getElementById('image-viewer-modal');
@@ -29,6 +32,7 @@ document.addEventListener('DOMContentLoaded', () => {
     const clearFilterBtn = document.getElementById('clear-filter-btn');
     const filterStatusDiv = document.getElementById('filter-status');
     const fullImage = document.getElementById('full-image');
+    const fullVideo = document.getElementById('full-video');
     const modalCaption = document.querySelector('.modal-caption');
     const modalPrev = document.querySelector('.modal-prev');
     const modalNext = document.querySelector('.modal-next');
@@ -99,6 +103,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 alert(`Failed to delete favorite: ${result.error || response.statusText}`);
                 return;
             }
+            if (currentAlbumId === favoriteId) { currentAlbumId = null; fetchMedia(1); }
             renderFilterFavorites(); // Re-fetch and re-render the list
         } catch (e) {
             console.error("Error deleting favorite filter:", e);
@@ -106,6 +111,18 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    async function togglePinnedFavorite(favoriteItem) {
+        try {
+            const response = await fetch(`/api/filters/favorites/${favoriteItem.id}/pin`, { method: favoriteItem.is_pinned ? 'DELETE' : 'POST' });
+            const result = await response.json();
+            if (!response.ok) { alert(`Failed to update smart album: ${result.error || response.statusText}`); return; }
+            if (!result.is_pinned && currentAlbumId === favoriteItem.id) { currentAlbumId = null; fetchMedia(1); }
+            renderFilterFavorites();
+        } catch (e) {
+            console.error("Error updating smart album:", e);
+        }
+    }
+
     async function renderFilterFavorites() {
         if (!favoriteFiltersListUl || !noFavoriteFiltersMessage) return;
 
@@ -145,6 +162,24 @@ document.addEventListener('DOMContentLoaded', () => {
                 }
             };
 
+            // Pinned favorites are smart albums: their matches are stored server-side and listed with ?album=<id>
+            const pinBtn = document.createElement('button');
+            pinBtn.textContent = favoriteItem.is_pinned ? 'Unpin' : 'Pin';
+            pinBtn.className = 'pin-favorite-btn';
+            pinBtn.title = favoriteItem.is_pinned ? 'Stop keeping this filter as a smart album' : 'Keep this filter as a smart album';
+            pinBtn.onclick = () => togglePinnedFavorite(favoriteItem);
+
+            const openBtn = document.createElement('button');
+            openBtn.textContent = currentAlbumId === favoriteItem.id ? 'Close' : 'Open';
+            openBtn.className = 'open-album-btn';
+            openBtn.style.display = favoriteItem.is_pinned ? '' : 'none';
+            openBtn.onclick = () => {
+                currentAlbumId = currentAlbumId === favoriteItem.id ? null : favoriteItem.id;
+                clearPhotoSelectionsOnly();
+                fetchMedia(1);
+                renderFilterFavorites();
+            };
+
             const deleteBtn = document.createElement('button');
             deleteBtn.textContent = 'Del';
             deleteBtn.className = 'delete-favorite-btn';
@@ -152,6 +187,8 @@ document.addEventListener('DOMContentLoaded', () => {
             deleteBtn.onclick = () => deleteFilterFavorite(favoriteItem.id); // Pass ID
 
             btnContainer.appendChild(loadBtn);
+            btnContainer.appendChild(openBtn);
+            btnContainer.appendChild(pinBtn);
             btnContainer.appendChild(deleteBtn);
             li.appendChild(snippetText);
             li.appendChild(btnContainer);
@@ -162,6 +199,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // Application State
     let currentPage = 1, totalPages = 1;
+    let currentAlbumId = null; // Open smart album (pinned favorite filter), replaces the session filter while set
     let photosPerRow = parseInt(sizeInput.value) || 5;
     if (photoWall) photoWall.style.setProperty('--photos-per-row', photosPerRow);
     let currentSortBy = sortBySelect.value, currentSortOrder = sortOrderSelect.value;
@@ -185,18 +223,26 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // --- Core Functions (some minified for focus) ---
     function getCalculatedPerPage() { const c=(parseInt(photoWall.style.getPropertyValue('--photos-per-row'))||photosPerRow),w=photoWall.clientWidth,a=photoWall.parentElement?photoWall.parentElement.clientHeight:window.innerHeight,g=10;if(w===0||a===0||c===0)return c>0?c*4:20;const cl=(w-(c-1)*g)/c,th=cl,s=th+g;if(s<=g)return c;const n=Math.max(1,Math.floor(a/s)),p=c*n;return Math.max(c,p); }
+    // Query string shared by everything that must match the listing (/api/media, selections).
+    function listFilterParams(sortBy = currentSortBy, sortOrder = currentSortOrder) {
+        let params = `sort_by=${sortBy}&sort_order=${sortOrder}`;
+        if (hideVideosCheckbox && hideVideosCheckbox.checked) {
+            params += `&media_types_filter=image`;
+        } else {
+            params += `&media_types_filter=image,video`; // Explicitly ask for both if not hiding videos
+        }
+        if (searchInput && searchInput.value.trim()) {
+            params += `&q=${encodeURIComponent(searchInput.value.trim())}`;
+        }
+        if (currentAlbumId !== null) params += `&album=${currentAlbumId}`;
+        return params;
+    }
     async function fetchMedia(page = 1, sortBy = currentSortBy, sortOrder = currentSortOrder) {
         if (photoWall) void photoWall.offsetHeight; // Force reflow for per_page calculation
         const calculatedPerPage = getCalculatedPerPage();
         lastCalculatedPerPage = calculatedPerPage;
 
-        let apiUrl = `/api/media?page=${page}&per_page=${calculatedPerPage}&sort_by=${sortBy}&sort_order=${sortOrder}`;
-
-        if (hideVideosCheckbox && hideVideosCheckbox.checked) {
-            apiUrl += `&media_types_filter=image`;
-        } else {
-            apiUrl += `&media_types_filter=image,video`; // Explicitly ask for both if not hiding videos
-        }
+        const apiUrl = `/api/media?page=${page}&per_page=${calculatedPerPage}&${listFilterParams(sortBy, sortOrder)}`;
 
         console.log(`Fetching: ${apiUrl}`);
         try {
@@ -297,10 +343,30 @@ document.addEventListener('DOMContentLoaded', () => {
             photoWall.appendChild(ti);
         });
     }
-    function toggleSelection(el, id) { const numId = parseInt(id); if(selectedMediaIds.has(numId)){selectedMediaIds.delete(numId);el.classList.remove('selected')}else{selectedMediaIds.add(numId);el.classList.add('selected')} console.log('Current selection IDs:',Array.from(selectedMediaIds)); }
+    function toggleSelection(el, id) { dropSelectionHandle(); const numId = parseInt(id); if(selectedMediaIds.has(numId)){selectedMediaIds.delete(numId);el.classList.remove('selected')}else{selectedMediaIds.add(numId);el.classList.add('selected')} console.log('Current selection IDs:',Array.from(selectedMediaIds)); }
     function updatePaginationControls() { if(pageInfoSpan)pageInfoSpan.textContent=`Page ${currentPage} of ${totalPages}`;if(prevPageBtn)prevPageBtn.disabled=currentPage<=1;if(nextPageBtn)nextPageBtn.disabled=currentPage>=totalPages }
-    async function fetchOrgPaths() { try{const r=await fetch('/api/org_paths');const d=await r.json();if(orgPathsList){orgPathsList.innerHTML='';d.forEach(p=>{const l=document.createElement('li');l.textContent=p;orgPathsList.appendChild(l)})}}catch(e){} }
-    async function fetchGlobalTags() { if(!globalTagsListUl)return;try{const r=await fetch('/api/tags');const d=await r.json();globalTagsListUl.innerHTML='';if(d.length===0)globalTagsListUl.innerHTML='<li>No tags.</li>';d.forEach(t=>{const l=document.createElement('li');l.textContent=t.name;l.dataset.tagId=t.id;l.dataset.tagName=t.name;if(activeTagNamesForOperations.has(t.name))l.classList.add('active-for-tagging');l.addEventListener('click',()=>{if(activeTagNamesForOperations.has(t.name)){activeTagNamesForOperations.delete(t.name);l.classList.remove('active-for-tagging')}else{activeTagNamesForOperations.add(t.name);l.classList.add('active-for-tagging')}});globalTagsListUl.appendChild(l)})}catch(e){globalTagsListUl.innerHTML='<li>Error tags.</li>'} }
+    async function fetchOrgPaths() { try{const r=await fetch('/api/org_paths');const d=await r.json();if(orgPathsList){orgPathsList.innerHTML='';d.forEach(p=>{const l=document.createElement('li');l.textContent=p;l.dataset.orgPath=p;orgPathsList.appendChild(l)})}updateFacetCounts()}catch(e){} }
+    async function fetchGlobalTags() { if(!globalTagsListUl)return;try{const r=await fetch('/api/tags');const d=await r.json();globalTagsListUl.innerHTML='';if(d.length===0)globalTagsListUl.innerHTML='<li>No tags.</li>';d.forEach(t=>{const l=document.createElement('li');l.textContent=t.name;l.dataset.tagId=t.id;l.dataset.tagName=t.name;if(activeTagNamesForOperations.has(t.name))l.classList.add('active-for-tagging');l.addEventListener('click',()=>{if(activeTagNamesForOperations.has(t.name)){activeTagNamesForOperations.delete(t.name);l.classList.remove('active-for-tagging')}else{activeTagNamesForOperations.add(t.name);l.classList.add('active-for-tagging')}});globalTagsListUl.appendChild(l)});updateFacetCounts()}catch(e){globalTagsListUl.innerHTML='<li>Error tags.</li>'} }
+    async function updateFacetCounts() {
+        // Annotates the info panel's org_path and tag lists with media counts for the current media-type filter.
+        const types = (hideVideosCheckbox && hideVideosCheckbox.checked) ? 'image' : 'image,video';
+        try {
+            const r = await fetch(`/api/facets?media_types_filter=${types}`);
+            if (!r.ok) return;
+            const facets = await r.json();
+            const orgPathCounts = new Map(facets.org_paths.map(f => [f.org_path, f.count]));
+            const tagCounts = new Map(facets.tags.map(f => [f.name, f.count]));
+            const setCount = (li, count) => {
+                let badge = li.querySelector('.facet-count');
+                if (!badge) { badge = document.createElement('span'); badge.className = 'facet-count'; li.appendChild(badge); }
+                badge.textContent = ` (${count || 0})`;
+            };
+            if (orgPathsList) orgPathsList.querySelectorAll('li[data-org-path]').forEach(li => setCount(li, orgPathCounts.get(li.dataset.orgPath)));
+            if (globalTagsListUl) globalTagsListUl.querySelectorAll('li[data-tag-name]').forEach(li => setCount(li, tagCounts.get(li.dataset.tagName)));
+        } catch (e) {
+            console.error('Error fetching facet counts:', e);
+        }
+    }
 
     async function handleRemoveTagFromMedia(mediaId, tagName, tagSpanElement) {
         console.log(`Attempting to remove tag '${tagName}' from media ID ${mediaId}`);
@@ -333,12 +399,51 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
-    async function handleDeleteTag(tagId, tagName) { if(!confirm(`Delete '${tagName}'?`))return;try{const r=await fetch(`/api/tags/${tagId}`,{method:'DELETE'});const rs=await r.json();if(r.ok){if(populateManageTagsList)populateManageTagsList();fetchGlobalTags();if(window.appContext)window.appContext.refreshPhotoWall()}else{alert(`Error: ${rs.error||'Unknown'}`)}}catch(e){alert('Network error.')} }
+    async function handleDeleteTag(tagId, tagName) { if(!confirm(`Delete '${tagName}'?`))return;try{const r=await fetch(`/api/tags/${tagId}`,{method:'DELETE'});const rs=await r.json();if(r.ok){if(!liveUpdatesActive()){if(populateManageTagsList)populateManageTagsList();fetchGlobalTags();if(window.appContext)window.appContext.refreshPhotoWall()}}else{alert(`Error: ${rs.error||'Unknown'}`)}}catch(e){alert('Network error.')} }
     async function populateManageTagsList() { if(!manageTagsListUl)return;try{const r=await fetch('/api/tags');const d=await r.json();manageTagsListUl.innerHTML='';if(d.length===0)manageTagsListUl.innerHTML='<li>No tags.</li>';d.forEach(t=>{const li=document.createElement('li');const s=document.createElement('span');s.textContent=t.name;li.appendChild(s);li.dataset.tagId=t.id;const b=document.createElement('button');b.textContent='Delete';b.style.cssText='margin-left:10px;padding:2px 5px;font-size:0.8em;background-color:#dc3545;color:white;border:none;cursor:pointer;';b.onclick=(e)=>{e.stopPropagation();handleDeleteTag(t.id,t.name)};li.appendChild(b);manageTagsListUl.appendChild(li)})}catch(e){manageTagsListUl.innerHTML='<li>Error tags.</li>'} }
-    if(addNewTagBtn) addNewTagBtn.addEventListener('click', async () => { const tn=newTagInput.value.trim();if(!tn){alert('Empty tag.');return}try{const r=await fetch('/api/tags',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({name:tn})});const rs=await r.json();if(r.ok){newTagInput.value='';populateManageTagsList();fetchGlobalTags()}else{alert(`Error: ${rs.error||'Unknown'}`)}}catch(e){alert('Network error.')} });
-    if(batchTagBtn) batchTagBtn.addEventListener('click', async () => { const mIds=Array.from(selectedMediaIds);const tApply=Array.from(activeTagNamesForOperations);if(mIds.length===0||tApply.length===0){alert('Select photos & active tags.');return}const o=batchTagBtn.textContent;batchTagBtn.textContent='Tagging...';batchTagBtn.disabled=true;let sC=0,eC=0;for(const mId of mIds){try{const idx=currentMediaItems.findIndex(m=>m.id===mId);const r=await fetch(`/api/media/${mId}/tags`,{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({tag_names:tApply})});const rs=await r.json();if(r.ok){sC++;if(idx>-1)currentMediaItems[idx].tags=rs.tags}else{eC++}}catch(e){eC++}}batchTagBtn.textContent=o;batchTagBtn.disabled=false;alert(`Batch: ${sC} success, ${eC} failed.`);if(sC>0){renderPhotoWall(currentMediaItems);}});
+    if(addNewTagBtn) addNewTagBtn.addEventListener('click', async () => { const tn=newTagInput.value.trim();if(!tn){alert('Empty tag.');return}try{const r=await fetch('/api/tags',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({name:tn})});const rs=await r.json();if(r.ok){newTagInput.value='';if(!liveUpdatesActive()){populateManageTagsList();fetchGlobalTags()}}else{alert(`Error: ${rs.error||'Unknown'}`)}}catch(e){alert('Network error.')} });
+    if(batchTagBtn) batchTagBtn.addEventListener('click', async () => { if(selectionHandle){await batchTagSelection();return} const mIds=Array.from(selectedMediaIds);const tApply=Array.from(activeTagNamesForOperations);if(mIds.length===0||tApply.length===0){alert('Select photos & active tags.');return}const o=batchTagBtn.textContent;batchTagBtn.textContent='Tagging...';batchTagBtn.disabled=true;let sC=0,eC=0;for(const mId of mIds){try{const idx=currentMediaItems.findIndex(m=>m.id===mId);const r=await fetch(`/api/media/${mId}/tags`,{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({tag_names:tApply})});const rs=await r.json();if(r.ok){sC++;if(idx>-1)currentMediaItems[idx].tags=rs.tags}else{eC++}}catch(e){eC++}}batchTagBtn.textContent=o;batchTagBtn.disabled=false;alert(`Batch: ${sC} success, ${eC} failed.`);if(sC>0){renderPhotoWall(currentMediaItems);}});
+
+    // "Select All Matching": a server-side selection of everything the current listing matches (all pages).
+    // Batch tagging and deletion then send its handle instead of the IDs.
+    let selectionHandle = null;
+    function dropSelectionHandle() {
+        if (!selectionHandle) return;
+        fetch(`/api/selections/${selectionHandle.id}`, { method: 'DELETE' }).catch(() => {});
+        selectionHandle = null;
+        if (selectAllMatchingBtn) selectAllMatchingBtn.textContent = 'Select All Matching';
+    }
+    if (selectAllMatchingBtn) selectAllMatchingBtn.addEventListener('click', async () => {
+        dropSelectionHandle();
+        try {
+            const r = await fetch(`/api/selections?${listFilterParams()}`, { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: '{}' });
+            const d = await r.json();
+            if (!r.ok) { alert(`Error: ${d.error || 'Unknown'}`); return; }
+            selectionHandle = d;
+            currentMediaItems.forEach(m => selectedMediaIds.add(m.id));
+            if (photoWall) photoWall.querySelectorAll('.thumbnail-item').forEach(t => t.classList.add('selected'));
+            selectAllMatchingBtn.textContent = `All ${d.count} Selected`;
+        } catch (e) { alert('Network error.'); }
+    });
+
+    async function batchTagSelection() {
+        const tApply = Array.from(activeTagNamesForOperations);
+        if (tApply.length === 0) { alert('Select active tags.'); return; }
+        const o = batchTagBtn.textContent; batchTagBtn.disabled = true;
+        try {
+            const r = await fetch(`/api/selections/${selectionHandle.id}/tags`, { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ tag_names: tApply }) });
+            const started = await r.json();
+            if (!r.ok) throw new Error(started.error || r.statusText);
+            const job = await waitForJob(started.job_id, (j) => { batchTagBtn.textContent = `Tagging... ${j.done}/${j.total}`; });
+            if (job.status !== 'done') throw new Error(job.error || 'Tagging job failed');
+            alert(`Batch: tagged ${selectionHandle.count} items.`);
+            if (!liveUpdatesActive()) fetchMedia(currentPage);
+        } catch (e) { alert(`Error: ${e.message}`); }
+        batchTagBtn.textContent = o; batchTagBtn.disabled = false;
+    }
 
     function clearPhotoSelectionsOnly() {
+        dropSelectionHandle();
         selectedMediaIds.clear();
         lastClickedPhotoIndex = -1; // Reset anchor for shift-click
         if (photoWall) { // Ensure photoWall is available
@@ -358,18 +463,85 @@ document.addEventListener('DOMContentLoaded', () => {
         // No renderPhotoWall here, as fetchMedia is expected to follow if view needs full refresh
     }
 
+    // --- Live updates (Server-Sent Events from /api/events) ---
+    // Changes made in any tab arrive as small deltas that are patched into the current page. While the
+    // stream is not connected, the handlers below fall back to refetching after their own changes.
+    let eventSource = null;
+    function liveUpdatesActive() { return eventSource !== null && eventSource.readyState === EventSource.OPEN; }
+    function refreshTagLists() {
+        if (fetchGlobalTags) fetchGlobalTags();
+        if (tagManagementModal && tagManagementModal.style.display === 'block' && populateManageTagsList) populateManageTagsList();
+    }
+    function connectEventStream() {
+        if (typeof EventSource === 'undefined') return;
+        eventSource = new EventSource('/api/events');
+        eventSource.onerror = () => {
+            // Closed for good (e.g. 503 when the server has no free stream slot): refetch locally meanwhile, retry later.
+            if (eventSource.readyState === EventSource.CLOSED) setTimeout(connectEventStream, 30000);
+        };
+        const on = (type, handler) => eventSource.addEventListener(type, e => handler(JSON.parse(e.data)));
+        on('media_tags_changed', d => {
+            const item = currentMediaItems.find(m => m.id === d.media_id);
+            if (item) { item.tags = d.tags; renderPhotoWall(currentMediaItems); }
+        });
+        const patchTags = (d, update) => {
+            const ids = new Set(d.media_ids);
+            let changed = false;
+            currentMediaItems.forEach(m => { if (ids.has(m.id)) { m.tags = update(m.tags || []); changed = true; } });
+            if (changed) renderPhotoWall(currentMediaItems);
+        };
+        on('media_tags_added', d => patchTags(d, tags => tags.concat(d.tags.filter(t => !tags.includes(t)))));
+        on('media_tags_removed', d => patchTags(d, tags => tags.filter(t => !d.tags.includes(t))));
+        on('tag_added', () => refreshTagLists());
+        on('tag_deleted', d => {
+            activeTagNamesForOperations.delete(d.name);
+            let changed = false;
+            currentMediaItems.forEach(m => { if (m.tags && m.tags.includes(d.name)) { m.tags = m.tags.filter(t => t !== d.name); changed = true; } });
+            if (changed) renderPhotoWall(currentMediaItems);
+            refreshTagLists();
+        });
+        on('media_removed', d => {
+            const removed = new Set(d.ids);
+            removed.forEach(id => selectedMediaIds.delete(id));
+            const remaining = currentMediaItems.filter(m => !removed.has(m.id));
+            if (remaining.length === currentMediaItems.length) return;
+            if (remaining.length === 0) { fetchMedia(Math.max(1, currentPage - 1)); return; }
+            currentMediaItems = remaining;
+            renderPhotoWall(currentMediaItems);
+        });
+        on('library_scanned', d => {
+            const c = d.counts;
+            if (c.added + c.updated + c.made_accessible + c.newly_inaccessible === 0) return;
+            fetchMedia(currentPage);
+            if (fetchOrgPaths) fetchOrgPaths();
+        });
+        on('resync', () => { fetchMedia(currentPage); refreshTagLists(); if (fetchOrgPaths) fetchOrgPaths(); });
+    }
+
+    async function waitForJob(jobId, onProgress, intervalMs = 500) {
+        while (true) {
+            const r = await fetch(`/api/jobs/${jobId}`);
+            const job = await r.json();
+            if (!r.ok) throw new Error(job.error || r.statusText);
+            if (onProgress) onProgress(job);
+            if (job.status === 'done' || job.status === 'failed') return job;
+            await new Promise(resolve => setTimeout(resolve, intervalMs));
+        }
+    }
+
     // --- Delete Selected Photos Logic ---
     if (deleteSelectedBtn) {
         deleteSelectedBtn.addEventListener('click', async () => {
             const mediaIdsToDelete = Array.from(selectedMediaIds);
             console.log('[DeletePhotos] Clicked. Media IDs to delete:', mediaIdsToDelete);
+            const deleteCount = selectionHandle ? selectionHandle.count : mediaIdsToDelete.length;
 
-            if (mediaIdsToDelete.length === 0) {
+            if (deleteCount === 0) {
                 alert('No photos selected for deletion. Please select photos (left-click) first.');
                 return;
             }
 
-            if (!confirm(`Are you sure you want to delete ${mediaIdsToDelete.length} selected photo(s)? This will move them to the archive.`)) {
+            if (!confirm(`Are you sure you want to delete ${deleteCount} selected photo(s)? This will move them to the archive.`)) {
                 console.log('[DeletePhotos] Deletion cancelled by user.');
                 return;
             }
@@ -382,21 +554,30 @@ document.addEventListener('DOMContentLoaded', () => {
                 const response = await fetch('/api/media/delete_selected', {
                     method: 'POST',
                     headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ media_ids: mediaIdsToDelete })
+                    body: JSON.stringify(selectionHandle ? { selection_id: selectionHandle.id } : { media_ids: mediaIdsToDelete })
+                });
+                const started = await response.json();
+                if (!response.ok) throw new Error(started.error || response.statusText);
+                // Deletion runs as a background job on the server; poll it until it finishes.
+                const job = await waitForJob(started.job_id, (j) => {
+                    deleteSelectedBtn.textContent = `Deleting... ${j.done}/${j.total}`;
                 });
-                const result = await response.json(); // Expect summary: {message, success_count, failures: [{id, reason}]}
+                if (job.status !== 'done') throw new Error(job.error || 'Deletion job failed');
+                const result = job.result; // Summary: {message, success_count, failures: [{id, reason}]}
 
                 alert(result.message || 'Deletion process completed.'); // Show summary message from server
                 console.log('[DeletePhotos] Server response:', result);
 
                 // Refresh view only if some items were successfully processed or if the response indicates an OK status
                 // (e.g. 207 Multi-Status means some actions, possibly successful, were performed)
-                if (result.success_count > 0 || response.ok) {
+                if (result.success_count > 0) {
                     clearSelectionsAndActiveTags(); // Clear selections
 
-                    // Trigger a "deep refresh": scan backend then reload UI from page 1
-                    console.log('[DeletePhotos] Initiating deep refresh after deletion...');
-                    if (refreshBtn && typeof refreshBtn.click === 'function') {
+                    if (liveUpdatesActive()) {
+                        // The media_removed event already took the deleted items off the page
+                    } else if (refreshBtn && typeof refreshBtn.click === 'function') {
+                        // Trigger a "deep refresh": scan backend then reload UI from page 1
+                        console.log('[DeletePhotos] Initiating deep refresh after deletion...');
                         refreshBtn.click(); // Simulate a click on the main refresh button
                     } else {
                         // Fallback if refreshBtn isn't available or click simulation is problematic
@@ -433,10 +614,23 @@ document.addEventListener('DOMContentLoaded', () => {
     if(sizeInput) sizeInput.addEventListener('change', () => { const newSize=parseInt(sizeInput.value);if(newSize>0){photosPerRow=newSize;photoWall.style.setProperty('--photos-per-row',photosPerRow);clearSelectionsAndActiveTags();fetchMedia(1)}else{sizeInput.value=photosPerRow} }); // Keep full clear for layout change
     if(sortBySelect) sortBySelect.addEventListener('change', () => { currentSortBy=sortBySelect.value;clearPhotoSelectionsOnly();fetchMedia(1) }); // Preserve active tags
     if(sortOrderSelect) sortOrderSelect.addEventListener('change', () => { currentSortOrder=sortOrderSelect.value;clearPhotoSelectionsOnly();fetchMedia(1) }); // Preserve active tags
-    if(refreshBtn) refreshBtn.addEventListener('click', async () => {const o=refreshBtn.textContent;refreshBtn.textContent='Scanning...';refreshBtn.disabled=true;let s=false;try{const r=await fetch('/api/scan/trigger',{method:'POST'});const t=await r.json().catch(()=>({error:"JSON Error"}));if(!r.ok){alert(`Scan Error: ${t.error||'Unknown'}`);s=true}else{/* Alert removed */}}catch(e){alert('Scan Network Error.');s=true}refreshBtn.textContent=o;refreshBtn.disabled=false;if(!s){clearSelectionsAndActiveTags();fetchMedia(1);if(fetchOrgPaths)fetchOrgPaths();if(fetchGlobalTags)fetchGlobalTags();if(tagManagementModal && tagManagementModal.style.display==='block' && populateManageTagsList)populateManageTagsList()}});
+    if(refreshBtn) refreshBtn.addEventListener('click', async () => {const o=refreshBtn.textContent;refreshBtn.textContent='Scanning...';refreshBtn.disabled=true;let s=false;try{const r=await fetch('/api/scan/trigger',{method:'POST'});const t=await r.json().catch(()=>({error:"JSON Error"}));if(!r.ok){alert(`Scan Error: ${t.error||'Unknown'}`);s=true}else{/* Alert removed */}}catch(e){alert('Scan Network Error.');s=true}refreshBtn.textContent=o;refreshBtn.disabled=false;if(!s&&!liveUpdatesActive()){clearSelectionsAndActiveTags();fetchMedia(1);if(fetchOrgPaths)fetchOrgPaths();if(fetchGlobalTags)fetchGlobalTags();if(tagManagementModal && tagManagementModal.style.display==='block' && populateManageTagsList)populateManageTagsList()}});
     if(prevPageBtn) prevPageBtn.addEventListener('click', () => { if(currentPage>1){clearPhotoSelectionsOnly();fetchMedia(currentPage-1)} });
     if(nextPageBtn) nextPageBtn.addEventListener('click', () => { if(currentPage<totalPages){clearPhotoSelectionsOnly();fetchMedia(currentPage+1)} });
-    const allModals=document.querySelectorAll('.modal');const closeButtons=document.querySelectorAll('.close-modal-btn');function openModal(modalId){const modal=document.getElementById(modalId);if(modal)modal.style.display='block'}function closeModal(modalElement){if(modalElement)modalElement.style.display='none'}if(closeButtons)closeButtons.forEach(b=>{b.onclick=function(){closeModal(b.closest('.modal'))}});window.onclick=function(event){allModals.forEach(m=>{if(event.target==m)closeModal(m)})};let currentViewIndex=-1;function openImageViewer(mediaId){const i=currentMediaItems.findIndex(m=>m.id===mediaId);if(i===-1)return;currentViewIndex=i;updateImageViewerContent();openModal('image-viewer-modal')}function updateImageViewerContent(){if(currentViewIndex<0||currentViewIndex>=currentMediaItems.length)return;const item=currentMediaItems[currentViewIndex];if(fullImage)fullImage.src=`/api/media/file/${item.id}`;if(modalCaption)modalCaption.textContent=item.filename;if(modalPrev)modalPrev.style.display=currentViewIndex>0?'block':'none';if(modalNext)modalNext.style.display=currentViewIndex<currentMediaItems.length-1?'block':'none'}if(modalPrev)modalPrev.onclick=()=>{if(currentViewIndex>0){currentViewIndex--;updateImageViewerContent()}};if(modalNext)modalNext.onclick=()=>{if(currentViewIndex<currentMediaItems.length-1){currentViewIndex++;updateImageViewerContent()}};document.addEventListener('keydown',(event)=>{if(imageViewerModal && imageViewerModal.style.display==='block'){if(event.key==='ArrowLeft')modalPrev.click();else if(event.key==='ArrowRight')modalNext.click();else if(event.key==='Escape')closeModal(imageViewerModal)}});
+    if(jumpToMonthInput) jumpToMonthInput.addEventListener('change', async () => {
+        if (!jumpToMonthInput.value) return;
+        if (currentSortBy !== 'capture_time') { currentSortBy = 'capture_time'; if (sortBySelect) sortBySelect.value = 'capture_time'; }
+        // Same filters as fetchMedia(), so the returned page matches the listing.
+        const seekUrl = `/api/media/seek?date=${jumpToMonthInput.value}&per_page=${getCalculatedPerPage()}&${listFilterParams()}`;
+        try {
+            const r = await fetch(seekUrl);
+            const d = await r.json();
+            if (!r.ok) throw new Error(d.error || r.status);
+            clearPhotoSelectionsOnly();
+            fetchMedia(d.page);
+        } catch (e) { console.error('Seek error:', e); }
+    });
+    const allModals=document.querySelectorAll('.modal');const closeButtons=document.querySelectorAll('.close-modal-btn');function openModal(modalId){const modal=document.getElementById(modalId);if(modal)modal.style.display='block'}function closeModal(modalElement){if(modalElement)modalElement.style.display='none';if(fullVideo&&modalElement&&modalElement.contains(fullVideo))fullVideo.pause()}if(closeButtons)closeButtons.forEach(b=>{b.onclick=function(){closeModal(b.closest('.modal'))}});window.onclick=function(event){allModals.forEach(m=>{if(event.target==m)closeModal(m)})};let currentViewIndex=-1;function openImageViewer(mediaId){const i=currentMediaItems.findIndex(m=>m.id===mediaId);if(i===-1)return;currentViewIndex=i;updateImageViewerContent();openModal('image-viewer-modal')}function updateImageViewerContent(){if(currentViewIndex<0||currentViewIndex>=currentMediaItems.length)return;const item=currentMediaItems[currentViewIndex];const isVideo=item.media_type==='video';if(fullVideo){fullVideo.pause();fullVideo.style.display=isVideo?'block':'none';if(isVideo)fullVideo.src=`/api/media/file/${item.id}`;else fullVideo.removeAttribute('src')}if(fullImage){fullImage.style.display=isVideo?'none':'block';if(!isVideo)fullImage.src=`/api/media/preview/${item.id}?${listFilterParams()}`}if(modalCaption){modalCaption.textContent=item.filename+' ';const originalLink=document.createElement('a');originalLink.href=`/api/media/file/${item.id}`;originalLink.target='_blank';originalLink.textContent='(original)';modalCaption.appendChild(originalLink)}if(modalPrev)modalPrev.style.display=currentViewIndex>0?'block':'none';if(modalNext)modalNext.style.display=currentViewIndex<currentMediaItems.length-1?'block':'none'}if(modalPrev)modalPrev.onclick=()=>{if(currentViewIndex>0){currentViewIndex--;updateImageViewerContent()}};if(modalNext)modalNext.onclick=()=>{if(currentViewIndex<currentMediaItems.length-1){currentViewIndex++;updateImageViewerContent()}};document.addEventListener('keydown',(event)=>{if(imageViewerModal && imageViewerModal.style.display==='block'){if(event.key==='ArrowLeft')modalPrev.click();else if(event.key==='ArrowRight')modalNext.click();else if(event.key==='Escape')closeModal(imageViewerModal)}});
     if(filterConfigBtn) filterConfigBtn.onclick=()=>{
         if(filterStatusDiv)filterStatusDiv.textContent='';
         openModal('filter-config-modal');
@@ -473,6 +667,7 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
     if(clearFilterBtn) clearFilterBtn.addEventListener('click',async()=>{try{const r=await fetch('/api/media/filter_config',{method:'DELETE'});const rs=await r.json();if(r.ok){
+        currentAlbumId = null; renderFilterFavorites();
         if(filterCodeEditor) {
             filterCodeEditor.setValue(''); // Clear CodeMirror instance
         } else if (filterFunctionInput) {
@@ -481,10 +676,19 @@ document.addEventListener('DOMContentLoaded', () => {
         if(filterStatusDiv){filterStatusDiv.textContent='Filter cleared!';filterStatusDiv.style.color='green'}clearSelectionsAndActiveTags();fetchMedia(1)}else{if(filterStatusDiv){filterStatusDiv.textContent=`Error: ${rs.error||'Filter clear error'}`;filterStatusDiv.style.color='red'}}}catch(e){if(filterStatusDiv){filterStatusDiv.textContent='Network error.';filterStatusDiv.style.color='red'}}}); // Keep full clear
     if(tagManagementBtn) tagManagementBtn.onclick=()=>{if(tagManagementStatusDiv)tagManagementStatusDiv.textContent='';openModal('tag-management-modal');if(populateManageTagsList)populateManageTagsList()};
 
+    if (searchInput) {
+        let searchTimeout;
+        searchInput.addEventListener('input', () => {
+            clearTimeout(searchTimeout);
+            searchTimeout = setTimeout(() => { clearPhotoSelectionsOnly(); fetchMedia(1); }, 300); // Debounce keystrokes
+        });
+    }
+
     if (hideVideosCheckbox) {
         hideVideosCheckbox.addEventListener('change', () => {
             clearPhotoSelectionsOnly(); // Preserve active tags
             fetchMedia(1); // Refetch media for page 1 with new filter state
+            updateFacetCounts(); // Counts depend on the media-type filter
         });
     }
 
@@ -512,6 +716,7 @@ document.addEventListener('DOMContentLoaded', () => {
     fetchMedia(currentPage, currentSortBy, currentSortOrder);
     if(fetchOrgPaths)fetchOrgPaths();
     if(fetchGlobalTags)fetchGlobalTags();
+    connectEventStream();
     // updateUndoButtonState(); // Removed
 
     window.appContext = { refreshPhotoWall: () => fetchMedia(currentPage, currentSortBy, currentSortOrder), clearSelectionsAndActiveTags: clearSelectionsAndActiveTags, getActiveTagNames: () => Array.from(activeTagNamesForOperations), getSelectedMediaIds: () => Array.from(selectedMediaIds) };